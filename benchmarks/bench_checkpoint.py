@@ -0,0 +1,81 @@
+"""
+Benchmark the save and load throughput of sharded checkpoints against torch.save and torch.load
+
+The learner is an ensemble of linear layers with its optimizer state. Loading a
+sharded checkpoint memory-maps the tensors so the load time is also reported
+after summing every tensor to read it from disk
+
+usage: python benchmarks/bench_checkpoint.py
+"""
+
+# 1st party
+import os
+import tempfile
+import time
+
+# 3rd party
+import torch
+from torch import nn
+
+# local
+from zenkai.kaku import Checkpoint, CheckpointWriter, save_checkpoint
+
+
+def create_items(n_members: int, features: int):
+
+    ensemble = nn.ModuleList([nn.Linear(features, features) for _ in range(n_members)])
+    optim = torch.optim.Adam(ensemble.parameters())
+    for member in ensemble:
+        member(torch.rand(4, features)).sum().backward()
+    optim.step()
+    return {"ensemble": ensemble.state_dict(), "optim": optim.state_dict()}
+
+
+def read_all(value) -> float:
+
+    if isinstance(value, torch.Tensor):
+        return value.float().sum().item()
+    if isinstance(value, dict):
+        return sum(read_all(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(read_all(v) for v in value)
+    return 0.0
+
+
+def timed(f) -> float:
+
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def main():
+
+    print(
+        f"{'members':>8} {'MB':>8} {'torch.save':>12} {'save':>12} {'async save':>12}"
+        f" {'torch.load':>12} {'load':>12} {'load+read':>12}"
+    )
+    for n_members in [8, 32, 128]:
+        items = create_items(n_members, 512)
+        with tempfile.TemporaryDirectory() as directory:
+            pt_path = os.path.join(directory, "checkpoint.pt")
+            path = os.path.join(directory, "checkpoint")
+            torch_save = timed(lambda: torch.save(items, pt_path))
+            save = timed(lambda: save_checkpoint(path, items))
+            writer = CheckpointWriter()
+            # the time training is blocked for
+            async_save = timed(lambda: writer.save(path + "_async", items))
+            writer.close()
+            mb = os.path.getsize(pt_path) / 2 ** 20
+            torch_load = timed(lambda: torch.load(pt_path))
+            load = timed(lambda: Checkpoint(path).load())
+            load_read = timed(lambda: read_all(Checkpoint(path).load()))
+        print(
+            f"{n_members:>8} {mb:>8.1f} {mb / torch_save:>10.0f}/s {mb / save:>10.0f}/s"
+            f" {mb / async_save:>10.0f}/s {mb / torch_load:>10.0f}/s"
+            f" {mb / load:>10.0f}/s {mb / load_read:>10.0f}/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark the throughput of learn() on the cpu with and without compiling
+
+The learner is a stack of GradLearners in a GraphLearner. Compiling wraps the
+network of each GradLearner and the loss in torch.compile while the IO and State
+handling stays in eager Python. The first calls, which compile, are excluded
+
+usage: python benchmarks/bench_compile.py
+"""
+
+# 1st party
+import time
+
+# 3rd party
+import torch
+from torch import nn
+
+# local
+from zenkai import OptimFactory, ThLoss
+from zenkai.kaku import IO, State, Assessment
+from zenkai.kikai import GradLearner, GraphLearner
+
+
+class MLPStack(GraphLearner):
+    def __init__(self, features: int, n_layers: int):
+        super().__init__()
+        self.criterion = ThLoss("MSELoss")
+        self.layers = nn.ModuleList(
+            [
+                self.node(
+                    GradLearner(
+                        [nn.Linear(features, features), nn.ReLU()],
+                        ThLoss("MSELoss"),
+                        OptimFactory("Adam", lr=1e-3),
+                    )
+                )
+                for _ in range(n_layers)
+            ]
+        )
+
+    def assess_y(self, y: IO, t: IO, reduction_override: str = None) -> Assessment:
+        return self.criterion.assess(y, t, reduction_override)
+
+    def forward(self, x: IO, state: State, release: bool = True) -> IO:
+        base_x = x
+        for layer in self.layers:
+            x = layer(x, state, release, base_x)
+        return x
+
+
+def run(learner: GraphLearner, x: IO, t: IO, iterations: int, warmup: int) -> float:
+
+    for _ in range(warmup):
+        learner.learn(x, t)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        learner.learn(x, t)
+    return time.perf_counter() - start
+
+
+def main():
+
+    iterations = 200
+    print(f"{'features':>10} {'layers':>8} {'eager (it/s)':>14} {'compiled (it/s)':>16}")
+    for features, n_layers in [(64, 4), (256, 4), (1024, 4)]:
+        x = IO(torch.rand(128, features))
+        t = IO(torch.rand(128, features))
+        eager = run(MLPStack(features, n_layers), x, t, iterations, 5)
+        compiled_learner = MLPStack(features, n_layers).set_compile()
+        compiled = run(compiled_learner, x, t, iterations, 5)
+        print(
+            f"{features:>10} {n_layers:>8} {iterations / eager:>14.1f}"
+            f" {iterations / compiled:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark the latency of an exported predictor against the learning machine it was exported from
+
+The machine is a sequential GraphLearner of GradLearners. Calling the machine
+wraps the input in an IO, creates a State, runs the hook loops and releases the
+outputs. The exported module is an nn.Sequential that operates on tensors
+
+usage: python benchmarks/bench_export.py
+"""
+
+# 1st party
+import time
+
+# 3rd party
+import torch
+from torch import nn
+
+# local
+from zenkai import OptimFactory, ThLoss
+from zenkai.kaku import IO, State, Assessment
+from zenkai.kikai import GradLearner, GraphLearner, export
+
+
+class MLPStack(GraphLearner):
+    def __init__(self, features: int, n_layers: int):
+        super().__init__()
+        self.criterion = ThLoss("MSELoss")
+        self.layers = nn.ModuleList(
+            [
+                self.node(
+                    GradLearner(
+                        [nn.Linear(features, features), nn.ReLU()],
+                        ThLoss("MSELoss"),
+                        OptimFactory("Adam", lr=1e-3),
+                    )
+                )
+                for _ in range(n_layers)
+            ]
+        )
+
+    def assess_y(self, y: IO, t: IO, reduction_override: str = None) -> Assessment:
+        return self.criterion.assess(y, t, reduction_override)
+
+    def forward(self, x: IO, state: State, release: bool = True) -> IO:
+        base_x = x
+        for layer in self.layers:
+            x = layer(x, state, release, base_x)
+        return x
+
+
+def latency(f, iterations: int) -> float:
+    """The mean microseconds per call"""
+    for _ in range(iterations // 10):
+        f()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        f()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+
+    iterations = 2000
+    print(
+        f"{'batch':>6} {'features':>9} {'machine (us)':>13} {'exported (us)':>14}"
+        f" {'scripted (us)':>14}"
+    )
+    for batch_size, features in [(1, 16), (1, 256), (64, 256)]:
+        machine = MLPStack(features, 4)
+        machine.eval()
+        x_f = torch.rand(batch_size, features)
+        exported = export(machine, IO(x_f))
+        scripted = export(machine, IO(x_f), script=True)
+
+        def call_machine():
+            with torch.no_grad():
+                machine(IO(x_f))
+
+        def call_exported(module=exported):
+            with torch.no_grad():
+                module(x_f)
+
+        machine_us = latency(call_machine, iterations)
+        exported_us = latency(call_exported, iterations)
+        scripted_us = latency(lambda: call_exported(scripted), iterations)
+        print(
+            f"{batch_size:>6} {features:>9} {machine_us:>13.1f} {exported_us:>14.1f}"
+            f" {scripted_us:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark the throughput of fit() against a hand-written loop around learn()
+
+The hand-written loop creates a State and moves each batch to the device on every
+iteration. fit() loads the batches in a background thread and resets one State
+
+usage: python benchmarks/bench_fit.py
+"""
+
+# 1st party
+import time
+
+# 3rd party
+import torch
+from torch import nn
+from torch.utils.data import DataLoader, TensorDataset
+
+# local
+from zenkai import OptimFactory, ThLoss
+from zenkai.kaku import IO, fit
+from zenkai.kikai import GradLearner
+
+
+def create_learner(device) -> GradLearner:
+
+    return GradLearner(
+        [nn.Linear(64, 128), nn.ReLU(), nn.Linear(128, 16)],
+        ThLoss("MSELoss"),
+        OptimFactory("Adam", lr=1e-3),
+    ).to(device)
+
+
+def run_manual(loader: DataLoader, device) -> float:
+
+    learner = create_learner(device)
+    start = time.perf_counter()
+    for x, t in loader:
+        learner.learn(IO(x.to(device)), IO(t.to(device)))
+    return time.perf_counter() - start
+
+
+def run_fit(loader: DataLoader, device) -> float:
+
+    learner = create_learner(device)
+    start = time.perf_counter()
+    fit(learner, loader)
+    return time.perf_counter() - start
+
+
+def main():
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    n = 2 ** 15
+    dataset = TensorDataset(torch.rand(n, 64), torch.rand(n, 16))
+    print(f"{'batch size':>10} {'manual (samples/s)':>20} {'fit (samples/s)':>20}")
+    for batch_size in [64, 256, 1024]:
+        loader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
+        manual = run_manual(loader, device)
+        fitted = run_fit(loader, device)
+        print(f"{batch_size:>10} {n / manual:>20.0f} {n / fitted:>20.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark the per-call overhead of learn() for a small learner
+
+The learner is a 16-unit linear GradLearner so the time is dominated by the
+Python overhead of learn() rather than the math. The overhead is the time of
+learn() minus the time of the same update written directly in torch. Run the
+script before and after a change to compare
+
+usage: python benchmarks/bench_learn_overhead.py
+"""
+
+# 1st party
+import time
+
+# 3rd party
+import torch
+from torch import nn
+
+# local
+from zenkai import OptimFactory, ThLoss
+from zenkai.kaku import IO
+from zenkai.kikai import GradLearner
+
+
+def create_learner() -> GradLearner:
+
+    return GradLearner(
+        nn.Linear(16, 16), ThLoss("MSELoss"), OptimFactory("SGD", lr=1e-2)
+    )
+
+
+def per_call(f, iterations: int) -> float:
+    """The mean microseconds per call"""
+    for _ in range(iterations // 10):
+        f()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        f()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+
+    torch.set_num_threads(1)
+    iterations = 5000
+    x_f, t_f = torch.rand(8, 16), torch.rand(8, 16)
+
+    linear = nn.Linear(16, 16)
+    optim = torch.optim.SGD(linear.parameters(), lr=1e-2)
+
+    def raw():
+        optim.zero_grad()
+        loss = nn.functional.mse_loss(linear(x_f), t_f)
+        loss.backward()
+        optim.step()
+
+    learner = create_learner()
+    x, t = IO(x_f), IO(t_f)
+
+    reused = create_learner()
+    reused.reuse_state = True
+
+    raw_us = per_call(raw, iterations)
+    learn_us = per_call(lambda: learner.learn(x, t), iterations)
+    reused_us = per_call(lambda: reused.learn(x, t), iterations)
+    forward_us = per_call(lambda: learner(x), iterations)
+
+    print(f"{'path':<24}{'us/call':>10}{'overhead (us)':>16}")
+    print(f"{'torch':<24}{raw_us:>10.1f}{0.0:>16.1f}")
+    print(f"{'learn()':<24}{learn_us:>10.1f}{learn_us - raw_us:>16.1f}")
+    print(f"{'learn() reuse_state':<24}{reused_us:>10.1f}{reused_us - raw_us:>16.1f}")
+    print(f"{'forward':<24}{forward_us:>10.1f}{'':>16}")
+
+
+if __name__ == "__main__":
+    main()
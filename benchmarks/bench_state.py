@@ -0,0 +1,75 @@
+"""
+Benchmark storing and retrieving values for a learner and input in State and CompactState
+
+Each iteration sets and gets three values for the same learner and input, the
+pattern of the learning machines. CompactState resolves the container for the
+pair once, the handle skips the lookup completely. Run the script before and
+after a change to compare
+
+usage: python benchmarks/bench_state.py
+"""
+
+# 1st party
+import time
+
+# 3rd party
+import torch
+from torch import nn
+
+# local
+from zenkai.kaku import IO, CompactState, IDable, State
+
+
+class Learner(IDable, nn.Module):
+    pass
+
+
+def per_call(f, iterations: int) -> float:
+    """The mean microseconds per call"""
+    for _ in range(iterations // 10):
+        f()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        f()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+
+    iterations = 100000
+    learner = Learner()
+    x = IO(torch.rand(8, 16))
+    keys = ("y", "grad", "loss")
+
+    def access(state):
+        def f():
+            for key in keys:
+                state[learner, x, key] = 1
+            for key in keys:
+                state[learner, x, key]
+
+        return f
+
+    def access_handle(state):
+        handle = state.handle(learner, x)
+
+        def f():
+            for key in keys:
+                handle[key] = 1
+            for key in keys:
+                handle[key]
+
+        return f
+
+    state_us = per_call(access(State()), iterations)
+    compact_us = per_call(access(CompactState()), iterations)
+    handle_us = per_call(access_handle(CompactState()), iterations)
+
+    print(f"{'state':<24}{'us/iteration':>14}{'speedup':>10}")
+    print(f"{'State':<24}{state_us:>14.2f}{1.0:>10.2f}")
+    print(f"{'CompactState':<24}{compact_us:>14.2f}{state_us / compact_us:>10.2f}")
+    print(f"{'CompactState handle':<24}{handle_us:>14.2f}{state_us / handle_us:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
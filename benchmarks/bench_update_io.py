@@ -0,0 +1,47 @@
+"""
+Benchmark the cost of one epoch of minibatch updates with update_io
+
+Compares cloning the destination on every update (the default) with writing the
+minibatch rows into the destination in place. Cloning makes an epoch O(N^2 / batch_size)
+while the in place update is O(N)
+
+usage: python benchmarks/bench_update_io.py
+"""
+
+# 1st party
+import time
+
+# 3rd party
+import torch
+
+# local
+from zenkai.kaku import IO, Idx, update_io
+
+
+def run_epoch(n: int, features: int, batch_size: int, inplace: bool) -> float:
+
+    destination = IO(torch.rand(n, features))
+    source = torch.rand(batch_size, features)
+    indices = torch.randperm(n)
+    start = time.perf_counter()
+    for i in range(0, n, batch_size):
+        idx = Idx(indices[i : i + batch_size])
+        destination = update_io(
+            IO(source[: len(idx)]), destination, idx, inplace=inplace
+        )
+    return time.perf_counter() - start
+
+
+def main():
+
+    features = 64
+    batch_size = 128
+    print(f"{'n':>8} {'clone (s)':>12} {'inplace (s)':>12}")
+    for n in [2 ** 10, 2 ** 12, 2 ** 14, 2 ** 16]:
+        cloned = run_epoch(n, features, batch_size, False)
+        inplace = run_epoch(n, features, batch_size, True)
+        print(f"{n:>8} {cloned:>12.4f} {inplace:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
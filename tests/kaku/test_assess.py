@@ -242,6 +242,14 @@ class TestThLoss:
         loss = ThLoss("MSELoss", "mean", maximize=True)
         assert loss.maximize is True
 
+    def test_th_loss_upcasts_bfloat16_to_float32(self):
+
+        x = torch.rand(4, 2).bfloat16()
+        t = torch.rand(4, 2)
+        loss = ThLoss("MSELoss", "mean")
+        evaluation = loss.assess(IO(x), IO(t))
+        assert evaluation.value.dtype == torch.float32
+
 
 class TestLookup:
     def test_lookup_gets_mse_loss(self):
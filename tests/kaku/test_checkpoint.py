@@ -0,0 +1,117 @@
+import os
+
+import pytest
+import torch
+from torch import nn
+
+from zenkai.kaku import (
+    Assessment,
+    Checkpoint,
+    CheckpointWriter,
+    Population,
+    State,
+    load_checkpoint,
+    save_checkpoint,
+    state_populations,
+)
+
+
+def create_items():
+    linear = nn.Linear(4, 3)
+    optim = torch.optim.Adam(linear.parameters())
+    linear(torch.rand(2, 4)).sum().backward()
+    optim.step()
+    return linear, optim
+
+
+class TestCheckpoint:
+    def test_load_checkpoint_restores_module_and_optimizer(self, tmp_path):
+        linear, optim = create_items()
+        path = str(tmp_path / "checkpoint")
+        save_checkpoint(path, {"linear": linear.state_dict(), "optim": optim.state_dict()})
+        loaded = load_checkpoint(path)
+        linear2 = nn.Linear(4, 3)
+        linear2.load_state_dict(loaded["linear"])
+        assert (linear2.weight == linear.weight).all()
+        optim2 = torch.optim.Adam(linear2.parameters())
+        optim2.load_state_dict(loaded["optim"])
+        assert (
+            optim2.state_dict()["state"][0]["exp_avg"]
+            == optim.state_dict()["state"][0]["exp_avg"]
+        ).all()
+
+    def test_save_checkpoint_splits_tensors_into_shards(self, tmp_path):
+        path = str(tmp_path / "checkpoint")
+        tensors = {"a": torch.rand(64), "b": torch.rand(64).double(), "c": torch.rand(8)}
+        save_checkpoint(path, tensors, shard_size=300)
+        checkpoint = Checkpoint(path)
+        assert len([f for f in (tmp_path / "checkpoint").iterdir() if f.suffix == ".bin"]) == 3
+        for key, value in tensors.items():
+            assert (checkpoint[key] == value).all()
+            assert checkpoint[key].dtype == value.dtype
+
+    def test_checkpoint_restores_population_and_assessments(self, tmp_path):
+        population = Population(x=torch.rand(3, 2))
+        population.report(Assessment(torch.rand(3)))
+        path = str(tmp_path / "checkpoint")
+        save_checkpoint(path, {"population": population, "betas": (0.9, 0.99)})
+        checkpoint = Checkpoint(path)
+        loaded = checkpoint["population"]
+        assert isinstance(loaded, Population)
+        assert (loaded["x"] == population["x"]).all()
+        assert (loaded.stack_assessments().value == population.stack_assessments().value).all()
+        assert checkpoint["betas"] == (0.9, 0.99)
+
+    def test_checkpoint_restores_population_without_assessments(self, tmp_path):
+        population = Population(x=torch.rand(3, 2))
+        population._assessments = []
+        path = str(tmp_path / "checkpoint")
+        save_checkpoint(path, {"population": population})
+        loaded = Checkpoint(path)["population"]
+        assert (loaded["x"] == population["x"]).all()
+
+    def test_save_checkpoint_replaces_existing_checkpoint(self, tmp_path):
+        path = str(tmp_path / "checkpoint")
+        save_checkpoint(path, {"x": torch.zeros(2)})
+        save_checkpoint(path, {"x": torch.ones(2)})
+        assert (Checkpoint(path)["x"] == 1.0).all()
+        assert not os.path.exists(path + ".old")
+
+    def test_checkpoint_opens_previous_checkpoint_if_write_was_interrupted(
+        self, tmp_path
+    ):
+        path = str(tmp_path / "checkpoint")
+        save_checkpoint(path, {"x": torch.ones(2)})
+        os.replace(path, path + ".old")
+        assert (Checkpoint(path)["x"] == 1.0).all()
+
+    def test_checkpoint_raises_error_if_not_found(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            Checkpoint(str(tmp_path / "missing"))
+
+    def test_save_checkpoint_raises_error_for_unsupported_value(self, tmp_path):
+        with pytest.raises(TypeError):
+            save_checkpoint(str(tmp_path / "checkpoint"), {"x": object()})
+
+
+class TestCheckpointWriter:
+    def test_writer_saves_a_snapshot_of_the_tensors(self, tmp_path):
+        x = torch.rand(4)
+        expected = x.clone()
+        writer = CheckpointWriter()
+        path = str(tmp_path / "checkpoint")
+        writer.save(path, {"x": x})
+        x.add_(1.0)
+        writer.close()
+        assert (Checkpoint(path)["x"] == expected).all()
+
+
+class TestStatePopulations:
+    def test_state_populations_retrieves_populations(self):
+        state = State()
+        population = Population(x=torch.rand(3, 2))
+        obj = object()
+        state[obj, "population"] = population
+        populations = state_populations(state)
+        assert len(populations) == 1
+        assert next(iter(populations.values())) is population
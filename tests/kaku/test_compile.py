@@ -0,0 +1,80 @@
+import pytest
+import torch
+from torch import nn
+
+from zenkai.kaku import IO, ThLoss, CompiledFunction
+
+
+class TestCompiledFunction:
+    def test_compiled_function_outputs_same_as_eager(self):
+        linear = nn.Linear(2, 3)
+        x = torch.rand(4, 2)
+        compiled = CompiledFunction(linear)
+        assert torch.allclose(compiled(x), linear(x))
+
+    def test_compiled_function_compiles_for_each_shape(self):
+        compiled = CompiledFunction(nn.Linear(2, 3))
+        compiled(torch.rand(4, 2))
+        compiled(torch.rand(4, 2))
+        compiled(torch.rand(8, 2))
+        assert len(compiled._cache) == 2
+
+    def test_compiled_function_executes_eagerly_after_max_shapes(self):
+        compiled = CompiledFunction(nn.Linear(2, 3), max_shapes=1)
+        compiled(torch.rand(4, 2))
+        compiled(torch.rand(8, 2))
+        assert compiled._cache[list(compiled._cache.keys())[1]] is CompiledFunction.EAGER
+
+    def test_compiled_function_falls_back_to_eager_if_compiled_fails(self):
+        dynamo_exc = pytest.importorskip("torch._dynamo.exc")
+        linear = nn.Linear(2, 3)
+        compiled = CompiledFunction(linear)
+
+        def fail(*args):
+            raise dynamo_exc.Unsupported("graph break")
+
+        compiled._compile = lambda: fail
+        x = torch.rand(4, 2)
+        with pytest.warns(UserWarning):
+            y = compiled(x)
+        assert torch.allclose(y, linear(x))
+        assert compiled.fallbacks == 1
+        assert compiled.shapes() == []
+
+
+    def test_compiled_function_raises_errors_not_caused_by_compiling(self):
+        compiled = CompiledFunction(nn.Linear(2, 3))
+
+        def fail(*args):
+            raise ValueError()
+
+        compiled._compile = lambda: fail
+        with pytest.raises(ValueError):
+            compiled(torch.rand(4, 2))
+
+
+class TestCompilable:
+    def test_compiled_returns_f_if_not_enabled(self):
+        loss = ThLoss("MSELoss")
+        linear = nn.Linear(2, 3)
+        assert loss.compiled("linear", linear) is linear
+
+    def test_th_loss_outputs_same_loss_when_compiled(self):
+        loss = ThLoss("MSELoss").set_compile()
+        x, t = torch.rand(4, 2), torch.rand(4, 2)
+        assert torch.isclose(loss(IO(x), IO(t)), ((x - t) ** 2).mean())
+        assert len(loss._compiled_fns) == 1
+
+    def test_compiled_compiles_again_if_f_changes_for_key(self):
+        loss = ThLoss("MSELoss").set_compile()
+        linear, linear2 = nn.Linear(2, 3), nn.Linear(2, 3)
+        assert loss.compiled("linear", linear).f is linear
+        assert loss.compiled("linear", linear2).f is linear2
+
+    def test_th_loss_reuses_the_loss_module(self):
+        loss = ThLoss("MSELoss").set_compile()
+        x, t = torch.rand(4, 2), torch.rand(4, 2)
+        loss(IO(x), IO(t))
+        compiled = loss._compiled_fns[("loss", "mean")]
+        loss(IO(x), IO(t))
+        assert loss._compiled_fns[("loss", "mean")] is compiled
@@ -0,0 +1,179 @@
+import copy
+import threading
+
+import pytest
+import torch
+from torch import nn
+from torch.utils.data import TensorDataset
+
+from zenkai import OptimFactory, ThLoss
+from zenkai.kikai import GradLearner
+from zenkai.kaku import (
+    IO,
+    fit,
+    evaluate,
+    Prefetcher,
+    RunningAssessment,
+    Assessment,
+    AssessmentDict,
+)
+from .test_machine import SimpleLearner
+
+
+class TestPrefetcher:
+    def test_prefetcher_outputs_io_pairs(self):
+        batches = [(torch.rand(2, 2), torch.rand(2, 3)) for _ in range(3)]
+        result = list(Prefetcher(batches))
+        assert len(result) == 3
+        assert isinstance(result[0][0], IO)
+        assert (result[1][1].f == batches[1][1]).all()
+
+    def test_prefetcher_raises_error_of_loader(self):
+        def batches():
+            yield torch.rand(2, 2), torch.rand(2, 3)
+            raise ValueError()
+
+        with pytest.raises(ValueError):
+            list(Prefetcher(batches()))
+
+    def test_prefetcher_stops_when_iteration_stops_early(self):
+        batches = [(torch.rand(2, 2), torch.rand(2, 3)) for _ in range(10)]
+        for _ in Prefetcher(batches, n_prefetch=1):
+            break
+
+    def test_prefetcher_without_prefetch_does_not_start_a_thread(self):
+        batches = [(torch.rand(2, 2), torch.rand(2, 3)) for _ in range(3)]
+        n_threads = threading.active_count()
+        for x, _ in Prefetcher(batches, n_prefetch=0):
+            assert threading.active_count() == n_threads
+            assert isinstance(x, IO)
+
+
+class TestRunningAssessment:
+    def test_mean_returns_mean_of_all_values(self):
+        running = RunningAssessment()
+        running.update(Assessment(torch.tensor([1.0, 2.0])))
+        running.update(Assessment(torch.tensor([3.0])))
+        assert running.mean()["loss"].value.item() == 2.0
+        assert running.count() == 3
+
+    def test_mean_weights_scalar_assessments(self):
+        running = RunningAssessment()
+        running.update(Assessment(torch.tensor(1.0)), 3)
+        running.update(Assessment(torch.tensor(3.0)), 1)
+        assert running.mean()["loss"].value.item() == 1.5
+        assert running.count() == 4
+
+    def test_mean_uses_names_of_assessment_dict(self):
+        running = RunningAssessment()
+        running.update(AssessmentDict(x=Assessment(torch.tensor(1.0))))
+        assert running.mean()["x"].value.item() == 1.0
+
+
+class TestFit:
+    def test_fit_returns_assessment_for_each_epoch(self):
+        learner = SimpleLearner(2, 3)
+        dataset = TensorDataset(torch.rand(16, 2), torch.rand(16, 3))
+        results = fit(learner, dataset, epochs=2, batch_size=4)
+        assert len(results) == 2
+        assert results[0]["loss"].value.dim() == 0
+
+    def test_fit_updates_the_parameters(self):
+        learner = SimpleLearner(2, 3)
+        before = learner.linear.weight.clone()
+        batches = [(torch.rand(4, 2), torch.rand(4, 3)) for _ in range(3)]
+        fit(learner, batches, accumulation_steps=2)
+        assert (learner.linear.weight != before).any()
+
+    def test_fit_with_accumulation_matches_a_step_on_the_mean_loss_if_averaged(self):
+        torch.manual_seed(1)
+        linear = nn.Linear(2, 3)
+        reference = copy.deepcopy(linear)
+        learner = GradLearner(
+            [linear],
+            criterion=ThLoss(nn.MSELoss),
+            optim_factory=OptimFactory(torch.optim.SGD, lr=1e-1),
+            average_grads=True,
+        )
+        batches = [(torch.rand(4, 2), torch.rand(4, 3)) for _ in range(2)]
+        fit(learner, batches, accumulation_steps=2)
+
+        optim = torch.optim.SGD(reference.parameters(), lr=1e-1)
+        loss = sum(nn.functional.mse_loss(reference(x), t) for x, t in batches) / 2
+        loss.backward()
+        optim.step()
+        assert torch.allclose(linear.weight, reference.weight)
+        assert torch.allclose(linear.bias, reference.bias)
+
+    def test_fit_with_accumulation_matches_a_step_on_the_summed_loss(self):
+        torch.manual_seed(1)
+        linear = nn.Linear(2, 3)
+        reference = copy.deepcopy(linear)
+        learner = GradLearner(
+            [linear],
+            criterion=ThLoss(nn.MSELoss),
+            optim_factory=OptimFactory(torch.optim.SGD, lr=1e-1),
+        )
+        batches = [(torch.rand(4, 2), torch.rand(4, 3)) for _ in range(2)]
+        fit(learner, batches, accumulation_steps=2)
+
+        optim = torch.optim.SGD(reference.parameters(), lr=1e-1)
+        loss = sum(nn.functional.mse_loss(reference(x), t) for x, t in batches)
+        loss.backward()
+        optim.step()
+        assert torch.allclose(linear.weight, reference.weight)
+        assert torch.allclose(linear.bias, reference.bias)
+
+    def test_fit_weights_the_epoch_assessment_by_the_batch_sizes(self):
+        linear = nn.Linear(2, 3)
+        learner = GradLearner(
+            [linear],
+            criterion=ThLoss(nn.MSELoss),
+            optim_factory=OptimFactory(torch.optim.SGD, lr=0.0),
+        )
+        x, t = torch.rand(10, 2), torch.rand(10, 3)
+        results = fit(
+            learner, TensorDataset(x, t), batch_size=4, shuffle=False, n_prefetch=0
+        )
+        with torch.no_grad():
+            target = nn.functional.mse_loss(linear(x), t)
+        assert torch.isclose(results[0]["loss"].value, target)
+
+    def test_fit_raises_error_if_accumulation_steps_is_zero(self):
+        with pytest.raises(ValueError):
+            fit(SimpleLearner(2, 3), [], accumulation_steps=0)
+
+
+class TestRunningAssessmentReduce:
+    def test_reduce_computes_exact_reductions(self):
+        values = torch.rand(10)
+        running = RunningAssessment()
+        running.update(Assessment(values[:3]))
+        running.update(Assessment(values[3:]))
+        result = running.reduce()
+        assert torch.isclose(result["loss_mean"].value, values.mean())
+        assert torch.isclose(result["loss_var"].value, values.var(unbiased=False))
+        assert result["loss_min"].value == values.min()
+        assert result["loss_max"].value == values.max()
+
+    def test_reduce_raises_error_if_reduction_invalid(self):
+        running = RunningAssessment()
+        with pytest.raises(ValueError):
+            running.reduce(["median"])
+
+
+class TestEvaluate:
+    def test_evaluate_returns_mean_over_dataset(self):
+        learner = SimpleLearner(2, 3)
+        x, t = torch.rand(10, 2), torch.rand(10, 3)
+        result = evaluate(learner, TensorDataset(x, t), batch_size=4)
+        with torch.no_grad():
+            target = ((learner.linear(x) - t) ** 2).mean(dim=1)
+        assert torch.isclose(result["loss_mean"].value, target.mean())
+        assert torch.isclose(result["loss_max"].value, target.max())
+
+    def test_evaluate_restores_training_mode(self):
+        learner = SimpleLearner(2, 3)
+        learner.train()
+        evaluate(learner, [(torch.rand(2, 2), torch.rand(2, 3))])
+        assert learner.training
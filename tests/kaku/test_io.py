@@ -1,5 +1,5 @@
 import torch
-from zenkai.kaku import IO, Idx, ToIO, FromIO
+from zenkai.kaku import IO, Idx, IOBuffer, ToIO, FromIO, release_mode, update_io
 import pytest
 import numpy as np
 import typing
@@ -207,6 +207,12 @@ class TestIO:
         assert isinstance(y, typing.Tuple)
         assert len(y) == len(x)
 
+    def test_to_does_not_move_if_on_device(self):
+
+        x = IO(torch.rand(3, 2), 1)
+        tensors = x._x
+        assert x.to("cpu")._x is tensors
+
     def test_grad_update_updates_grad(self):
 
         vala = torch.rand(3, 2)
@@ -215,6 +221,70 @@ class TestIO:
         updated = x.grad_update()
         assert (updated.f == vala - vala.grad).all()
 
+    def test_release_clones_the_tensors_by_default(self):
+
+        x = IO(torch.rand(3, 2))
+        released = x.release()
+        assert released.f.data_ptr() != x.f.data_ptr()
+        assert not released.shared
+
+    def test_release_with_shared_shares_storage(self):
+
+        x = IO(torch.rand(3, 2, requires_grad=True) * 2)
+        released = x.release("shared")
+        assert released.f.data_ptr() == x.f.data_ptr()
+        assert released.f.grad_fn is None
+        assert released.shared
+
+    def test_release_with_shared_does_not_allocate_storage(self):
+
+        x = IO(torch.rand(3, 2), torch.rand(3, 4))
+        released = x.release("shared")
+        for x_i, released_i in zip(x, released):
+            assert (
+                released_i.untyped_storage().data_ptr()
+                == x_i.untyped_storage().data_ptr()
+            )
+
+    def test_own_copies_a_released_shared_io(self):
+
+        x = IO(torch.rand(3, 2))
+        released = x.release("shared").own()
+        released.f[0] = 2.0
+        assert released.f.data_ptr() != x.f.data_ptr()
+        assert (x.f[0] != 2.0).all()
+
+    def test_update_io_inplace_does_not_change_the_original(self):
+
+        x = IO(torch.rand(4, 3))
+        before = x.f.clone()
+        released = x.release("shared")
+        updated = update_io(
+            IO(torch.rand(2, 3)), released, Idx(torch.tensor([0, 2])), inplace=True
+        )
+        assert (x.f == before).all()
+        assert not (updated.f == before).all()
+
+    def test_own_raises_error_if_shared_io_was_written_to(self):
+
+        x = IO(torch.rand(3, 2))
+        released = x.release("shared")
+        released.f[0] = 2.0
+        with pytest.raises(RuntimeError):
+            released.own()
+
+    def test_out_uses_release_mode_of_context(self):
+
+        x = IO(torch.rand(3, 2))
+        with release_mode("shared"):
+            released = x.out(True)
+        assert released.f.data_ptr() == x.f.data_ptr()
+
+    def test_release_mode_raises_error_if_invalid(self):
+
+        with pytest.raises(ValueError):
+            release_mode("copy")
+
 
 class TestIdx:
     def test_idx_th_works_with_one_tensor(self):
@@ -257,6 +327,64 @@ class TestIdx:
         x2 = idx.update(x, x2)
         assert (x2.f == x.f).all()
 
+    def test_update__updates_destination_in_place(self):
+
+        idx = Idx(torch.tensor([0, 2, 1]).long())
+        x = IO(torch.rand(3, 3))
+        x2 = IO(torch.rand(4, 3))
+        base = x2.f
+        result = idx.update_(x, x2)
+        assert result.f is base
+        assert (base[idx.idx] == x.f).all()
+
+    def test_update__updates_with_both(self):
+
+        idx = Idx(torch.tensor([0, 2, 1]).long())
+        x = IO(torch.rand(4, 3))
+        x2 = IO(torch.rand(4, 3))
+        idx.update_(x, x2, True)
+        assert (x2.f[idx.idx] == x.f[idx.idx]).all()
+
+    def test_update__keeps_requires_grad(self):
+
+        idx = Idx(torch.tensor([0, 2]).long())
+        x = IO(torch.rand(2, 3))
+        x2 = IO(torch.rand(4, 3).requires_grad_())
+        idx.update_(x, x2)
+        assert x2.f.requires_grad
+        assert (x2.f[idx.idx] == x.f).all()
+
+    def test_update__copies_a_shared_destination(self):
+
+        idx = Idx(torch.tensor([0, 2]).long())
+        base = IO(torch.rand(4, 3))
+        before = base.f.clone()
+        x2 = base.release("shared")
+        idx.update_(IO(torch.rand(2, 3)), x2)
+        assert (base.f == before).all()
+
+    def test_update__casts_source_to_destination_dtype(self):
+
+        idx = Idx(torch.tensor([0, 2]).long())
+        x = IO(torch.rand(2, 3, dtype=torch.float64))
+        x2 = IO(torch.rand(4, 3))
+        idx.update_(x, x2)
+        assert x2.f.dtype == torch.float32
+        assert torch.allclose(x2.f[idx.idx], x.f.float())
+
+    def test_update__accepts_int32_index(self):
+
+        idx = Idx(torch.tensor([0, 2], dtype=torch.int32))
+        x = IO(torch.rand(2, 3))
+        x2 = IO(torch.rand(4, 3))
+        idx.update_(x, x2)
+        assert (x2.f[idx.idx.long()] == x.f).all()
+
+    def test_update__raises_error_if_shapes_differ_without_index(self):
+
+        with pytest.raises(ValueError):
+            Idx().update_(IO(torch.rand(2, 3)), IO(torch.rand(4, 3)))
+
     def test_update_th_updates(self):
 
         idx = Idx(torch.tensor([0, 2, 1]).long())
@@ -273,6 +401,46 @@ class TestIdx:
         x2 = idx.update_th(x, x2)
         assert (x2 == x).all()
 
+    def test_idx_th_with_slice_returns_a_view(self):
+
+        idx = Idx(slice(1, 3))
+        x = torch.rand(4, 3)
+        (x_idx,) = idx.idx_th(x)
+        assert (x_idx == x[1:3]).all()
+        assert x_idx.data_ptr() == x[1:3].data_ptr()
+
+    def test_update__with_slice_updates_destination(self):
+
+        idx = Idx(slice(1, 3))
+        x = IO(torch.rand(2, 3))
+        x2 = IO(torch.rand(4, 3))
+        idx.update_(x, x2)
+        assert (x2.f[1:3] == x.f).all()
+
+    def test_sub_of_slice_returns_subindex(self):
+
+        idx = Idx(slice(2, 6))
+        idx2 = idx.sub(Idx(torch.tensor([2, 0])))
+        assert (idx2.idx == torch.tensor([4, 2]).long()).all()
+
+    def test_sub_of_tensor_with_slice_returns_subindex(self):
+
+        idx = Idx(torch.tensor([5, 3, 1, 0]).long())
+        idx2 = idx.sub(Idx(slice(1, 3)))
+        assert (idx2.idx == torch.tensor([3, 1]).long()).all()
+
+    def test_idx_list_with_slice_returns_the_indices(self):
+
+        idx = Idx(slice(2, 5))
+        assert idx.idx_list() == [2, 3, 4]
+
+    def test_call_with_slice_aliases_the_indexed_io(self):
+
+        idx = Idx(slice(1, 3))
+        x = IO(torch.rand(4, 3))
+        idx(x).f[0] = 2.0
+        assert (x.f[1] == 2.0).all()
+
     def test_sub_returns_subindex(self):
 
         idx = Idx(torch.tensor([0, 2, 1]).long())
@@ -292,6 +460,66 @@ class TestIdx:
         assert (idx2.idx == torch.tensor([2, 0]).long()).all()
 
 
+class TestIOBuffer:
+    def test_io_contains_all_appended_values(self):
+
+        x1 = IO(torch.rand(3, 2), torch.rand(3, 4))
+        x2 = IO(torch.rand(2, 2), torch.rand(2, 4))
+        buffer = IOBuffer()
+        buffer.append(x1).append(x2)
+        io = buffer.io()
+        assert (io.f == torch.cat([x1.f, x2.f])).all()
+        assert (io.r == torch.cat([x1.r, x2.r])).all()
+
+    def test_io_shares_storage_with_buffer(self):
+
+        buffer = IOBuffer(8)
+        buffer.append(IO(torch.rand(3, 2)))
+        ptr = buffer.io().f.data_ptr()
+        buffer.append(IO(torch.rand(3, 2)))
+        assert buffer.io().f.data_ptr() == ptr
+        assert len(buffer) == 6
+
+    def test_capacity_grows_geometrically(self):
+
+        buffer = IOBuffer(4)
+        buffer.append(IO(torch.rand(3, 2)))
+        buffer.append(IO(torch.rand(3, 2)))
+        assert buffer.capacity == 8
+        assert len(buffer.io().f) == 6
+
+    def test_append_works_with_arrays(self):
+
+        x1 = np.random.randn(3, 2)
+        x2 = np.random.randn(3, 2)
+        buffer = IOBuffer()
+        buffer.append(IO(x1)).append(IO(x2))
+        assert (buffer.io().f == np.concatenate([x1, x2])).all()
+
+    def test_append_raises_error_if_incompatible_lengths(self):
+
+        buffer = IOBuffer()
+        buffer.append(IO(torch.rand(3, 2), torch.rand(3, 2)))
+        with pytest.raises(ValueError):
+            buffer.append(IO(torch.rand(3, 2)))
+
+    def test_append_raises_error_if_elements_have_different_rows(self):
+
+        buffer = IOBuffer()
+        buffer.append(IO(torch.rand(3, 2), torch.rand(3, 2)))
+        with pytest.raises(ValueError):
+            buffer.append(IO(torch.rand(3, 2), torch.rand(1, 2)))
+        assert len(buffer) == 3
+
+    def test_clear_empties_the_buffer(self):
+
+        buffer = IOBuffer()
+        buffer.append(IO(torch.rand(3, 2)))
+        buffer.clear()
+        assert len(buffer) == 0
+        assert len(buffer.io().f) == 0
+
+
 class TestToIO:
     def test_to_io_converts_to_io(self):
 
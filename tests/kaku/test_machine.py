@@ -124,6 +124,111 @@ class TestLearningMachineWithSimpleLearner:
         y = learner(x, core.State(), release=False)
         assert y.f.grad_fn is not None
 
+    def test_release_mode_shared_shares_storage_with_output(self):
+
+        learner = SimpleLearner(2, 3)
+        learner.release_mode = "shared"
+        x = IO(torch.rand(2, 2))
+        state = core.State()
+        y = learner(x, state, release=True)
+        assert y.f.grad_fn is None
+        assert y.f.data_ptr() == state[learner, x, "y"].f.data_ptr()
+
+    def test_release_mode_clone_copies_output(self):
+
+        learner = SimpleLearner(2, 3)
+        learner.release_mode = "clone"
+        x = IO(torch.rand(2, 2))
+        state = core.State()
+        y = learner(x, state, release=True)
+        assert y.f.data_ptr() != state[learner, x, "y"].f.data_ptr()
+
+    def test_new_state_returns_the_same_state_when_reuse_state(self):
+
+        learner = SimpleLearner(2, 3)
+        learner.reuse_state = True
+        state = learner.new_state()
+        state[learner, "y"] = 2
+        assert learner.new_state() is state
+        assert (learner, "y") not in state
+
+    def test_new_state_returns_a_new_state_when_reused_state_is_in_use(self):
+
+        learner = SimpleLearner(2, 3)
+        learner.reuse_state = True
+        states = []
+        learner.forward_hook(
+            lambda machine, x, y, state: states.append(machine.new_state()) or y
+        )
+        learner(IO(torch.rand(2, 2)))
+        assert states[0] is not learner._reused_state
+
+    def test_reentrant_call_does_not_reset_the_reused_state(self):
+
+        learner = SimpleLearner(2, 3)
+        learner.reuse_state = True
+        x = IO(torch.rand(2, 2))
+
+        def hook(machine, x, y, state):
+            state[machine, "outer"] = 1
+            if machine._state_depth == 1:
+                machine(IO(torch.rand(2, 2)))
+            assert (machine, "outer") in state
+            return y
+
+        learner.forward_hook(hook)
+        learner(x)
+
+    def test_forward_caches_unreleased_output(self):
+
+        learner = SimpleLearner(2, 3)
+        learner.forward_cache = True
+        x = IO(torch.rand(2, 2))
+        state = core.State()
+        learner(x, state)
+        y = learner.cached_y(x, state)
+        assert y.f.grad_fn is not None
+        assert learner.forward_cache_misses == 0
+
+    def test_forward_does_not_cache_output_by_default(self):
+
+        learner = SimpleLearner(2, 3)
+        x = IO(torch.rand(2, 2))
+        state = core.State()
+        learner(x, state)
+        assert state.get((learner, x, learner.FORWARD_Y)) is None
+
+    def test_learn_removes_cached_output_after_accumulating(self):
+
+        learner = SimpleLearner(2, 3)
+        x = IO(torch.rand(2, 2))
+        state = core.State()
+        learner.learn(x, IO(torch.rand(2, 3)), state)
+        assert state.get((learner, x, learner.FORWARD_Y)) is None
+
+    def test_learn_removes_cached_loss_after_accumulating(self):
+
+        learner = SimpleLearner(2, 3)
+        x = IO(torch.rand(2, 2))
+        state = core.State()
+        learner.learn(x, IO(torch.rand(2, 3)), state)
+        assert state.get((learner, x, learner.LEARN_LOSS)) is None
+
+    def test_cached_y_counts_miss_when_not_cached(self):
+
+        learner = SimpleLearner(2, 3)
+        x = IO(torch.rand(2, 2))
+        state = core.State()
+        learner.cached_y(x, state, consume=True)
+        assert learner.forward_cache_misses == 1
+        learner.cached_y(x, state)
+        assert learner.forward_cache_misses == 2
+
+    def test_new_state_returns_a_new_state_by_default(self):
+
+        learner = SimpleLearner(2, 3)
+        assert learner.new_state() is not learner.new_state()
+
     def test_step_x_updates_x(self):
 
         learner = SimpleLearner(2, 3)
@@ -179,6 +284,69 @@ class TestLearningMachineWithSimpleLearner:
         learner.test(x, t, state)
         assert state[hook, "hi"] == "hi"
 
+    def test_device_is_cleared_by_clear_device_cache(self):
+        learner = SimpleLearner(2, 3)
+        assert learner.device() == torch.device("cpu")
+        assert learner._device_cached
+        learner.clear_device_cache()
+        assert not learner._device_cached
+
+    def test_device_is_cleared_when_module_is_set(self):
+        learner = SimpleLearner(2, 3)
+        learner.device()
+        learner.linear = nn.Linear(2, 3)
+        assert not learner._device_cached
+
+    def test_device_is_kept_when_non_module_is_set(self):
+        learner = SimpleLearner(2, 3)
+        learner.device()
+        learner.forward_cache = True
+        assert learner._device_cached
+
+    def test_device_is_not_cached_without_parameters(self):
+        learner = SimpleLearner(2, 3)
+        linear = learner.linear
+        del learner.linear
+        assert learner.device() is None
+        assert not learner._device_cached
+        learner.linear = linear
+        assert learner.device() == torch.device("cpu")
+
+    def test_learn_returns_detached_assessment(self):
+        learner = SimpleLearner(2, 3)
+        assessment = learner.learn(IO(torch.rand(2, 2)), IO(torch.rand(2, 3)))
+        assert not assessment.value.requires_grad
+
+    def test_device_is_cleared_when_moved(self):
+        learner = SimpleLearner(2, 3)
+        learner.device()
+        learner.to(torch.device("cpu"))
+        assert not learner._device_cached
+
+    def test_learn_returns_y_without_hooks(self):
+        learner = SimpleLearner(2, 3)
+        assessment, y = learner.learn(
+            IO(torch.rand(2, 2)), IO(torch.rand(2, 3)), get_y=True
+        )
+        assert y.f.shape == torch.Size([2, 3])
+
+    def test_forward_outputs_bfloat16_with_autocast(self):
+        learner = SimpleLearner(2, 3).set_autocast(torch.bfloat16)
+        y = learner(IO(torch.rand(2, 2)))
+        assert y.f.dtype == torch.bfloat16
+
+    def test_learn_keeps_loss_and_parameters_in_float32_with_autocast(self):
+        learner = SimpleLearner(2, 3).set_autocast(torch.bfloat16)
+        assessment = learner.learn(IO(torch.rand(2, 2)), IO(torch.rand(2, 3)))
+        assert assessment.value.dtype == torch.float32
+        assert learner.linear.weight.dtype == torch.float32
+
+    def test_step_x_outputs_float32_with_autocast(self):
+        learner = SimpleLearner(2, 3).set_autocast(torch.bfloat16)
+        learner._base_step_x = lambda x, t, state: IO(x.f.bfloat16())
+        x_prime = learner.step_x(IO(torch.rand(2, 2)), IO(torch.rand(2, 3)), State())
+        assert x_prime.f.dtype == torch.float32
+
 
 class LayeredLearner(core.LearningMachine):
     def __init__(self, m1: SimpleLearner, m2: SimpleLearner):
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import torch
+
+from zenkai.kaku import MetricLog, State, Assessment
+
+
+class TestMetricLog:
+    def test_append_adds_value_to_column(self):
+        log = MetricLog(4)
+        log.append("x", "loss", torch.tensor(2.0))
+        assert log.column("x", "loss").tolist() == [2.0]
+
+    def test_append_takes_mean_of_non_scalar(self):
+        log = MetricLog(4)
+        log.append("x", "loss", torch.tensor([1.0, 3.0]))
+        assert log.column("x", "loss").tolist() == [2.0]
+
+    def test_column_overwrites_oldest_values_when_full(self):
+        log = MetricLog(3)
+        for i in range(5):
+            log.append("x", "loss", float(i))
+        assert log.column("x", "loss").tolist() == [2.0, 3.0, 4.0]
+        assert log.count("x", "loss") == 5
+
+    def test_init_raises_error_if_capacity_not_positive(self):
+        with pytest.raises(ValueError):
+            MetricLog(0)
+
+    def test_export_writes_npz_in_background(self, tmp_path):
+        log = MetricLog(4)
+        log.append("x", "loss", 1.0)
+        log.append("x", "loss", 2.0)
+        path = str(tmp_path / "metrics.npz")
+        log.export(path)
+        log.close()
+        assert np.load(path)["x/loss"].tolist() == [1.0, 2.0]
+
+    def test_export_writes_csv(self, tmp_path):
+        log = MetricLog(4)
+        log.append("x", "loss", 1.0)
+        path = str(tmp_path / "metrics.csv")
+        log.export(path, background=False)
+        with open(path) as file:
+            assert len(file.readlines()) == 2
+
+    def test_state_streams_logged_assessments(self):
+        log = MetricLog(4)
+        for _ in range(3):
+            state = State(metrics=log)
+            state.log_assessment("x", "layer", "loss", Assessment(torch.tensor(1.0)))
+        assert log.count(state.id("x"), "layer_loss") == 3
@@ -74,6 +74,31 @@ class TestAssessmentLog:
         log.update("y", "name", "validation", assessment2)
         assert log.as_assessment_dict()["name_validation"].value == assessment2.value
 
+    def test_deferred_update_keeps_assessment_pending(self):
+        log = AssessmentLog(deferred=True)
+        assessment = Assessment(torch.rand(1)[0], True)
+        log.update("x", "name", "validation", assessment)
+        assert len(log._pending) == 1
+
+    def test_deferred_as_assessment_dict_flushes_pending(self):
+        log = AssessmentLog(deferred=True)
+        assessment = Assessment(torch.rand(2), True)
+        log.update("x", "name", "validation", assessment)
+        result = log.as_assessment_dict()
+        assert len(log._pending) == 0
+        assert (result["name_validation"].value == assessment.value).all()
+
+    @pytest.mark.skipif(not torch.cuda.is_available(), reason="Requires cuda")
+    def test_deferred_flush_moves_assessments_to_cpu(self):
+        log = AssessmentLog(deferred=True)
+        assessment = Assessment(torch.rand(2, device="cuda"))
+        assessment2 = Assessment(torch.rand(3, device="cuda"))
+        log.update("x", "name", "validation", assessment)
+        log.update("y", "name2", "validation", assessment2)
+        result = log.as_assessment_dict()
+        assert result["name_validation"].value.device.type == "cpu"
+        assert (result["name2_validation"].value == assessment2.value.cpu()).all()
+
 
 class TestState:
     def test_store_stores_data(self):
@@ -263,3 +288,349 @@ class TestMyState:
         state.add_sub((x, "sub"))
         mine = state.mine(x)
         assert mine.subs["sub"] is state.sub((x, "sub"))
+
+
+class TestCompactState:
+    def test_store_stores_data(self):
+
+        x = X()
+        state = state2.CompactState()
+        state.set((x, "value"), 1)
+        assert state.get((x, "value")) == 1
+
+    def test_getitem_raises_error_if_invalid_key(self):
+
+        x = X()
+        state = state2.CompactState()
+        state.set((x, 2), 2)
+        with pytest.raises(KeyError):
+            state[x, 1]
+
+    def test_data_is_in_state_after_setting_with_sub_obj(self):
+
+        io = IO()
+        x = X()
+        state = state2.CompactState()
+        state[x, io, "x"] = 2
+        assert (x, io, "x") in state
+        assert (x, "x") not in state
+
+    def test_slot_is_the_same_for_the_same_object(self):
+
+        x = X()
+        state = state2.CompactState()
+        assert state.slot(x) == state.slot(x)
+        assert state.slot(x) != state.slot(x, IO())
+
+    def test_handle_retrieves_value_set_through_state(self):
+
+        x = X()
+        state = state2.CompactState()
+        handle = state.handle(x)
+        state[x, "y"] = 2
+        assert handle["y"] == 2
+
+    def test_handle_sets_value_in_state(self):
+
+        x = X()
+        state = state2.CompactState()
+        state.handle(x)["y"] = 3
+        assert state[x, "y"] == 3
+
+    def test_handle_raises_error_if_invalid_key(self):
+
+        state = state2.CompactState()
+        with pytest.raises(state2.StateKeyError):
+            state.handle(X())["y"]
+
+    def test_spawn_keeps_values_in_keep_only(self):
+
+        x = X()
+        state = state2.CompactState()
+        state.set((x, "z"), 2, True)
+        state.set((x, "w"), 2)
+        state_ = state.spawn()
+        assert isinstance(state_, state2.CompactState)
+        assert state_[x, "z"] == 2
+        assert (x, "w") not in state_
+
+    def test_sub_is_compact_state(self):
+
+        x = X()
+        state = state2.CompactState()
+        assert isinstance(state.sub((x, "sub")), state2.CompactState)
+
+    def test_my_state_sets_value_in_state(self):
+
+        x = X()
+        state = state2.CompactState()
+        my_state = state.mine(x)
+        my_state.x = 2
+        assert state[x, "x"] == 2
+
+
+class TestStateEviction:
+    def test_entry_is_evicted_when_io_is_collected(self):
+
+        x = X()
+        state = state2.State()
+        io = IO(torch.rand(2, 2))
+        state[x, io, "y"] = torch.rand(2, 2)
+        assert state.size()["values"] == 1
+        del io
+        assert state.size()["values"] == 0
+        assert state.size()["tracked"] == 0
+
+    def test_entry_is_not_evicted_when_io_is_alive(self):
+
+        x = X()
+        state = state2.State()
+        io = IO(torch.rand(2, 2))
+        state[x, io, "y"] = 2
+        assert state[x, io, "y"] == 2
+
+    def test_entry_with_io_tuple_is_evicted(self):
+
+        x = X()
+        state = state2.State()
+        io = IO(torch.rand(2, 2))
+        io2 = IO(torch.rand(2, 2))
+        state[x, (io, io2), "y"] = 2
+        del io2
+        assert state.size()["containers"] == 0
+
+    def test_compact_state_entry_is_evicted_and_slot_is_reused(self):
+
+        x = X()
+        state = state2.CompactState()
+        io = IO(torch.rand(2, 2))
+        state[x, io, "y"] = 2
+        slot = state.slot(x, io)
+        del io
+        io2 = IO(torch.rand(2, 2))
+        assert state.slot(x, io2) == slot
+        assert state.size()["containers"] == 1
+
+    def test_compact_state_does_not_return_evicted_container(self):
+
+        x = X()
+        state = state2.CompactState()
+        io = IO(torch.rand(2, 2))
+        state[x, io, "y"] = 2
+        del io
+        io2 = IO(torch.rand(2, 2))
+        assert (x, io2, "y") not in state
+
+    def test_compact_state_resolves_container_once(self):
+
+        x = X()
+        state = state2.CompactState()
+        io = IO(torch.rand(2, 2))
+        state[x, io, "y"] = 2
+        state._slots.clear()
+        assert state[x, io, "y"] == 2
+
+    def test_size_stays_flat_across_iterations(self):
+
+        x = X()
+        state = state2.State()
+        for _ in range(100):
+            io = IO(torch.rand(2, 2))
+            state[x, io, "y"] = torch.rand(2, 2)
+        assert state.size()["values"] == 1
+
+    def test_spawned_state_evicts_kept_entry(self):
+
+        x = X()
+        state = state2.State()
+        io = IO(torch.rand(2, 2))
+        state.set((x, io, "y"), 2, True)
+        state_ = state.spawn()
+        assert state_[x, io, "y"] == 2
+        del io
+        assert state_.size()["values"] == 0
+
+    def test_compact_removes_empty_containers(self):
+
+        x = X()
+        state = state2.State()
+        state.mine(x)
+        assert state.compact()["containers"] == 0
+
+
+class TestStateReset:
+    def test_reset_removes_values_not_kept(self):
+
+        x = X()
+        state = state2.State()
+        state[x, "y"] = 2
+        state.reset()
+        assert (x, "y") not in state
+
+    def test_reset_keeps_values_that_are_kept(self):
+
+        x = X()
+        state = state2.State()
+        state.set((x, "y"), 2, True)
+        state.reset()
+        assert state[x, "y"] == 2
+
+    def test_reset_reuses_the_containers(self):
+
+        x = X()
+        state = state2.CompactState()
+        handle = state.handle(x)
+        state.reset()
+        state[x, "y"] = 2
+        assert handle["y"] == 2
+
+    def test_reset_resets_subs(self):
+
+        x = X()
+        state = state2.State()
+        sub = state.sub((x, "sub"))
+        sub[x, "y"] = 2
+        state.reset()
+        assert state.sub((x, "sub")) is sub
+        assert (x, "y") not in sub
+
+    def test_buffer_returns_the_same_buffer_after_reset(self):
+
+        x = X()
+        state = state2.State()
+        buffer = state.buffer((x, "y"), torch.rand(2, 3))
+        state.reset()
+        assert state.buffer((x, "y"), torch.rand(2, 3)) is buffer
+
+    def test_buffer_reallocates_if_shape_differs(self):
+
+        x = X()
+        state = state2.State()
+        state.buffer((x, "y"), torch.rand(2, 3))
+        assert state.buffer((x, "y"), torch.rand(4, 3)).shape == torch.Size([4, 3])
+
+    def test_buffer_with_io_returns_io(self):
+
+        x = X()
+        state = state2.State()
+        buffer = state.buffer((x, "y"), IO(torch.rand(2, 3), torch.rand(2)))
+        assert isinstance(buffer, IO)
+        assert state.buffer((x, "y"), IO(torch.rand(2, 3), torch.rand(2))) is buffer
+
+    def test_clear_removes_the_values_for_the_object(self):
+
+        x = X()
+        state = state2.State()
+        state.set((x, "y"), 2, True)
+        state.clear(x)
+        assert (x, "y") not in state
+
+
+class TestStateMemory:
+    def test_memory_report_reports_bytes_per_key(self):
+
+        x = X()
+        state = state2.State()
+        state[x, "y"] = torch.zeros(4, dtype=torch.float32)
+        assert state.memory_report()[x.id]["y"] == 16
+
+    def test_memory_report_does_not_count_shared_storage_twice(self):
+
+        x = X()
+        state = state2.State()
+        y = torch.zeros(4, dtype=torch.float32)
+        state[x, "y"] = IO(y)
+        state[x, "y2"] = y[:2]
+        assert state.memory_total() == 16
+
+    def test_budget_evicts_least_recently_used_entry(self):
+
+        x = X()
+        state = state2.State().set_budget(40)
+        state[x, "a"] = torch.zeros(4)
+        state[x, "b"] = torch.zeros(4)
+        state[x, "a"]
+        state[x, "c"] = torch.zeros(4)
+        assert (x, "b") not in state
+        assert (x, "a") in state and (x, "c") in state
+
+    def test_budget_does_not_evict_kept_entries(self):
+
+        x = X()
+        state = state2.State().set_budget(20)
+        state.set((x, "a"), torch.zeros(4), True)
+        with pytest.raises(state2.StateBudgetError):
+            state[x, "b"] = torch.zeros(4)
+
+    def test_budget_raises_error_if_not_evicting(self):
+
+        x = X()
+        state = state2.State().set_budget(20, evict=False)
+        state[x, "a"] = torch.zeros(4)
+        with pytest.raises(state2.StateBudgetError):
+            state[x, "b"] = torch.zeros(4)
+
+    def test_budget_does_not_count_replaced_entry_twice(self):
+
+        x = X()
+        state = state2.State().set_budget(20, evict=False)
+        state[x, "a"] = torch.zeros(4)
+        state[x, "a"] = torch.zeros(4)
+        assert state._used == 16
+
+    def test_budget_removes_entries_of_collected_io(self):
+
+        x = X()
+        state = state2.State().set_budget(40)
+        io = IO(torch.rand(2, 2))
+        state[x, io, "y"] = torch.zeros(4)
+        del io
+        assert len(state._lru) == 0
+        assert state._used == 0
+
+    def test_budget_frees_entries_removed_by_reset(self):
+
+        x = X()
+        state = state2.State().set_budget(20, evict=False)
+        state[x, "a"] = torch.zeros(4)
+        state.reset()
+        state[x, "b"] = torch.zeros(4)
+        assert (x, "b") in state
+
+    def test_budget_does_not_count_storage_shared_by_entries_twice(self):
+
+        x = X()
+        state = state2.State().set_budget(20, evict=False)
+        y = torch.zeros(4, dtype=torch.float32)
+        state[x, "y"] = IO(y)
+        state[x, "y2"] = y[:2]
+        assert state._used == 16
+
+    def test_budget_frees_shared_storage_when_last_entry_is_removed(self):
+
+        x = X()
+        state = state2.State().set_budget(20, evict=False)
+        y = torch.zeros(4, dtype=torch.float32)
+        state[x, "y"] = y
+        state[x, "y2"] = y[:2]
+        state.reset()
+        assert state._used == 0
+
+    def test_budget_counts_values_set_with_a_handle(self):
+
+        x = X()
+        state = state2.CompactState().set_budget(20, evict=False)
+        handle = state.handle(x)
+        handle["a"] = torch.zeros(4)
+        assert state._used == 16
+        with pytest.raises(state2.StateBudgetError):
+            handle["b"] = torch.zeros(4)
+
+    def test_sub_state_has_the_budget_of_the_state(self):
+
+        x = X()
+        state = state2.State().set_budget(20, evict=False)
+        sub = state.sub((x, "sub"))
+        sub[x, "a"] = torch.zeros(4)
+        with pytest.raises(state2.StateBudgetError):
+            sub[x, "b"] = torch.zeros(4)
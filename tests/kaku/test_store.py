@@ -0,0 +1,60 @@
+import torch
+import numpy as np
+import pytest
+from zenkai.kaku import IO, Idx, IOStore
+
+
+class TestIOStore:
+    def test_create_stores_the_values(self, tmp_path):
+        x = torch.rand(8, 3)
+        t = torch.rand(8, 2)
+        store = IOStore.create(str(tmp_path), x, t)
+        io = store.io()
+        assert (io.f == x).all()
+        assert (io.u[1] == t).all()
+
+    def test_open_loads_the_created_store(self, tmp_path):
+        x = torch.rand(8, 3)
+        IOStore.create(str(tmp_path), x, names=["x"])
+        store = IOStore(str(tmp_path))
+        assert len(store) == 8
+        assert store.names == ["x"]
+        assert (store.io().f == x).all()
+
+    def test_open_raises_error_if_no_store(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            IOStore(str(tmp_path))
+
+    def test_io_does_not_copy_the_memmap(self, tmp_path):
+        store = IOStore.create(str(tmp_path), torch.rand(8, 3))
+        assert np.shares_memory(store.io().f.numpy(), store._arrays[0])
+
+    def test_getitem_with_slice_does_not_copy(self, tmp_path):
+        store = IOStore.create(str(tmp_path), torch.rand(8, 3))
+        io = store[slice(2, 4)]
+        assert io.f.shape == torch.Size([2, 3])
+        assert np.shares_memory(io.f.numpy(), store._arrays[0])
+
+    def test_getitem_with_idx_retrieves_rows(self, tmp_path):
+        x = torch.rand(8, 3)
+        store = IOStore.create(str(tmp_path), x)
+        io = store[Idx(torch.LongTensor([1, 5]))]
+        assert (io.f == x[[1, 5]]).all()
+
+    def test_allocate_and_write_fills_the_store(self, tmp_path):
+        store = IOStore.allocate(str(tmp_path), [(4, 2)], ["float32"])
+        x = torch.rand(2, 2)
+        store.write(2, IO(x))
+        store.flush()
+        assert (IOStore(str(tmp_path)).io().f[2:] == x).all()
+
+    def test_allocate_raises_error_if_first_dims_differ(self, tmp_path):
+        with pytest.raises(ValueError):
+            IOStore.allocate(str(tmp_path), [(4, 2), (3, 2)], ["float32", "float32"])
+
+    def test_loop_covers_all_rows(self, tmp_path):
+        x = torch.rand(10, 3)
+        store = IOStore.create(str(tmp_path), x)
+        ios = list(store.loop(4, shuffle=True))
+        assert sum(len(io.f) for io in ios) == 10
+        assert len(ios) == 3
@@ -0,0 +1,110 @@
+# 3rd party
+import torch
+from torch import nn
+
+from sklearn.linear_model import SGDRegressor
+
+# local
+from zenkai.kaku import IO, Criterion, State
+from zenkai.kikai import _export
+from zenkai.kikai._scikit import ScikitMachine, ScikitMultiMachine
+from zenkai.mod._scikit import MultiOutputScikitWrapper, ScikitWrapper
+from .test_container import SampleGraph
+from .test_grad import THGradLearnerT1
+from .test_pipeline import ScaledOutGraph
+
+
+class TestExport:
+    def test_export_returns_net_of_grad_learner(self):
+        learner = THGradLearnerT1(2, 3)
+        module = _export.export(learner)
+        x = torch.rand(4, 2)
+        assert not isinstance(module, _export.MachineModule)
+        assert torch.allclose(module(x), learner(IO(x)).f)
+
+    def test_export_returns_sequential_for_sequential_graph(self):
+        graph = SampleGraph()
+        x = torch.rand(4, 8)
+        module = _export.export(graph, IO(x))
+        assert isinstance(module, nn.Sequential)
+        assert torch.allclose(module(x), graph(IO(x)).f)
+
+    def test_export_wraps_graph_if_no_sample_input(self):
+        graph = SampleGraph()
+        x = torch.rand(4, 8)
+        module = _export.export(graph)
+        assert isinstance(module, _export.MachineModule)
+        assert torch.allclose(module(x), graph(IO(x)).f)
+
+    def test_export_wraps_graph_if_output_is_not_output_of_last_node(self):
+        graph = ScaledOutGraph()
+        x = torch.rand(4, 8)
+        module = _export.export(graph, IO(x))
+        assert isinstance(module, _export.MachineModule)
+        assert torch.allclose(module(x), graph(IO(x)).f)
+
+    def test_export_returns_module_of_scikit_machine(self):
+        machine = ScikitMachine(
+            ScikitWrapper.regressor(SGDRegressor(), 3), None, Criterion("MSELoss")
+        )
+        machine.step(IO(torch.randn(8, 3)), IO(torch.randn(8)), State())
+        module = _export.export(machine)
+        x = torch.rand(4, 3)
+        assert isinstance(module, ScikitWrapper)
+        assert torch.allclose(module(x), machine(IO(x)).f)
+
+    def test_export_returns_preprocessor_and_module_of_scikit_multi_machine(self):
+        machine = ScikitMultiMachine(
+            MultiOutputScikitWrapper.regressor(SGDRegressor(), 3, 2),
+            None,
+            Criterion("MSELoss"),
+            preprocessor=nn.Linear(3, 3),
+        )
+        module = _export.export(machine)
+        x = torch.rand(4, 3)
+        assert isinstance(module, nn.Sequential)
+        assert module[0].weight is machine._preprocessor.weight
+        assert isinstance(module[1], MultiOutputScikitWrapper)
+        with torch.no_grad():
+            assert torch.allclose(module(x), machine(IO(x)).f)
+
+    def test_export_returns_module_of_scikit_multi_machine_without_preprocessor(self):
+        machine = ScikitMultiMachine(
+            MultiOutputScikitWrapper.regressor(SGDRegressor(), 3, 2),
+            None,
+            Criterion("MSELoss"),
+        )
+        assert isinstance(_export.export(machine), MultiOutputScikitWrapper)
+
+    def test_export_wraps_machine_with_forward_hooks(self):
+        learner = THGradLearnerT1(2, 3)
+        learner.forward_hook(lambda machine, x, y, state: IO(y.f * 2))
+        x = torch.rand(4, 2)
+        module = _export.export(learner)
+        assert isinstance(module, _export.MachineModule)
+        assert torch.allclose(module(x), learner(IO(x)).f)
+
+    def test_export_copies_parameters(self):
+        learner = THGradLearnerT1(2, 3)
+        module = _export.export(learner, copy_params=True)
+        assert module[0].weight is not learner.linear.weight
+
+    def test_export_shares_parameters(self):
+        learner = THGradLearnerT1(2, 3)
+        module = _export.export(learner)
+        assert module[0].weight is learner.linear.weight
+
+    def test_export_does_not_change_training_mode_of_machine(self):
+        learner = THGradLearnerT1(2, 3)
+        learner.train()
+        module = _export.export(learner)
+        assert not module.training
+        assert learner.training
+        assert all(m.training for m in learner.modules())
+
+    def test_export_scripts_module(self):
+        learner = THGradLearnerT1(2, 3)
+        module = _export.export(learner, script=True)
+        x = torch.rand(4, 2)
+        assert isinstance(module, torch.jit.ScriptModule)
+        assert torch.allclose(module(x), learner(IO(x)).f)
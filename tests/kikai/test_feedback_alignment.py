@@ -122,6 +122,24 @@ class TestFALearner:
         x_prime = learner.step_x(x, t, state)
         assert (x_prime.f != x.f).any()
 
+    def test_fa_learner_counts_a_miss_if_forward_was_not_executed(self):
+
+        learner = _feedback_alignment.FALearner(
+            nn.Linear(3, 4),
+            nn.Linear(3, 4),
+            optim_factory=OptimFactory("SGD", lr=1e-2),
+            activation=nn.Sigmoid(),
+            criterion="MSELoss",
+        )
+        x, t = IO(torch.rand(3, 3)), IO(torch.rand(3, 4))
+        state = State()
+        learner.accumulate(x, t, state)
+        assert learner.forward_cache_misses == 1
+        state = State()
+        learner(x, state)
+        learner.accumulate(x, t, state)
+        assert learner.forward_cache_misses == 1
+
 
 class TestDFALearner:
     def test_dfa__learner_updates_the_parameters(self):
@@ -200,3 +218,23 @@ class TestDFALearner:
         learner.accumulate(x, t, state)
         x_prime = learner.step_x(x, t, state)
         assert (x_prime.f != x.f).any()
+
+    def test_dfa_learner_counts_a_miss_if_forward_was_not_executed(self):
+
+        learner = _feedback_alignment.DFALearner(
+            nn.Linear(3, 4),
+            nn.Linear(3, 4),
+            4,
+            3,
+            optim_factory=OptimFactory("SGD", lr=1e-2),
+            activation=nn.Sigmoid(),
+            criterion="MSELoss",
+        )
+        x, t = IO(torch.rand(3, 3)), IO(torch.rand(3, 3))
+        state = State()
+        learner.accumulate(x, t, state)
+        assert learner.forward_cache_misses == 1
+        state = State()
+        learner(x, state)
+        learner.accumulate(x, t, state)
+        assert learner.forward_cache_misses == 1
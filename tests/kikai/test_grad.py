@@ -49,6 +49,43 @@ class TestGradLearner1:
         y = learner.forward(x, State())
         assert y.f.grad_fn is None
 
+    def test_learn_computes_the_loss_once(self):
+
+        learner = THGradLearnerT1(2, 3)
+        calls = []
+        assess_y = learner.assess_y
+
+        def counted_assess_y(y, t, reduction_override=None):
+            calls.append(reduction_override)
+            return assess_y(y, t, reduction_override)
+
+        learner.assess_y = counted_assess_y
+        assessment = learner.learn(IO(torch.rand(2, 2)), IO(torch.rand(2, 3)))
+        assert len(calls) == 1
+        assert assessment.value.grad_fn is None
+
+    def test_accumulate_uses_cached_forward(self):
+
+        learner = THGradLearnerT1(2, 3)
+        learner.forward_cache = True
+        x = IO(torch.rand(2, 2))
+        t = IO(torch.rand(2, 3))
+        state = State()
+        learner(x, state)
+        learner.accumulate(x, t, state)
+        assert learner.forward_cache_misses == 0
+
+    def test_step_does_not_apply_the_grads_twice(self):
+
+        learner = THGradLearnerT1(2, 3)
+        x = IO(torch.rand(2, 2))
+        t = IO(torch.rand(2, 3))
+        state = State()
+        learner.learn(x, t, state)
+        before = learner.linear.weight.clone()
+        assert learner.step(x, t, state) is False
+        assert (learner.linear.weight == before).all()
+
     def test_step_x_updates_x(self):
 
         learner = THGradLearnerT1(2, 3)
@@ -75,6 +112,20 @@ class TestGradLearner1:
         after = utils.get_model_parameters(learner)
         assert (before != after).any()
 
+    def test_learn_with_compile_matches_eager(self):
+
+        learner = THGradLearnerT1(2, 3)
+        compiled = THGradLearnerT1(2, 3)
+        compiled.load_state_dict(learner.state_dict())
+        compiled.set_compile()
+        x = IO(torch.rand(4, 2))
+        t = IO(torch.rand(4, 3))
+        assert torch.isclose(
+            learner.learn(x, t).value, compiled.learn(x, t).value, atol=1e-6
+        )
+        assert torch.allclose(learner.linear.weight, compiled.linear.weight, atol=1e-6)
+        assert "net" in compiled._compiled_fns
+
 
 class TestTHGradLoopLearner:
     def test_assess_y_uses_correct_reduction(self):
@@ -155,3 +206,47 @@ class TestCriterionGrad:
         x = IO(torch.rand(3, 4))
         x_prime = learner.step_x(x, IO(torch.randint(0, 4, (3,))), State())
         assert (x.f != x_prime.f).any()
+
+
+def accumulate_twice(average: bool = False):
+
+    torch.manual_seed(1)
+    linear = nn.Linear(2, 3)
+    updater = _grad.GradUpdater(
+        linear,
+        torch.optim.SGD(linear.parameters(), lr=1.0),
+        to_update_x=False,
+        average=average,
+    )
+    x = IO(torch.rand(4, 2))
+    state = State()
+    for _ in range(2):
+        linear.zero_grad()
+        linear(x.f).sum().backward()
+        updater.accumulate(x, state)
+    return linear, updater, x, state
+
+
+class TestGradUpdater:
+    def test_update_steps_with_the_sum_of_the_accumulated_grads(self):
+
+        linear, updater, x, state = accumulate_twice()
+        before = utils.get_model_parameters(linear)
+        grad = utils.get_model_grads(linear)
+        updater.update(x, state)
+        assert torch.allclose(utils.get_model_parameters(linear), before - 2 * grad)
+
+    def test_update_steps_with_the_mean_of_the_accumulated_grads_if_averaged(self):
+
+        linear, updater, x, state = accumulate_twice(True)
+        before = utils.get_model_parameters(linear)
+        grad = utils.get_model_grads(linear)
+        updater.update(x, state)
+        assert torch.allclose(utils.get_model_parameters(linear), before - grad)
+
+    def test_accumulate_stores_the_summed_grads_for_the_input(self):
+
+        linear, updater, x, state = accumulate_twice()
+        assert torch.allclose(
+            state[updater, x, "grad"], 2 * utils.get_model_grads(linear)
+        )
@@ -1,8 +1,14 @@
+import numpy as np
 import torch
 
 from zenkai import utils
 from zenkai.kaku import IO, State
-from zenkai.kikai._iterable import IterStepTheta, IterStepX, IterHiddenStepTheta
+from zenkai.kikai._iterable import (
+    IterStepTheta,
+    IterStepX,
+    IterHiddenStepTheta,
+    StepLoop,
+)
 from ..kaku.test_machine import SimpleLearner
 
 
@@ -81,6 +87,75 @@ class TestIterStepX:
 
         assert (before != x.f).any()
 
+    def test_iter_step_x_does_not_write_to_x_with_minibatches(self):
+
+        torch.manual_seed(3)
+        learner1 = SimpleLearner(2, 3)
+        learner2 = SimpleLearner(3, 3)
+        x = IO(torch.rand(6, 2))
+        t = IO(torch.rand(6, 3))
+
+        iter_step = IterStepX(learner2, 2, 2)
+        state = State()
+        y1 = learner1(x, state)
+        learner2(y1, state)
+        learner2.step(y1, t, state)
+        before = torch.clone(y1.f)
+        x = iter_step.step_x(y1, t, state)
+
+        assert (before == y1.f).all()
+        assert (before != x.f).any()
+
+    def test_iter_step_x_writes_into_the_state_buffer_when_reused(self):
+
+        torch.manual_seed(3)
+        learner = SimpleLearner(3, 3)
+        iter_step = IterStepX(learner, 1, 2, reuse_buffer=True)
+        state = State()
+        x1 = iter_step.step_x(IO(torch.rand(6, 3)), IO(torch.rand(6, 3)), state)
+        ptr = x1.f.data_ptr()
+        state.reset()
+        x2 = iter_step.step_x(IO(torch.rand(6, 3)), IO(torch.rand(6, 3)), state)
+        assert x2.f.data_ptr() == ptr
+
+    def test_iter_step_x_updates_numpy_x_without_writing_to_it(self):
+
+        torch.manual_seed(3)
+        learner1 = SimpleLearner(2, 3)
+        learner2 = SimpleLearner(3, 3)
+        x = IO(torch.rand(6, 2))
+        t = IO(torch.rand(6, 3))
+
+        iter_step = IterStepX(learner2, 2, 2)
+        state = State()
+        y1 = learner1(x, state)
+        learner2(y1, state)
+        learner2.step(y1, t, state)
+        y1_np = y1.f.detach().numpy().copy()
+        before = y1_np.copy()
+        x = iter_step.step_x(IO(y1_np), t, state)
+
+        assert isinstance(x.f, torch.Tensor)
+        assert (before == y1_np).all()
+        assert (torch.from_numpy(before) != x.f).any()
+
+    def test_iter_step_x_updates_memory_mapped_x(self, tmp_path):
+
+        torch.manual_seed(3)
+        learner = SimpleLearner(3, 3)
+        t = IO(torch.rand(6, 3))
+        y = np.lib.format.open_memmap(
+            str(tmp_path / "y.npy"), mode="w+", dtype=np.float32, shape=(6, 3)
+        )
+        y[:] = np.random.rand(6, 3)
+        before = np.array(y)
+
+        iter_step = IterStepX(learner, 1, 2)
+        x = iter_step.step_x(IO(y), t, State())
+
+        assert (before == np.array(y)).all()
+        assert x.f.shape == torch.Size([6, 3])
+
 
 class TestIterStepHidden:
     def test_iter_outstep_updates_the_parameters_with_one_iteration(self):
@@ -96,3 +171,38 @@ class TestIterStepHidden:
         iter_step.step(x, t, state)
         after = utils.get_model_parameters(learner1)
         assert (before != after).any()
+
+
+class TestStepLoop:
+    def test_loop_covers_every_index_once_when_shuffled(self):
+
+        x = IO(torch.rand(10, 2))
+        loop = StepLoop(3, True)
+        indices = []
+        for idx in loop.loop(x):
+            indices.extend(idx.tolist())
+        assert sorted(indices) == list(range(10))
+
+    def test_loop_outputs_slices_when_not_shuffled(self):
+
+        x = IO(torch.rand(10, 2))
+        loop = StepLoop(4, False)
+        idxs = list(loop.loop(x))
+        assert all(idx.is_slice for idx in idxs)
+        assert [len(idx) for idx in idxs] == [4, 4, 2]
+
+    def test_contiguous_loop_outputs_views(self):
+
+        x = IO(torch.rand(10, 2))
+        loop = StepLoop(5, True, contiguous=True)
+        for idx in loop.loop(x):
+            x_idx = idx(x)
+            assert x_idx.f.data_ptr() == x.f[idx.idx].data_ptr()
+
+    def test_loop_outputs_one_index_if_batch_size_is_none(self):
+
+        x = IO(torch.rand(10, 2))
+        loop = StepLoop(None, True)
+        idxs = list(loop.loop(x))
+        assert len(idxs) == 1
+        assert idxs[0].idx is None
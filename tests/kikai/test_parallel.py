@@ -0,0 +1,142 @@
+# 1st party
+import os
+
+# 3rd party
+import pytest
+import torch
+import torch.distributed as dist
+
+# local
+from zenkai.kaku import IO, OptimFactory, State
+from zenkai.kikai import _parallel
+from zenkai.kikai._grad import GradStepTheta
+from zenkai.kikai._iterable import IterStepTheta
+from .test_grad import THGradLearnerT1
+
+
+class NestedStepLearner(THGradLearnerT1):
+    """Holds GradStepThetas nested in a StepTheta and in a list"""
+
+    def __init__(self):
+        super().__init__(2, 3)
+        self.iter_step = IterStepTheta(
+            GradStepTheta(self, OptimFactory(torch.optim.SGD, lr=1e-2))
+        )
+        self.steps = [GradStepTheta(self, OptimFactory(torch.optim.SGD, lr=1e-2))]
+
+
+class CountingLearner(THGradLearnerT1):
+    """Counts the calls to assess_y"""
+
+    def __init__(self):
+        super().__init__(2, 3)
+        self.n_assess = 0
+
+    def assess_y(self, y: IO, t: IO, reduction_override: str = None):
+        self.n_assess += 1
+        return super().assess_y(y, t, reduction_override)
+
+
+def _train(rank, world_size, state_dict, x, t, path):
+
+    learner = THGradLearnerT1(2, 3)
+    learner.load_state_dict(state_dict)
+    learner = _parallel.DataParallelLearner(learner)
+    x_shard, t_shard = learner.shard(IO(x), IO(t))
+    learner.learn(x_shard, t_shard)
+    torch.save(
+        {"linear": learner.learner.linear.state_dict(), "n": len(x_shard.f)},
+        os.path.join(path, f"{rank}.pt"),
+    )
+
+
+def _train_without_local_grads(rank, world_size, state_dict, x, t, path):
+
+    learner = THGradLearnerT1(2, 3)
+    learner.load_state_dict(state_dict)
+    learner = _parallel.DataParallelLearner(learner)
+    if rank == 0:
+        learner.learn(IO(x), IO(t))
+    else:
+        # no grads have been accumulated on this process
+        learner.step(IO(x), IO(t), State())
+    torch.save(
+        {"linear": learner.learner.linear.state_dict()},
+        os.path.join(path, f"{rank}.pt"),
+    )
+
+
+def _learn_counting_assess(rank, world_size, path):
+
+    learner = _parallel.DataParallelLearner(CountingLearner())
+    learner.learn(IO(torch.rand(4, 2)), IO(torch.rand(4, 3)))
+    torch.save(
+        {"n_assess": learner.learner.n_assess}, os.path.join(path, f"{rank}.pt")
+    )
+
+
+class TestGradUpdaters:
+    def test_grad_updaters_finds_updaters_of_nested_steps(self):
+        learner = NestedStepLearner()
+        updaters = _parallel.grad_updaters(learner)
+        assert len(updaters) == 3
+        assert learner.iter_step.base_step._grad_updater in updaters
+        assert learner.steps[0]._grad_updater in updaters
+
+
+class TestShardIO:
+    def test_shard_io_splits_the_batch(self):
+        x = IO(torch.rand(4, 2), 1)
+        shard = _parallel.shard_io(x, 1, 2)
+        assert (shard.f == x.f[2:]).all()
+        assert shard[1] == 1
+
+
+@pytest.mark.skipif(not dist.is_available(), reason="torch.distributed is not available")
+class TestDataParallelLearner:
+    def test_learn_on_two_processes_matches_the_full_batch(self, tmp_path):
+
+        learner = THGradLearnerT1(2, 3)
+        x, t = torch.rand(8, 2), torch.rand(8, 3)
+        _parallel.run_data_parallel(
+            _train, 2, learner.state_dict(), x, t, str(tmp_path), master_port=29531
+        )
+        learner.learn(IO(x), IO(t))
+        results = [torch.load(os.path.join(tmp_path, f"{i}.pt")) for i in range(2)]
+        assert results[0]["n"] == 4
+        for result in results:
+            assert torch.allclose(result["linear"]["weight"], learner.linear.weight)
+            assert torch.allclose(result["linear"]["bias"], learner.linear.bias)
+
+    def test_step_without_local_grads_keeps_processes_in_sync(self, tmp_path):
+
+        learner = THGradLearnerT1(2, 3)
+        x, t = torch.rand(4, 2), torch.rand(4, 3)
+        _parallel.run_data_parallel(
+            _train_without_local_grads,
+            2,
+            learner.state_dict(),
+            x,
+            t,
+            str(tmp_path),
+            master_port=29532,
+        )
+        results = [torch.load(os.path.join(tmp_path, f"{i}.pt")) for i in range(2)]
+        assert torch.allclose(
+            results[0]["linear"]["weight"], results[1]["linear"]["weight"]
+        )
+        assert (results[0]["linear"]["weight"] != learner.linear.weight).any()
+
+    def test_init_raises_error_if_group_not_initialized(self):
+        if dist.is_initialized():
+            return
+        with pytest.raises(RuntimeError):
+            _parallel.DataParallelLearner(THGradLearnerT1(2, 3))
+
+    def test_learn_computes_the_loss_once(self, tmp_path):
+
+        _parallel.run_data_parallel(
+            _learn_counting_assess, 2, str(tmp_path), master_port=29533
+        )
+        for i in range(2):
+            assert torch.load(os.path.join(tmp_path, f"{i}.pt"))["n_assess"] == 1
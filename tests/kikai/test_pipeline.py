@@ -0,0 +1,195 @@
+# 1st party
+import copy
+
+# 3rd party
+import pytest
+import torch
+from torch import nn
+
+# local
+from zenkai.kaku import IO, OptimFactory, State, ThLoss
+from zenkai.kikai import GradLearner, _pipeline
+from zenkai.utils import get_model_parameters
+from ..kaku.test_machine import SimpleLearner
+from .test_container import SampleGraph
+from .test_grad import THGradLearnerT1
+
+
+class StoredGraphLearner(SimpleLearner):
+    """Accumulates with the graph stored in the state by forward"""
+
+    def accumulate(self, x: IO, t: IO, state: State):
+        self.optim.zero_grad()
+        self.assess_y(state[self, x, "y"], t.detach()).backward()
+
+    def step_x(self, x: IO, t: IO, state: State) -> IO:
+        return IO(x.f - x.f.grad)
+
+    def step(self, x: IO, t: IO, state: State):
+        self.optim.step()
+
+
+class FailOnceLearner(StoredGraphLearner):
+    """Raises an error on the first call to accumulate"""
+
+    def __init__(self, in_features: int, out_features: int):
+        super().__init__(in_features, out_features)
+        self.n_accumulate = 0
+
+    def accumulate(self, x: IO, t: IO, state: State):
+        self.n_accumulate += 1
+        if self.n_accumulate == 1:
+            raise RuntimeError("Failed to accumulate")
+        super().accumulate(x, t, state)
+
+
+class ScaledInGraph(SampleGraph):
+    """Scales the input before the first node"""
+
+    def forward(self, x: IO, state: State, release: bool = True, *args, **kwargs) -> IO:
+        base_x = x
+        x = self.linear1(IO(x.f * 2), state, release, base_x)
+        x = self.linear2(x, state, release, base_x)
+        return self.linear3(x, state, release, base_x)
+
+
+class ScaledOutGraph(SampleGraph):
+    """Scales the output of the last node"""
+
+    def forward(self, x: IO, state: State, release: bool = True, *args, **kwargs) -> IO:
+        y = super().forward(x, state, release, *args, **kwargs)
+        return IO(y.f * 2)
+
+
+def sgd_learner(
+    in_features: int, out_features: int, average_grads: bool = False
+) -> GradLearner:
+    return GradLearner(
+        [nn.Linear(in_features, out_features)],
+        criterion=ThLoss(nn.MSELoss),
+        optim_factory=OptimFactory(torch.optim.SGD, lr=1e-1),
+        average_grads=average_grads,
+    )
+
+
+class TestGraphStages:
+    def test_graph_stages_returns_machines_in_order(self):
+        graph = SampleGraph()
+        stages = _pipeline.graph_stages(graph, IO(torch.rand(4, 8)))
+        assert stages == [
+            graph.linear1._learner,
+            graph.linear2._learner,
+            graph.linear3._learner,
+        ]
+
+    def test_graph_stages_raises_error_if_target_is_set(self):
+        graph = SampleGraph(target_out=True)
+        with pytest.raises(ValueError):
+            _pipeline.graph_stages(graph, IO(torch.rand(4, 8)))
+
+    def test_graph_stages_raises_error_if_input_is_not_input_of_first_node(self):
+        with pytest.raises(ValueError):
+            _pipeline.graph_stages(ScaledInGraph(), IO(torch.rand(4, 8)))
+
+    def test_graph_stages_raises_error_if_output_is_not_output_of_last_node(self):
+        with pytest.raises(ValueError):
+            _pipeline.graph_stages(ScaledOutGraph(), IO(torch.rand(4, 8)))
+
+
+class TestPipelineScheduler:
+    def test_learn_updates_every_stage(self):
+        stages = [THGradLearnerT1(8, 4), THGradLearnerT1(4, 4)]
+        before = [get_model_parameters(stage) for stage in stages]
+        with _pipeline.PipelineScheduler(stages, n_microbatches=2) as pipeline:
+            assessment = pipeline.learn(IO(torch.rand(8, 8)), IO(torch.rand(8, 4)))
+        assert assessment.value.dim() == 0
+        for before_i, stage in zip(before, stages):
+            assert (before_i != get_model_parameters(stage)).any()
+
+    def test_learn_with_one_microbatch_matches_sequential_steps(self):
+        stages = [THGradLearnerT1(8, 4), THGradLearnerT1(4, 4)]
+        expected = [THGradLearnerT1(8, 4), THGradLearnerT1(4, 4)]
+        for stage, expected_i in zip(stages, expected):
+            expected_i.load_state_dict(stage.state_dict())
+        x, t = IO(torch.rand(8, 8)), IO(torch.rand(8, 4))
+
+        state = State()
+        y = expected[0](x, state)
+        expected[1].accumulate(y, t, state)
+        x_prime = expected[1].step_x(y, t, state)
+        expected[1].step(y, t, state)
+        expected[0].accumulate(x, x_prime, state)
+        expected[0].step(x, x_prime, state)
+
+        with _pipeline.PipelineScheduler(stages, 1, "gpipe") as pipeline:
+            pipeline.learn(x, t)
+        for stage, expected_i in zip(stages, expected):
+            assert torch.allclose(
+                get_model_parameters(stage), get_model_parameters(expected_i)
+            )
+
+    def test_gpipe_with_microbatches_matches_a_step_on_the_full_batch(self):
+        stages = [sgd_learner(8, 4, True), sgd_learner(4, 4, True)]
+        net0 = copy.deepcopy(stages[0]._net)
+        net1 = copy.deepcopy(stages[1]._net)
+        x, t = torch.rand(8, 8), torch.rand(8, 4)
+
+        with _pipeline.PipelineScheduler(stages, 4, "gpipe") as pipeline:
+            pipeline.learn(IO(x), IO(t))
+
+        optim = torch.optim.SGD(net1.parameters(), lr=1e-1)
+        nn.functional.mse_loss(net1(net0(x).detach()), t).backward()
+        optim.step()
+        assert torch.allclose(
+            get_model_parameters(stages[1]), get_model_parameters(net1)
+        )
+
+    def test_gpipe_with_microbatches_matches_sequential_steps(self):
+        stages = [THGradLearnerT1(8, 4), THGradLearnerT1(4, 4)]
+        expected = [THGradLearnerT1(8, 4), THGradLearnerT1(4, 4)]
+        for stage, expected_i in zip(stages, expected):
+            expected_i.load_state_dict(stage.state_dict())
+        x, t = IO(torch.rand(8, 8)), IO(torch.rand(8, 4))
+
+        states = [State(), State()]
+        for mb in range(2):
+            x_mb, t_mb = _pipeline.shard_io(x, mb, 2), _pipeline.shard_io(t, mb, 2)
+            y = expected[0](x_mb, states[0])
+            expected[1].accumulate(y, t_mb, states[1])
+            x_prime = expected[1].step_x(y, t_mb, states[1])
+            expected[0].accumulate(x_mb, x_prime, states[0])
+        expected[1].step(y, t_mb, states[1])
+        expected[0].step(x_mb, x_prime, states[0])
+
+        with _pipeline.PipelineScheduler(stages, 2, "gpipe") as pipeline:
+            pipeline.learn(x, t)
+        for stage, expected_i in zip(stages, expected):
+            assert torch.allclose(
+                get_model_parameters(stage), get_model_parameters(expected_i)
+            )
+
+    def test_1f1b_with_microbatches_recomputes_stale_forward(self):
+        # a stale graph would raise an error in backward
+        stages = [StoredGraphLearner(8, 4), StoredGraphLearner(4, 4)]
+        before = [get_model_parameters(stage) for stage in stages]
+        with _pipeline.PipelineScheduler(stages, 4, "1f1b") as pipeline:
+            pipeline.learn(IO(torch.rand(8, 8)), IO(torch.rand(8, 4)))
+        assert pipeline._steps == [4, 4]
+        for before_i, stage in zip(before, stages):
+            assert (before_i != get_model_parameters(stage)).any()
+
+    def test_learn_raises_error_of_a_stage(self):
+        stages = [THGradLearnerT1(8, 4), THGradLearnerT1(4, 4)]
+        pipeline = _pipeline.PipelineScheduler(stages, n_microbatches=2)
+        with pytest.raises(RuntimeError):
+            pipeline.learn(IO(torch.rand(8, 3)), IO(torch.rand(8, 4)))
+
+    def test_learn_does_not_step_after_an_error(self):
+        stages = [THGradLearnerT1(8, 4), FailOnceLearner(4, 4)]
+        before = [get_model_parameters(stage) for stage in stages]
+        pipeline = _pipeline.PipelineScheduler(stages, n_microbatches=4)
+        with pytest.raises(RuntimeError):
+            pipeline.learn(IO(torch.rand(8, 8)), IO(torch.rand(8, 4)))
+        assert pipeline._steps == [0, 0]
+        for before_i, stage in zip(before, stages):
+            assert (before_i == get_model_parameters(stage)).all()
@@ -34,6 +34,20 @@ class TestStackPostStepTheta:
         step_theta.step(x2, t2, state)
         assert (before != get_model_parameters(learner)).any()
 
+    def test_accumulate_stacks_both_inputs(self):
+
+        x1 = IO(torch.rand(5, 4))
+        t1 = IO(torch.rand(5, 3))
+        x2 = IO(torch.rand(5, 4))
+        t2 = IO(torch.rand(5, 3))
+        learner = SimpleLearner(4, 3)
+        state = State()
+        step_theta = _post.StackPostStepTheta(learner)
+        step_theta.accumulate(x1, t1, state)
+        step_theta.accumulate(x2, t2, state)
+        stacked = state[step_theta, "stack_x"].io()
+        assert (stacked.f == torch.cat([x1.f, x2.f])).all()
+
     def test_is_sampe_after_two_steps_but_no_advances(self):
 
         x1 = IO(torch.rand(5, 4))
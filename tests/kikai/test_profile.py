@@ -0,0 +1,109 @@
+import json
+
+import torch
+
+from zenkai.kaku import IO, State
+from zenkai.kikai.utils import MethodStats, Profiler, TraceRecorder, io_shapes
+from .test_container import SampleGraph
+from .test_grad import THGradLearnerT1
+
+
+class TestProfiler:
+    def test_profiler_records_forward_of_learner(self):
+
+        learner = THGradLearnerT1(2, 3)
+        with Profiler().attach(learner) as profiler:
+            learner(IO(torch.rand(4, 2)), State())
+        stats = profiler.stats()["THGradLearnerT1"]["forward"]
+        assert stats["count"] == 1
+        assert stats["in_shapes"] == [[(4, 2)]]
+        assert stats["out_shapes"] == [[(4, 3)]]
+
+    def test_profiler_records_nested_learners_in_graph(self):
+
+        graph = SampleGraph()
+        x = IO(torch.rand(4, 8))
+        t = IO(torch.rand(4, 4))
+        with Profiler().attach(graph) as profiler:
+            state = State()
+            graph(x, state)
+            graph.step(x, t, state)
+        stats = profiler.stats()
+        assert stats["SampleGraph.linear1._learner"]["step_x"]["count"] == 1
+        assert stats["SampleGraph.linear3._learner"]["accumulate"]["count"] == 1
+
+    def test_detach_restores_the_methods(self):
+
+        learner = THGradLearnerT1(2, 3)
+        forward = learner.forward
+        step = learner.__dict__.get("step")
+        profiler = Profiler().attach(learner)
+        profiler.detach()
+        assert learner.forward == forward
+        assert learner.__dict__.get("step") is step
+
+    def test_disabled_profiler_does_not_record(self):
+
+        learner = THGradLearnerT1(2, 3)
+        profiler = Profiler().attach(learner)
+        profiler.enabled = False
+        learner(IO(torch.rand(4, 2)), State())
+        assert profiler.stats() == {}
+        profiler.detach()
+
+    def test_summary_contains_the_machine(self):
+
+        learner = THGradLearnerT1(2, 3)
+        with Profiler().attach(learner) as profiler:
+            learner(IO(torch.rand(4, 2)), State())
+        assert "THGradLearnerT1" in profiler.summary()
+
+
+class TestMethodStats:
+    def test_method_stats_keeps_at_most_max_samples(self):
+
+        stats = MethodStats(max_samples=4)
+        for i in range(10):
+            stats.add(float(i), [], [])
+        assert len(stats.durations) == 4
+        assert stats.count == 10
+        assert stats.total == 45.0
+        assert stats.min == 0.0 and stats.max == 9.0
+        assert stats.mean == 4.5
+
+    def test_method_stats_p95_of_all_durations_below_max_samples(self):
+
+        stats = MethodStats()
+        for i in range(1, 101):
+            stats.add(float(i), [], [])
+        assert stats.p95 == 95.0
+
+
+class TestIOShapes:
+    def test_io_shapes_returns_shape_of_each_tensor(self):
+        assert io_shapes(IO(torch.rand(2, 3), torch.rand(2))) == [(2, 3), (2,)]
+
+
+class TestTraceRecorder:
+    def test_trace_recorder_records_nested_spans_in_learn(self):
+
+        learner = THGradLearnerT1(2, 3)
+        with TraceRecorder().attach(learner) as recorder:
+            learner.learn(IO(torch.rand(4, 2)), IO(torch.rand(4, 3)))
+        events = {event["name"]: event for event in recorder.events}
+        learn = events["THGradLearnerT1.learn"]
+        forward = events["THGradLearnerT1.forward"]
+        assert learn["ts"] <= forward["ts"]
+        assert forward["ts"] + forward["dur"] <= learn["ts"] + learn["dur"]
+        assert forward["args"]["out_shapes"] == [[4, 3]]
+
+    def test_save_writes_trace_events(self, tmp_path):
+
+        learner = THGradLearnerT1(2, 3)
+        with TraceRecorder().attach(learner) as recorder:
+            learner(IO(torch.rand(4, 2)), State())
+        path = tmp_path / "trace.json"
+        recorder.save(str(path))
+        with open(path) as file:
+            trace = json.load(file)
+        assert trace["traceEvents"][0]["ph"] == "X"
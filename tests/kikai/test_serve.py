@@ -0,0 +1,64 @@
+# 1st party
+import asyncio
+
+# 3rd party
+import pytest
+import torch
+from torch import nn
+
+# local
+from zenkai.kaku import IO
+from zenkai.kikai import _serve
+from .test_grad import THGradLearnerT1
+
+
+class CountedLinear(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.linear = nn.Linear(2, 3)
+        self.batch_sizes = []
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        self.batch_sizes.append(len(x))
+        return self.linear(x)
+
+
+class TestBatchServer:
+    def test_predict_outputs_the_result_for_each_sample(self):
+        learner = THGradLearnerT1(2, 3)
+        x = torch.rand(8, 2)
+
+        async def run():
+            async with _serve.BatchServer(learner, max_batch_size=4) as server:
+                return await asyncio.gather(*[server.predict(x_i) for x_i in x])
+
+        results = asyncio.run(run())
+        with torch.no_grad():
+            expected = learner(IO(x)).f
+        assert torch.allclose(torch.stack(results), expected)
+
+    def test_predict_coalesces_requests_into_batches(self):
+        module = CountedLinear()
+
+        async def run():
+            async with _serve.BatchServer(module, 4, max_delay=0.1) as server:
+                await asyncio.gather(*[server.predict(torch.rand(2)) for _ in range(8)])
+                return server.n_batches
+
+        n_batches = asyncio.run(run())
+        assert n_batches == 2
+        assert module.batch_sizes == [4, 4]
+
+    def test_predict_raises_error_of_forward(self):
+        module = CountedLinear()
+
+        async def run():
+            async with _serve.BatchServer(module) as server:
+                return await server.predict(torch.rand(5))
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(run())
+
+    def test_init_raises_error_if_batch_size_not_positive(self):
+        with pytest.raises(ValueError):
+            _serve.BatchServer(CountedLinear(), max_batch_size=0)
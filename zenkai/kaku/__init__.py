@@ -10,9 +10,26 @@ from ._assess import (
     Criterion,
     XCriterion,
     reduce_assessment,
+    upcast,
 )
 
-from ._io import IO, Idx, update_io, update_tensor, idx_io, idx_th, ToIO, FromIO
+from ._io import (
+    IO,
+    Idx,
+    IOBuffer,
+    update_io,
+    update_tensor,
+    idx_io,
+    idx_th,
+    ToIO,
+    FromIO,
+    release_mode,
+    set_release_mode,
+    get_release_mode,
+)
+from ._store import IOStore
+from ._compile import Compilable, CompiledFunction
+from ._metrics import MetricLog
 from ._build import Builder, Factory, BuilderArgs, BuilderFunctor, Var, UNDEFINED
 from ._machine import (
     # TODO: Separate out hooks
@@ -35,8 +52,25 @@ from ._machine import (
     step_dep,
 )
 from ._optimize import OPTIM_MAP, ParamFilter, NullOptim, OptimFactory, optimf
-from ._state import IDable, MyState, State, StateKeyError, AssessmentLog
+from ._state import (
+    IDable,
+    MyState,
+    State,
+    StateKeyError,
+    StateBudgetError,
+    AssessmentLog,
+    CompactState,
+    StateHandle,
+)
+from ._fit import fit, evaluate, Prefetcher, RunningAssessment, dataset_batches, to_io
 from ._populate import Population, PopulationIndexer, Individual, TensorDict
+from ._checkpoint import (
+    Checkpoint,
+    CheckpointWriter,
+    save_checkpoint,
+    load_checkpoint,
+    state_populations,
+)
 from ._objective import (
     Itadaki,
     Objective,
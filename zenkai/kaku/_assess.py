@@ -10,6 +10,7 @@ import torch.nn as nn
 
 # Local
 from ._io import IO
+from ._compile import Compilable
 
 
 class Reduction(Enum):
@@ -476,7 +477,22 @@ class AssessmentDict(dict):
         return {key: assessment.value for key, assessment in self.items()}
 
 
-class Criterion(nn.Module):
+def upcast(x: torch.Tensor) -> torch.Tensor:
+    """Cast a reduced precision floating point tensor to float32. Use so that
+    losses are not computed in float16 or bfloat16
+
+    Args:
+        x (torch.Tensor): The tensor to upcast
+
+    Returns:
+        torch.Tensor: The tensor in float32 if it was reduced precision else the tensor
+    """
+    if isinstance(x, torch.Tensor) and x.dtype in (torch.float16, torch.bfloat16):
+        return x.float()
+    return x
+
+
+class Criterion(Compilable, nn.Module):
     """Base class for evaluating functions"""
 
     def __init__(self, reduction: str = "mean", maximize: bool = False):
@@ -510,14 +526,24 @@ class Criterion(nn.Module):
         Returns:
             torch.Tensor: the reduced loss
         """
-        reduction = (
+        return Reduction[self.resolve_reduction(reduction_override)].reduce(
+            upcast(value)
+        )
+
+    def resolve_reduction(self, reduction_override: str = None) -> str:
+        """
+        Args:
+            reduction_override (str, optional): The reduction to override with. Defaults to None.
+
+        Returns:
+            str: The reduction that will be used for the override
+        """
+        return (
             self.reduction
             if self.reduction == "none" or reduction_override is None
             else reduction_override
         )
 
-        return Reduction[reduction].reduce(value)
-
     def assess(self, x: IO, t: IO, reduction_override: str = None) -> Assessment:
         """Calculate the assessment
 
@@ -529,14 +555,16 @@ class Criterion(nn.Module):
         Returns:
             Assessment: The assessment resulting from the objective
         """
-        return Assessment(self.forward(x, t, reduction_override), self._maximize)
+        return Assessment(
+            upcast(self.forward(x, t, reduction_override)), self._maximize
+        )
 
     @abstractmethod
     def forward(self, x: IO, t: IO, reduction_override: str = None) -> torch.Tensor:
         pass
 
 
-class XCriterion(nn.Module):
+class XCriterion(Compilable, nn.Module):
     """Base class for evaluating functions that rely on the input to the module as well"""
 
     def __init__(self, reduction: str = "mean", maximize: bool = False):
@@ -569,7 +597,19 @@ class XCriterion(nn.Module):
         Returns:
             Assessment: The assessment resulting from the objective
         """
-        return Assessment(self.forward(x, y, t, reduction_override), self._maximize)
+        return Assessment(
+            upcast(self.forward(x, y, t, reduction_override)), self._maximize
+        )
+
+    def resolve_reduction(self, reduction_override: str = None) -> str:
+        """
+        Args:
+            reduction_override (str, optional): The reduction to override with. Defaults to None.
+
+        Returns:
+            str: The reduction that will be used for the override
+        """
+        return reduction_override or self.reduction
 
     @abstractmethod
     def forward(
@@ -627,35 +667,63 @@ class ThLoss(Criterion):
         self.base_criterion = base_criterion
         self._loss_kwargs = loss_kwargs or {}
         self._weight = weight
+        # the loss modules created for each reduction
+        self._losses: typing.Dict[str, nn.Module] = {}
 
     def add_weight(self, evaluation: torch.Tensor):
         return evaluation * self._weight if self._weight is not None else evaluation
 
-    def forward(self, x: IO, t: IO, reduction_override: str = None) -> torch.Tensor:
+    def resolve_reduction(self, reduction_override: str = None) -> str:
+        """
+        Args:
+            reduction_override (str, optional): The reduction to override with. Defaults to None.
 
+        Returns:
+            str: The reduction that will be used for the override
+        """
         if self.reduction == "NA":
-            reduction = "none"
-        else:
-            reduction = reduction_override or self.reduction
+            return "none"
+        return reduction_override or self.reduction
+
+    def _loss(self, reduction: str = None) -> nn.Module:
+        """Retrieve the loss module for a reduction. The module is created once so
+        the compiled loss can be reused
+
+        Args:
+            reduction (str, optional): The reduction to create the module with. If None
+              the default of the module is used. Defaults to None.
+
+        Returns:
+            nn.Module: The loss module
+        """
+        loss = self._losses.get(reduction)
+        if loss is None:
+            kwargs = self._loss_kwargs
+            if reduction is not None:
+                kwargs = dict(kwargs, reduction=reduction)
+            loss = self._losses[reduction] = self.base_criterion(**kwargs)
+        return loss
+
+    def forward(self, x: IO, t: IO, reduction_override: str = None) -> torch.Tensor:
+
+        reduction = self.resolve_reduction(reduction_override)
+        # compute the loss in float32 if the output was computed with autocast
+        x_f, t_f = upcast(x.f), upcast(t.f)
 
         if Reduction.is_torch(reduction):
             # use built in reduction
             return self.add_weight(
-                self.base_criterion(reduction=reduction, **self._loss_kwargs).forward(
-                    x.f, t.f
-                )
+                self.compiled(("loss", reduction), self._loss(reduction))(x_f, t_f)
             )
 
         if reduction == "none":
             return self.reduce(
-                self.base_criterion(**self._loss_kwargs).forward(x.f, t.f)
+                self.compiled("loss", self._loss())(x_f, t_f)
             )
 
         return self.add_weight(
             self.reduce(
-                self.base_criterion(reduction="none", **self._loss_kwargs).forward(
-                    x.f, t.f
-                ),
+                self.compiled(("loss", "none"), self._loss("none"))(x_f, t_f),
                 reduction,
             )
         )
@@ -0,0 +1,389 @@
+"""
+Sharded checkpoints. The tensors of a checkpoint are written to flat shard files
+and everything else to a JSON index so a checkpoint can be memory-mapped
+rather than unpickled
+"""
+
+# 1st party
+import json
+import os
+import queue
+import shutil
+import threading
+import typing
+
+# 3rd party
+import numpy as np
+import torch
+
+# local
+from ._assess import Assessment
+from ._populate import Individual, Population, TensorDict
+from ._state import State
+
+
+# the offsets of the tensors in a shard are aligned so they can be viewed as any dtype
+ALIGNMENT = 64
+
+_TENSOR_DICTS = {
+    "TensorDict": TensorDict,
+    "Individual": Individual,
+    "Population": Population,
+}
+_DTYPES = {
+    str(dtype): dtype
+    for dtype in [
+        torch.float16,
+        torch.bfloat16,
+        torch.float32,
+        torch.float64,
+        torch.uint8,
+        torch.int8,
+        torch.int16,
+        torch.int32,
+        torch.int64,
+        torch.bool,
+        torch.complex64,
+        torch.complex128,
+    ]
+}
+
+
+def _encode(value, tensors: typing.List[torch.Tensor]):
+    """Convert a value to one that can be written to json. Tensors are
+    replaced with their index in tensors"""
+    if isinstance(value, torch.Tensor):
+        tensors.append(value)
+        return {"__tensor__": len(tensors) - 1}
+    if isinstance(value, Assessment):
+        return {
+            "__assessment__": _encode(value.value, tensors),
+            "maximize": value.maximize,
+        }
+    if isinstance(value, TensorDict):
+        encoded = {
+            "__tensor_dict__": type(value).__name__,
+            "values": {k: _encode(v, tensors) for k, v in value.items()},
+        }
+        if isinstance(value, Population):
+            encoded["assessments"] = [
+                _encode(assessment, tensors) for assessment in value._assessments
+            ]
+        return encoded
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value.keys()):
+            return {k: _encode(v, tensors) for k, v in value.items()}
+        # json only supports string keys
+        return {
+            "__items__": [[_encode(k, tensors), _encode(v, tensors)] for k, v in value.items()]
+        }
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v, tensors) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v, tensors) for v in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"Cannot write a value of type {type(value)} to a checkpoint")
+
+
+def _decode(value, tensor: typing.Callable[[int], torch.Tensor]):
+
+    if isinstance(value, list):
+        return [_decode(v, tensor) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "__tensor__" in value:
+        return tensor(value["__tensor__"])
+    if "__assessment__" in value:
+        return Assessment(_decode(value["__assessment__"], tensor), value["maximize"])
+    if "__tensor_dict__" in value:
+        cls = _TENSOR_DICTS[value["__tensor_dict__"]]
+        result = cls(**{k: _decode(v, tensor) for k, v in value["values"].items()})
+        if "assessments" in value:
+            result._assessments = [_decode(v, tensor) for v in value["assessments"]]
+            if len(result._assessments) > 0 and result._assessments[0] is not None:
+                result._assessment_size = result._assessments[0].value.shape
+        return result
+    if "__items__" in value:
+        return {_decode(k, tensor): _decode(v, tensor) for k, v in value["__items__"]}
+    if "__tuple__" in value:
+        return tuple(_decode(v, tensor) for v in value["__tuple__"])
+    return {k: _decode(v, tensor) for k, v in value.items()}
+
+
+def _snapshot(
+    items: typing.Dict[str, typing.Any]
+) -> typing.Tuple[typing.Dict[str, typing.Any], typing.List[torch.Tensor]]:
+    """Encode the items and copy the tensors to the cpu so training can continue
+    while they are written"""
+    tensors = []
+    encoded = {key: _encode(value, tensors) for key, value in items.items()}
+    return encoded, [tensor.detach().cpu().clone().contiguous() for tensor in tensors]
+
+
+def _write(
+    path: str,
+    encoded: typing.Dict[str, typing.Any],
+    tensors: typing.List[torch.Tensor],
+    shard_size: int,
+):
+    """Write the shards then the index. The checkpoint is written to a temporary
+    directory first and the previous checkpoint is moved aside before the temporary
+    directory is renamed, so there is always a complete checkpoint at path or at
+    the '.old' path"""
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    entries = []
+    shard, offset, file = -1, 0, None
+    try:
+        for tensor in tensors:
+            nbytes = tensor.numel() * tensor.element_size()
+            if file is None or (offset > 0 and offset + nbytes > shard_size):
+                if file is not None:
+                    file.close()
+                shard += 1
+                offset = 0
+                file = open(os.path.join(tmp_path, Checkpoint.shard_file(shard)), "wb")
+            padding = -offset % ALIGNMENT
+            file.write(b"\0" * padding)
+            offset += padding
+            # view as bytes so that dtypes numpy does not support can be written
+            file.write(tensor.reshape(-1).view(torch.uint8).numpy().tobytes())
+            entries.append(
+                {
+                    "shard": shard,
+                    "offset": offset,
+                    "nbytes": nbytes,
+                    "dtype": str(tensor.dtype),
+                    "shape": list(tensor.shape),
+                }
+            )
+            offset += nbytes
+    finally:
+        if file is not None:
+            file.close()
+    with open(os.path.join(tmp_path, Checkpoint.INDEX_FILE), "w") as index_file:
+        json.dump(
+            {"n_shards": shard + 1, "tensors": entries, "items": encoded}, index_file
+        )
+    old_path = path + ".old"
+    if os.path.exists(path):
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+
+
+def save_checkpoint(
+    path: str, items: typing.Dict[str, typing.Any], shard_size: int = 2**28
+):
+    """Write a checkpoint to a directory
+
+    usage:
+        save_checkpoint('checkpoint', {
+            'learner': learner.state_dict(),
+            'optim': optim.state_dict(),
+            'populations': state_populations(state)
+        })
+
+    Args:
+        path (str): The directory to write to. Will be replaced if it exists
+        items (typing.Dict[str, typing.Any]): The items to write such as state dicts and
+          populations. Can contain tensors, Assessments, TensorDicts, dicts, lists, tuples and json values
+        shard_size (int, optional): The number of bytes per shard. A tensor larger than
+          the shard size is written to its own shard. Defaults to 2**28.
+    """
+    encoded, tensors = _snapshot(items)
+    _write(path, encoded, tensors, shard_size)
+
+
+class Checkpoint(object):
+    """A checkpoint opened for reading. The shards are memory-mapped and the
+    tensors are only created when the item they belong to is retrieved
+    """
+
+    INDEX_FILE = "index.json"
+
+    @staticmethod
+    def shard_file(shard: int) -> str:
+        return f"shard_{shard:05d}.bin"
+
+    def __init__(self, path: str, writable: bool = False):
+        """Open a checkpoint
+
+        Args:
+            path (str): The directory of the checkpoint
+            writable (bool, optional): Whether writes to the tensors will be written
+              to disk. If False, writes are copy on write. Defaults to False.
+
+        Raises:
+            FileNotFoundError: If there is no checkpoint at the path
+        """
+        if not os.path.exists(path) and os.path.exists(path + ".old"):
+            # writing was interrupted after the previous checkpoint was moved aside
+            path = path + ".old"
+        self.path = path
+        index_path = os.path.join(path, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"No checkpoint index at {index_path}")
+        with open(index_path, "r") as file:
+            index = json.load(file)
+        self._entries = index["tensors"]
+        self._items = index["items"]
+        self._mode = "r+" if writable else "c"
+        self._shards: typing.Dict[int, np.memmap] = {}
+
+    def _shard(self, shard: int) -> np.memmap:
+
+        array = self._shards.get(shard)
+        if array is None:
+            array = self._shards[shard] = np.memmap(
+                os.path.join(self.path, self.shard_file(shard)),
+                dtype=np.uint8,
+                mode=self._mode,
+            )
+        return array
+
+    def tensor(self, i: int) -> torch.Tensor:
+        """Retrieve a tensor by its index. The tensor is a view of the memory map
+
+        Args:
+            i (int): The index of the tensor
+
+        Returns:
+            torch.Tensor: The tensor
+        """
+        entry = self._entries[i]
+        dtype = _DTYPES[entry["dtype"]]
+        if entry["nbytes"] == 0:
+            return torch.zeros(entry["shape"], dtype=dtype)
+        offset = entry["offset"]
+        data = self._shard(entry["shard"])[offset : offset + entry["nbytes"]]
+        return torch.from_numpy(data).view(dtype).reshape(entry["shape"])
+
+    def keys(self) -> typing.List[str]:
+        """
+        Returns:
+            typing.List[str]: The keys of the items in the checkpoint
+        """
+        return list(self._items.keys())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def __getitem__(self, key: str) -> typing.Any:
+        """
+        Args:
+            key (str): The key of the item
+
+        Returns:
+            typing.Any: The item with its tensors memory-mapped
+        """
+        return _decode(self._items[key], self.tensor)
+
+    def load(self) -> typing.Dict[str, typing.Any]:
+        """
+        Returns:
+            typing.Dict[str, typing.Any]: All of the items
+        """
+        return {key: self[key] for key in self._items.keys()}
+
+
+def load_checkpoint(path: str) -> typing.Dict[str, typing.Any]:
+    """Load all items of a checkpoint with the tensors memory-mapped
+
+    Args:
+        path (str): The directory of the checkpoint
+
+    Returns:
+        typing.Dict[str, typing.Any]: The items
+    """
+    return Checkpoint(path).load()
+
+
+class CheckpointWriter(object):
+    """Write checkpoints in a background thread. The tensors are copied when
+    save is called so training can continue while the checkpoint is written
+    """
+
+    def __init__(self, shard_size: int = 2**28):
+        """initializer
+
+        Args:
+            shard_size (int, optional): The number of bytes per shard. Defaults to 2**28.
+        """
+        self.shard_size = shard_size
+        self._queue: queue.Queue = None
+        self._writer: threading.Thread = None
+        self._errors: typing.List[Exception] = []
+
+    def _run_writer(self):
+
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                _write(*item, self.shard_size)
+            except Exception as e:
+                self._errors.append(e)
+            finally:
+                self._queue.task_done()
+
+    def save(self, path: str, items: typing.Dict[str, typing.Any]):
+        """Queue a checkpoint to write
+
+        Args:
+            path (str): The directory to write to
+            items (typing.Dict[str, typing.Any]): The items to write
+        """
+        encoded, tensors = _snapshot(items)
+        if self._writer is None or not self._writer.is_alive():
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._run_writer, daemon=True)
+            self._writer.start()
+        self._queue.put((path, encoded, tensors))
+
+    def wait(self):
+        """Wait for all checkpoints to be written
+
+        Raises:
+            Exception: The first error raised while writing
+        """
+        if self._queue is not None:
+            self._queue.join()
+        if len(self._errors) > 0:
+            error = self._errors[0]
+            self._errors.clear()
+            raise error
+
+    def close(self):
+        """Wait for the checkpoints to be written and stop the writer thread"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._writer = None
+        self.wait()
+
+
+def state_populations(state: State) -> typing.Dict[str, Population]:
+    """Retrieve the populations stored in a state. Only the populations
+    stored for IDable objects have keys that are the same across runs
+
+    Args:
+        state (State): The state to retrieve from
+
+    Returns:
+        typing.Dict[str, Population]: The populations keyed by '<id>/<sub id>/<key>'
+    """
+    populations = {}
+    for (id, sub_id), container in state._container_iter():
+        for key, data in container.info.items():
+            if isinstance(data.data, Population):
+                populations[f"{id}/{sub_id}/{key}"] = data.data
+    return populations
@@ -0,0 +1,170 @@
+"""
+Opt-in torch.compile for the tensor computations of learning machines and criteria.
+The IO and State handling around the computations stays in eager Python
+"""
+
+# 1st party
+import typing
+import warnings
+
+# 3rd party
+import torch
+
+
+def _dynamo_errors() -> typing.Tuple[typing.Type[Exception], ...]:
+    """
+    Returns:
+        typing.Tuple[typing.Type[Exception], ...]: The types of the errors raised when compiling
+          fails. Imported when first needed as importing dynamo is slow
+    """
+    global _DYNAMO_ERRORS
+    if _DYNAMO_ERRORS is None:
+        try:
+            from torch._dynamo.exc import TorchDynamoException
+
+            _DYNAMO_ERRORS = (TorchDynamoException,)
+        except ImportError:
+            _DYNAMO_ERRORS = ()
+    return _DYNAMO_ERRORS
+
+
+_DYNAMO_ERRORS: typing.Tuple[typing.Type[Exception], ...] = None
+
+
+def _shape_key(args: typing.Tuple) -> typing.Tuple:
+
+    return tuple(
+        (tuple(arg.shape), arg.dtype, arg.device.type, arg.requires_grad)
+        if isinstance(arg, torch.Tensor)
+        else type(arg)
+        for arg in args
+    )
+
+
+class CompiledFunction(object):
+    """Compile a function for each set of input shapes it is called with. If
+    compiling fails with a dynamo error, such as when the graph breaks with
+    fullgraph set, the function is executed eagerly for those shapes. Other errors
+    are raised
+    """
+
+    # marks the shapes that are executed eagerly
+    EAGER = object()
+
+    def __init__(
+        self,
+        f: typing.Callable,
+        max_shapes: int = 8,
+        fullgraph: bool = True,
+        **options,
+    ):
+        """initializer
+
+        Args:
+            f (typing.Callable): The function or module to compile
+            max_shapes (int, optional): The maximum number of shapes to compile for. Shapes
+              beyond the maximum are executed eagerly. Defaults to 8.
+            fullgraph (bool, optional): Whether the function must be captured in one graph. If True
+              a graph break will cause the function to be executed eagerly. Defaults to True.
+            options: The options to pass to torch.compile
+        """
+        self.f = f
+        self.max_shapes = max_shapes
+        self.fullgraph = fullgraph
+        self.options = options
+        self.fallbacks = 0
+        self._cache: typing.Dict[typing.Tuple, typing.Callable] = {}
+
+    def _compile(self) -> typing.Callable:
+
+        if not hasattr(torch, "compile"):
+            return self.EAGER
+        return torch.compile(
+            self.f, fullgraph=self.fullgraph, dynamic=False, **self.options
+        )
+
+    def __call__(self, *args):
+
+        key = _shape_key(args)
+        compiled = self._cache.get(key)
+        if compiled is None:
+            if len(self._cache) >= self.max_shapes:
+                compiled = self.EAGER
+            else:
+                compiled = self._compile()
+            self._cache[key] = compiled
+        if compiled is self.EAGER:
+            return self.f(*args)
+        try:
+            return compiled(*args)
+        except _dynamo_errors() as e:
+            warnings.warn(
+                f"Executing {self.f} eagerly for shapes {key} as compiling failed: {e}"
+            )
+            self._cache[key] = self.EAGER
+            self.fallbacks += 1
+            return self.f(*args)
+
+    def shapes(self) -> typing.List[typing.Tuple]:
+        """
+        Returns:
+            typing.List[typing.Tuple]: The keys of the shapes that have been compiled
+        """
+        return [key for key, value in self._cache.items() if value is not self.EAGER]
+
+    def clear(self):
+        """Clear the compiled functions"""
+        self._cache.clear()
+
+
+class Compilable(object):
+    """Mixin to compile the tensor computations of a module. Call compiled()
+    with the computation in forward. The computation is only compiled if compiling
+    has been enabled with set_compile(). The methods are named so they do not clash
+    with nn.Module.compile
+    """
+
+    def set_compile(
+        self, enabled: bool = True, recursive: bool = True, **options
+    ) -> "Compilable":
+        """Enable or disable compiling
+
+        Args:
+            enabled (bool, optional): Whether to compile. Defaults to True.
+            recursive (bool, optional): Whether to set it for the Compilables
+              contained in the module. Defaults to True.
+            options: The options to pass to CompiledFunction
+
+        Returns:
+            Compilable: self
+        """
+        compilables = [self]
+        if recursive and hasattr(self, "modules"):
+            compilables = [
+                module for module in self.modules() if isinstance(module, Compilable)
+            ]
+        for compilable in compilables:
+            compilable._compile_enabled = enabled
+            compilable._compile_options = options
+            compilable._compiled_fns = {}
+        return self
+
+    def compiled(self, key: typing.Hashable, f: typing.Callable) -> typing.Callable:
+        """Retrieve the compiled version of a computation
+
+        Args:
+            key (typing.Hashable): The key to cache the compiled computation by
+            f (typing.Callable): The computation. If it is not the computation compiled
+              for the key, it will be compiled again so pass the same object every call
+
+        Returns:
+            typing.Callable: The compiled computation if compiling is enabled else f
+        """
+        if not getattr(self, "_compile_enabled", False):
+            return f
+        compiled = self._compiled_fns.get(key)
+        if compiled is None or (compiled.f is not f and compiled.f != f):
+            compiled = self._compiled_fns[key] = CompiledFunction(
+                f, **self._compile_options
+            )
+        return compiled
@@ -0,0 +1,439 @@
+"""
+Standard loops to train learning machines on a dataset
+"""
+
+# 1st party
+import queue
+import threading
+import typing
+
+# 3rd party
+import torch
+from torch.utils.data import Dataset, default_collate
+
+# local
+from ._assess import Assessment, AssessmentDict
+from ._io import IO
+from ._machine import LearningMachine
+from ._state import State
+
+
+def to_io(value) -> IO:
+    """Convert an element of a batch to an IO
+
+    Args:
+        value: An IO, tensor or a sequence of tensors
+
+    Returns:
+        IO: The IO
+    """
+    if isinstance(value, IO):
+        return value
+    if isinstance(value, (tuple, list)):
+        return IO(*value)
+    return IO(value)
+
+
+def _move(io: IO, device, pin_memory: bool) -> IO:
+
+    x = []
+    for x_i in io:
+        if isinstance(x_i, torch.Tensor):
+            if pin_memory and x_i.device.type == "cpu":
+                x_i = x_i.pin_memory()
+            if device is not None:
+                x_i = x_i.to(device, non_blocking=True)
+        x.append(x_i)
+    return IO(*x, names=io.names)
+
+
+def dataset_batches(
+    dataset: Dataset, batch_size: int, shuffle: bool = True
+) -> typing.Iterator:
+    """Loop over minibatches of a map-style dataset
+
+    Args:
+        dataset (Dataset): The dataset to loop over
+        batch_size (int): The number of samples in each batch
+        shuffle (bool, optional): Whether to shuffle the samples. Defaults to True.
+
+    Yields:
+        The collated batch
+    """
+    n = len(dataset)
+    indices = torch.randperm(n) if shuffle else torch.arange(n)
+    for start in range(0, n, batch_size):
+        yield default_collate(
+            [dataset[i] for i in indices[start : start + batch_size].tolist()]
+        )
+
+
+class _PrefetchError(object):
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class Prefetcher(object):
+    """Iterate over batches in a background thread. Each batch is converted to
+    an (x, t) pair of IOs and moved to the device before it is needed
+    """
+
+    _END = object()
+
+    def __init__(
+        self,
+        batches: typing.Iterable,
+        device: torch.device = None,
+        n_prefetch: int = 2,
+        pin_memory: bool = False,
+    ):
+        """initializer
+
+        Args:
+            batches (typing.Iterable): The batches to iterate over. Each batch must be an (x, t) pair
+            device (torch.device, optional): The device to move the batches to. Defaults to None.
+            n_prefetch (int, optional): The number of batches to load ahead. If 0 the batches
+              are loaded in the calling thread without starting a thread. Defaults to 2.
+            pin_memory (bool, optional): Whether to pin the memory of the batches before
+              moving them to the device. Defaults to False.
+        """
+        self.batches = batches
+        self.device = device
+        self.n_prefetch = n_prefetch
+        self.pin_memory = pin_memory
+
+    def _load(self, loaded: queue.Queue, stop: threading.Event):
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    loaded.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            for batch in self.batches:
+                x, t = batch
+                x = _move(to_io(x), self.device, self.pin_memory)
+                t = _move(to_io(t), self.device, self.pin_memory)
+                if not put((x, t)):
+                    return
+        except Exception as e:
+            put(_PrefetchError(e))
+            return
+        put(self._END)
+
+    def __iter__(self) -> typing.Iterator[typing.Tuple[IO, IO]]:
+        """
+        Yields:
+            typing.Tuple[IO, IO]: The input and target for the batch
+        """
+        if self.n_prefetch <= 0:
+            for x, t in self.batches:
+                yield (
+                    _move(to_io(x), self.device, self.pin_memory),
+                    _move(to_io(t), self.device, self.pin_memory),
+                )
+            return
+        loaded = queue.Queue(maxsize=self.n_prefetch)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._load, args=(loaded, stop), daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = loaded.get()
+                if item is self._END:
+                    return
+                if isinstance(item, _PrefetchError):
+                    raise item.error
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+
+class RunningAssessment(object):
+    """Aggregate assessments as they are computed. The aggregates are kept on the
+    device of the assessments and only transferred to the host when read.
+    The sum, count, min, max and variance (with Welford's algorithm) are exact
+    """
+
+    REDUCTIONS = ("mean", "sum", "var", "std", "min", "max")
+
+    def __init__(self, name: str = "loss"):
+        """initializer
+
+        Args:
+            name (str, optional): The name to use for assessments that are not in an AssessmentDict. Defaults to "loss".
+        """
+        self.name = name
+        self._sums: typing.Dict[str, torch.Tensor] = {}
+        self._counts: typing.Dict[str, int] = {}
+        self._maximize: typing.Dict[str, bool] = {}
+        self._means: typing.Dict[str, torch.Tensor] = {}
+        # the sum of squared differences from the mean
+        self._m2s: typing.Dict[str, torch.Tensor] = {}
+        self._mins: typing.Dict[str, torch.Tensor] = {}
+        self._maxs: typing.Dict[str, torch.Tensor] = {}
+
+    def _items(
+        self, assessment: typing.Union[Assessment, AssessmentDict]
+    ) -> typing.Iterator[typing.Tuple[str, Assessment]]:
+
+        if isinstance(assessment, typing.Dict):
+            return assessment.items()
+        return [(self.name, assessment)]
+
+    def update(
+        self, assessment: typing.Union[Assessment, AssessmentDict], weight: int = None
+    ):
+        """Add an assessment to the aggregate. Every element of the assessment is
+        counted so pass in unreduced assessments for dataset level values
+
+        Args:
+            assessment (typing.Union[Assessment, AssessmentDict]): The assessment to add
+            weight (int, optional): The number of samples a scalar assessment was reduced
+              over such as the batch size. The scalar is counted that many times so the
+              mean is weighted by the samples. Defaults to None.
+        """
+        for name, assessment_i in self._items(assessment):
+            value = assessment_i.value.detach().float().reshape(-1)
+            n_b = value.numel()
+            if n_b == 0:
+                continue
+            if weight is not None and n_b == 1:
+                n_b = weight
+                sum_b = value[0] * weight
+                mean_b = value[0]
+                m2_b = torch.zeros_like(mean_b)
+            else:
+                sum_b = value.sum()
+                mean_b = sum_b / n_b
+                m2_b = ((value - mean_b) ** 2).sum()
+            min_b, max_b = value.min(), value.max()
+            n_a = self._counts.get(name, 0)
+            if n_a == 0:
+                self._sums[name] = sum_b
+                self._means[name] = mean_b
+                self._m2s[name] = m2_b
+                self._mins[name] = min_b
+                self._maxs[name] = max_b
+            else:
+                # combine the batch with the aggregate (Chan et al.)
+                n = n_a + n_b
+                delta = mean_b - self._means[name]
+                self._sums[name] = self._sums[name] + sum_b
+                self._means[name] = self._means[name] + delta * (n_b / n)
+                self._m2s[name] = (
+                    self._m2s[name] + m2_b + delta ** 2 * (n_a * n_b / n)
+                )
+                self._mins[name] = torch.minimum(self._mins[name], min_b)
+                self._maxs[name] = torch.maximum(self._maxs[name], max_b)
+            self._counts[name] = n_a + n_b
+            self._maximize[name] = assessment_i.maximize
+
+    def count(self, name: str = None) -> int:
+        """
+        Args:
+            name (str, optional): The name of the assessment. Defaults to the default name.
+
+        Returns:
+            int: The number of values aggregated
+        """
+        return self._counts.get(name or self.name, 0)
+
+    def mean(self) -> AssessmentDict:
+        """
+        Returns:
+            AssessmentDict: The mean of each assessment. All means are transferred to the
+              host together
+        """
+        if len(self._sums) == 0:
+            return AssessmentDict()
+        names = list(self._sums.keys())
+        sums = torch.stack([self._sums[name] for name in names]).cpu()
+        return AssessmentDict(
+            **{
+                name: Assessment(sums[i] / self._counts[name], self._maximize[name])
+                for i, name in enumerate(names)
+            }
+        )
+
+    def reduce(
+        self, reductions: typing.Iterable[str] = REDUCTIONS
+    ) -> AssessmentDict:
+        """Retrieve the reductions of each assessment. All values are transferred
+        to the host together
+
+        Args:
+            reductions (typing.Iterable[str], optional): The reductions to retrieve. Must be in
+              REDUCTIONS. Defaults to REDUCTIONS.
+
+        Raises:
+            ValueError: If a reduction is not valid
+
+        Returns:
+            AssessmentDict: The reductions named '<name>_<reduction>'. The variance is the
+              population variance
+        """
+        for reduction in reductions:
+            if reduction not in self.REDUCTIONS:
+                raise ValueError(
+                    f"Reduction {reduction} is not one of {self.REDUCTIONS}"
+                )
+        if len(self._sums) == 0:
+            return AssessmentDict()
+        keys = []
+        values = []
+        for name in self._sums.keys():
+            var = self._m2s[name] / self._counts[name]
+            computed = {
+                "mean": self._sums[name] / self._counts[name],
+                "sum": self._sums[name],
+                "var": var,
+                "std": var.sqrt(),
+                "min": self._mins[name],
+                "max": self._maxs[name],
+            }
+            for reduction in reductions:
+                keys.append((name, reduction))
+                values.append(computed[reduction])
+        values = torch.stack(values).cpu()
+        return AssessmentDict(
+            **{
+                f"{name}_{reduction}": Assessment(values[i], self._maximize[name])
+                for i, (name, reduction) in enumerate(keys)
+            }
+        )
+
+
+def _n_samples(io: IO) -> typing.Optional[int]:
+
+    for x_i in io:
+        if isinstance(x_i, torch.Tensor) and x_i.dim() > 0:
+            return x_i.shape[0]
+    return None
+
+
+def fit(
+    learner: LearningMachine,
+    data: typing.Union[typing.Iterable, Dataset],
+    epochs: int = 1,
+    batch_size: int = 32,
+    shuffle: bool = True,
+    accumulation_steps: int = 1,
+    n_prefetch: int = 2,
+    pin_memory: bool = False,
+    reduction_override: str = None,
+    callback: typing.Callable[[int, AssessmentDict], None] = None,
+) -> typing.List[AssessmentDict]:
+    """Train a learning machine. The batches are loaded in a background thread and
+    one State is reset in place between steps. The epoch assessment weights each
+    batch by its number of samples
+
+    Args:
+        learner (LearningMachine): The machine to train
+        data (typing.Union[typing.Iterable, Dataset]): A map-style dataset or an iterable
+          such as a DataLoader that outputs (x, t) batches
+        epochs (int, optional): The number of epochs to train for. Defaults to 1.
+        batch_size (int, optional): The batch size if data is a dataset. Defaults to 32.
+        shuffle (bool, optional): Whether to shuffle if data is a dataset. Defaults to True.
+        accumulation_steps (int, optional): The number of batches to accumulate before
+          calling step. Learners that update with a GradUpdater sum the grads of the
+          accumulated batches. Create them with average_grads=True, such as
+          GradLearner(..., average_grads=True), so the step matches one on their mean loss.
+          Defaults to 1.
+        n_prefetch (int, optional): The number of batches to load ahead. Set to 0 to load the
+          batches in the calling thread, such as for in-memory datasets. Defaults to 2.
+        pin_memory (bool, optional): Whether to pin the memory of the batches. Defaults to False.
+        reduction_override (str, optional): The reduction to pass to learn. Defaults to None.
+        callback (typing.Callable[[int, AssessmentDict], None], optional): Function called
+          with the epoch and its mean assessment at the end of each epoch. Defaults to None.
+
+    Raises:
+        ValueError: If accumulation_steps is less than 1
+
+    Returns:
+        typing.List[AssessmentDict]: The mean assessment for each epoch
+    """
+    if accumulation_steps < 1:
+        raise ValueError(
+            f"Argument accumulation_steps must be at least 1 not {accumulation_steps}"
+        )
+    device = learner.device()
+    state = State()
+    results = []
+    for epoch in range(epochs):
+        if isinstance(data, Dataset):
+            batches = dataset_batches(data, batch_size, shuffle)
+        else:
+            batches = data
+        running = RunningAssessment()
+        x = t = None
+        pending = False
+        for i, (x, t) in enumerate(Prefetcher(batches, device, n_prefetch, pin_memory)):
+            to_step = (i + 1) % accumulation_steps == 0
+            assessment = learner.learn(
+                x, t, state, reduction_override=reduction_override, step=to_step
+            )
+            running.update(assessment, _n_samples(t))
+            pending = not to_step
+            if to_step:
+                state.reset()
+        if pending:
+            # step with the batches that remain at the end of the epoch
+            learner.step(x, t, state)
+            state.reset()
+        result = running.mean()
+        results.append(result)
+        if callback is not None:
+            callback(epoch, result)
+    return results
+
+
+def evaluate(
+    learner: LearningMachine,
+    data: typing.Union[typing.Iterable, Dataset],
+    batch_size: int = 32,
+    reduction_override: str = "samplemeans",
+    reductions: typing.Iterable[str] = RunningAssessment.REDUCTIONS,
+    n_prefetch: int = 2,
+    pin_memory: bool = False,
+) -> AssessmentDict:
+    """Evaluate a learning machine over a dataset under inference mode. The
+    reductions are aggregated on the device and transferred to the host once at the end
+
+    Args:
+        learner (LearningMachine): The machine to evaluate
+        data (typing.Union[typing.Iterable, Dataset]): A map-style dataset or an iterable
+          such as a DataLoader that outputs (x, t) batches
+        batch_size (int, optional): The batch size if data is a dataset. Defaults to 32.
+        reduction_override (str, optional): The reduction to pass to assess_y. Use a reduction
+          that outputs a value per sample so the dataset level reductions are exact. Defaults to "samplemeans".
+        reductions (typing.Iterable[str], optional): The reductions to compute.
+          Defaults to RunningAssessment.REDUCTIONS.
+        n_prefetch (int, optional): The number of batches to load ahead. Defaults to 2.
+        pin_memory (bool, optional): Whether to pin the memory of the batches. Defaults to False.
+
+    Returns:
+        AssessmentDict: The reductions of each assessment named '<name>_<reduction>'
+    """
+    if isinstance(data, Dataset):
+        data = dataset_batches(data, batch_size, False)
+    training = learner.training
+    learner.eval()
+    state = State()
+    running = RunningAssessment()
+    try:
+        with torch.inference_mode():
+            for x, t in Prefetcher(data, learner.device(), n_prefetch, pin_memory):
+                y = learner(x, state)
+                running.update(
+                    learner.assess_y(y, t, reduction_override=reduction_override)
+                )
+                state.reset()
+    finally:
+        learner.train(training)
+    return running.reduce(reductions)
@@ -4,6 +4,7 @@ Modules to wrap inputs ond outputs for the network
 
 # 1st party
 import typing
+import threading
 
 # 3rd party
 import torch
@@ -14,6 +15,70 @@ from torch import nn
 from .. import utils as base_utils
 
 
+RELEASE_MODES = ("clone", "shared")
+_release_state = threading.local()
+_default_release_mode = "clone"
+
+
+def get_release_mode() -> str:
+    """
+    Returns:
+        str: The release mode currently in effect. Either 'clone' or 'shared'
+    """
+    stack = getattr(_release_state, "stack", None)
+    if stack:
+        return stack[-1]
+    return _default_release_mode
+
+
+def set_release_mode(mode: str) -> str:
+    """Set the global release mode used by IO.release()
+
+    Args:
+        mode (str): 'clone' to copy the tensors on release or 'shared' to
+          return detached tensors that share storage with the original
+
+    Raises:
+        ValueError: If the mode is invalid
+
+    Returns:
+        str: The previous release mode
+    """
+    global _default_release_mode
+    if mode not in RELEASE_MODES:
+        raise ValueError(f"Release mode must be one of {RELEASE_MODES} not {mode}")
+    prev = _default_release_mode
+    _default_release_mode = mode
+    return prev
+
+
+class release_mode(object):
+    """Context manager to temporarily change the release mode for the current thread"""
+
+    def __init__(self, mode: str):
+        """
+        Args:
+            mode (str): The release mode to use within the context. If None, the
+              current mode will be kept
+
+        Raises:
+            ValueError: If the mode is invalid
+        """
+        if mode is not None and mode not in RELEASE_MODES:
+            raise ValueError(f"Release mode must be one of {RELEASE_MODES} not {mode}")
+        self.mode = mode
+
+    def __enter__(self) -> "release_mode":
+        stack = getattr(_release_state, "stack", None)
+        if stack is None:
+            stack = _release_state.stack = []
+        stack.append(self.mode or get_release_mode())
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _release_state.stack.pop()
+
+
 class IO(object):
     """
     Container for the inputs, outputs, and targets of a learning machine
@@ -33,6 +98,8 @@ class IO(object):
             for x_i in x
         )
         self._freshened = False
+        self._shared = False
+        self._versions = None
         self._singular = len(x) == 1
 
         if names is not None:
@@ -74,6 +141,12 @@ class IO(object):
         """
         if device is None:
             return self
+        device = torch.device(device)
+        if all(
+            not isinstance(x_i, torch.Tensor) or x_i.device == device for x_i in self._x
+        ):
+            # the tensors do not need to be moved
+            return self
 
         self._x = [
             x_i.to(device) if isinstance(x_i, torch.Tensor) else x_i for x_i in self._x
@@ -135,12 +208,25 @@ class IO(object):
 
         return IO(*self._x, detach=True, names=self._names)
 
-    def release(self) -> "IO":
-        """
+    def release(self, mode: str = None) -> "IO":
+        """Release the IO so that it is no longer connected to the graph
+
+        Args:
+            mode (str, optional): 'clone' to copy the tensors or 'shared' to return detached
+              tensors that share storage with this IO without copying. A shared IO is not
+              copy-on-write. Writing to its tensors directly writes to this IO as well, so
+              call own() before writing to it. The library's in-place updates call own().
+              If None, uses the current release mode. Defaults to None.
 
         Returns:
-            IO: The
-        """
+            IO: The released IO
+        """
+        mode = mode or get_release_mode()
+        if mode == "shared":
+            result = self.detach()
+            result._shared = True
+            result._versions = result._tensor_versions()
+            return result
         return self.clone().detach()
 
     def out(self, release: bool = True) -> "IO":
@@ -148,6 +234,44 @@ class IO(object):
             return self.release()
         return self
 
+    @property
+    def shared(self) -> bool:
+        """
+        Returns:
+            bool: Whether the tensors share storage with the IO that was released
+        """
+        return self._shared
+
+    def _tensor_versions(self) -> typing.Tuple:
+
+        return tuple(
+            x_i._version if isinstance(x_i, torch.Tensor) else None for x_i in self._x
+        )
+
+    def own(self) -> "IO":
+        """Copy the tensors if they share storage with another IO. Call before
+        writing to the IO in place
+
+        Raises:
+            RuntimeError: If the shared storage was written to after the release, in
+              which case the IO and the IO it was released from no longer hold the released values
+
+        Returns:
+            IO: self
+        """
+        if not self._shared:
+            return self
+        if self._tensor_versions() != self._versions:
+            raise RuntimeError(
+                "The storage of a shared IO was written to in place before calling own()"
+            )
+        self._x = tuple(
+            torch.clone(x_i) if isinstance(x_i, torch.Tensor) else x_i for x_i in self._x
+        )
+        self._shared = False
+        self._versions = None
+        return self
+
     def is_empty(self) -> bool:
         """
         Returns:
@@ -311,9 +435,16 @@ class Idx(object):
         in the IO
 
         Args:
-            idx (optional): The values to index by. Defaults to None.
+            idx (optional): The values to index by. A slice can be passed in to index
+              a contiguous block without copying. The tensors indexed by a slice are views
+              so writing to them writes to the tensors that were indexed. Defaults to None.
         """
-        if not isinstance(idx, torch.LongTensor) and idx is not None:
+        if isinstance(idx, slice):
+            if idx.step not in (None, 1) or idx.start is None or idx.stop is None:
+                raise ValueError(
+                    f"Slice index must have a start and stop and a step of 1 not {idx}"
+                )
+        elif not isinstance(idx, torch.LongTensor) and idx is not None:
             if isinstance(idx, torch.Tensor):
                 idx = idx.long()
             else:
@@ -321,6 +452,19 @@ class Idx(object):
         self.dim = dim
         self.idx = idx
 
+    @property
+    def is_slice(self) -> bool:
+        """
+        Returns:
+            bool: Whether the index is a contiguous slice
+        """
+        return isinstance(self.idx, slice)
+
+    def _as_tensor(self, device=None) -> torch.LongTensor:
+        if self.is_slice:
+            return torch.arange(self.idx.start, self.idx.stop, device=device)
+        return self.idx
+
     def idx_th(
         self, *x: torch.Tensor
     ) -> typing.Union[typing.Tuple[torch.Tensor], torch.Tensor]:
@@ -329,7 +473,12 @@ class Idx(object):
         Returns:
             typing.Union[typing.Tuple[torch.Tensor], torch.Tensor]: _description_
         """
-        if self.idx is not None:
+        if self.is_slice:
+            x = [
+                x_i.narrow(self.dim, self.idx.start, self.idx.stop - self.idx.start)
+                for x_i in x
+            ]
+        elif self.idx is not None:
             x = [x_i.index_select(self.dim, self.idx.detach()) for x_i in x]
 
         return x
@@ -342,6 +491,8 @@ class Idx(object):
         """
         if self.idx is None:
             return None
+        if self.is_slice:
+            return list(range(self.idx.start, self.idx.stop))
         return self.idx.tolist()
 
     def idx_list(self) -> typing.List[int]:
@@ -350,6 +501,8 @@ class Idx(object):
         Returns:
             typing.List[int]: _description_
         """
+        if self.is_slice:
+            return self.tolist()
         result = []
         for i in self.idx:
             result.append(self.idx[i.item()])
@@ -361,8 +514,8 @@ class Idx(object):
         Returns:
             Idx: The detached index
         """
-        if self.idx is None:
-            return Idx(dim=self.dim)
+        if self.idx is None or self.is_slice:
+            return Idx(self.idx, dim=self.dim)
         return Idx(self.idx.detach(), dim=self.dim)
 
     def update(self, source: IO, destination: IO, idx_both: bool = False):
@@ -390,6 +543,47 @@ class Idx(object):
                 destination_i.requires_grad_(True).retain_grad()
         return destination
 
+    def update_(self, source: IO, destination: IO, idx_both: bool = False) -> IO:
+        """Update an io in place with the index. Unlike update() the destination is not
+        cloned so use when the destination is owned by the caller such as in a minibatch loop.
+        If the destination shares storage with a released IO, it will be copied first.
+        The source is cast to the dtype of the destination as update() does
+
+        Args:
+            source (IO): The io to update with
+            destination (IO): The io to update
+            idx_both (bool): Whether only the destination is indexed or both are indexed
+
+        Raises:
+            ValueError: If the index is None and the shapes of the source and destination differ
+
+        Returns:
+            IO: The destination
+        """
+        destination.own()
+        with torch.no_grad():
+            for source_i, destination_i in zip(source, destination):
+                source_i = source_i.detach().to(destination_i.dtype)
+                if self.idx is None:
+                    if source_i.shape != destination_i.shape:
+                        raise ValueError(
+                            f"Cannot update in place as the shape of the source {source_i.shape} "
+                            f"does not match the destination {destination_i.shape}"
+                        )
+                    destination_i.copy_(source_i)
+                    continue
+                if self.is_slice:
+                    start, length = self.idx.start, self.idx.stop - self.idx.start
+                    if idx_both:
+                        source_i = source_i.narrow(self.dim, start, length)
+                    destination_i.narrow(self.dim, start, length).copy_(source_i)
+                    continue
+                idx = self.idx.long()
+                if idx_both:
+                    source_i = source_i.index_select(self.dim, idx)
+                destination_i.index_copy_(self.dim, idx, source_i)
+        return destination
+
     def update_th(self, source: torch.Tensor, destination: torch.Tensor):
         """Update a torch.Tensor with the idx
 
@@ -419,7 +613,13 @@ class Idx(object):
             return self
         elif self.idx is None:
             return idx
-
+        if self.is_slice and idx.is_slice:
+            return Idx(
+                slice(self.idx.start + idx.idx.start, self.idx.start + idx.idx.stop)
+            )
+        if self.is_slice:
+            # create the range on the device of the index that is a tensor
+            return Idx(self._as_tensor(idx.idx.device)[idx.idx])
         return Idx(self.idx[idx.idx])
 
     def __len__(self) -> int:
@@ -427,6 +627,8 @@ class Idx(object):
         Returns:
             int: The number of elements in the index
         """
+        if self.is_slice:
+            return self.idx.stop - self.idx.start
         return len(self.idx)
 
     def to(self, device) -> "Idx":
@@ -438,7 +640,7 @@ class Idx(object):
         Returns:
             Idx: the resulting index
         """
-        if self.idx is not None:
+        if self.idx is not None and not self.is_slice:
             self.idx = self.idx.to(device)
         return self
 
@@ -452,6 +654,127 @@ class Idx(object):
         return result
 
 
+class IOBuffer(object):
+    """
+    Preallocated buffer to accumulate IOs along the first dimension. Use instead of
+    storing IOs in a list and concatenating them
+    """
+
+    def __init__(self, capacity: int = 0, growth: float = 2.0):
+        """initializer
+
+        Args:
+            capacity (int, optional): The number of rows to preallocate when the first IO is
+              appended. Defaults to 0.
+            growth (float, optional): The factor to grow the capacity by when it is exceeded.
+              Must be greater than 1. Defaults to 2.0.
+
+        Raises:
+            ValueError: If the growth factor is not greater than 1
+        """
+        if growth <= 1.0:
+            raise ValueError(f"Argument growth must be greater than 1 not {growth}")
+        self._capacity = capacity
+        self._growth = growth
+        self._buffers: typing.List[typing.Union[torch.Tensor, np.ndarray]] = None
+        self._size = 0
+        self._names = None
+
+    @property
+    def capacity(self) -> int:
+        """
+        Returns:
+            int: The number of rows that can be stored without reallocating
+        """
+        return self._capacity
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: The number of rows that have been appended
+        """
+        return self._size
+
+    def _allocate(self, like, capacity: int):
+
+        if isinstance(like, torch.Tensor):
+            return torch.empty(
+                (capacity, *like.shape[1:]), dtype=like.dtype, device=like.device
+            )
+        if isinstance(like, np.ndarray):
+            return np.empty((capacity, *like.shape[1:]), dtype=like.dtype)
+        raise ValueError(
+            f"IOBuffer can only store tensors and arrays not {type(like)}"
+        )
+
+    def _grow(self, io: IO, required: int):
+
+        capacity = max(required, int(self._capacity * self._growth), 1)
+        if self._buffers is None:
+            capacity = max(required, self._capacity)
+            self._buffers = [self._allocate(x_i, capacity) for x_i in io]
+            self._names = io.names
+        else:
+            buffers = []
+            for buffer in self._buffers:
+                grown = self._allocate(buffer, capacity)
+                grown[: self._size] = buffer[: self._size]
+                buffers.append(grown)
+            self._buffers = buffers
+        self._capacity = capacity
+
+    def append(self, io: IO) -> "IOBuffer":
+        """Copy an IO into the buffer. The values will be detached
+
+        Args:
+            io (IO): The IO to append
+
+        Raises:
+            ValueError: If the number of elements in the io does not match the buffer
+              or the elements do not have the same number of rows
+
+        Returns:
+            IOBuffer: self
+        """
+        if self._buffers is not None and len(io) != len(self._buffers):
+            raise ValueError(
+                f"Number of elements in the io {len(io)} must be the "
+                f"same as the buffer {len(self._buffers)}"
+            )
+        n = len(io.f)
+        for i, x_i in enumerate(io):
+            if len(x_i) != n:
+                raise ValueError(
+                    f"Element {i} of the io has {len(x_i)} rows but must have "
+                    f"the same number of rows as the first element {n}"
+                )
+        required = self._size + n
+        if self._buffers is None or required > self._capacity:
+            self._grow(io, required)
+        for buffer, x_i in zip(self._buffers, io):
+            if isinstance(x_i, torch.Tensor):
+                x_i = x_i.detach()
+            buffer[self._size : required] = x_i
+        self._size = required
+        return self
+
+    def io(self) -> IO:
+        """
+        Returns:
+            IO: The filled region of the buffer. The IO is a view on the buffer so
+              it will change if the buffer is written to
+        """
+        if self._buffers is None:
+            return IO()
+        return IO(
+            *[buffer[: self._size] for buffer in self._buffers], names=self._names
+        )
+
+    def clear(self):
+        """Empty the buffer. The storage is kept so it can be reused"""
+        self._size = 0
+
+
 def idx_io(io: IO, idx: Idx = None, release: bool = False) -> IO:
     """Use Idx on an IO. It is a convenience function for when you don't know if idx is
     specified
@@ -499,6 +822,7 @@ def update_io(
     idx: Idx = None,
     detach: bool = True,
     idx_both: bool = False,
+    inplace: bool = False,
 ) -> IO:
     """Update the IO in place
 
@@ -506,6 +830,8 @@ def update_io(
         source (IO): The io to update with
         destination (IO): The io to update
         idx (Idx, optional): The index for the source. Defaults to None.
+        inplace (bool, optional): Whether to write into the destination rather
+          than a clone of it. Defaults to False.
 
     Returns:
         IO: the updated IO
@@ -513,7 +839,10 @@ def update_io(
 
     if idx is None:
         idx = Idx()
-    destination = idx.update(source, destination, idx_both)
+    if inplace:
+        destination = idx.update_(source, destination, idx_both)
+    else:
+        destination = idx.update(source, destination, idx_both)
     if detach:
         return destination.detach()
     return destination
@@ -16,6 +16,7 @@ Loop - Loop over data
 
 # 1st party
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 import typing
 
 # 3rd party
@@ -25,8 +26,10 @@ import torch.nn as nn
 # local
 from ._assess import Assessment, Criterion
 from ._state import IDable, State
-from ._io import IO, Idx
+from ._io import IO, Idx, release_mode
+from ._compile import Compilable
 from functools import wraps
+from contextlib import nullcontext
 
 
 class StepXHook(ABC):
@@ -235,10 +238,39 @@ class FeatureIdxStepX(StepX):
         pass
 
 
-class LearningMachine(IDable, StepTheta, StepX, nn.Module, ABC):
+class LearningMachine(IDable, StepTheta, StepX, Compilable, nn.Module, ABC):
+
+    # the key the unreleased output of forward is cached under
+    FORWARD_Y = "__forward_y__"
+    # the key the loss computed in learn() is cached under
+    LEARN_LOSS = "__learn_loss__"
+
     def __init__(self) -> None:
 
         super().__init__()
+        # The release mode to use for the outputs of forward ('clone' or 'shared')
+        # If None, the global release mode will be used
+        self.release_mode: str = None
+        # Whether to reset one state in place for each call rather than
+        # creating a new state. Outputs stored in the state will be overwritten
+        self.reuse_state: bool = False
+        self._reused_state: State = None
+        # the number of calls using a state from new_state(). A reentrant call
+        # gets a new state so it does not reset the state of the outer call
+        self._state_depth: int = 0
+        # Whether to cache the unreleased output of every call to forward in the state
+        # so that accumulate and step_x do not need to execute forward again. The cache
+        # keeps the graph alive until it is consumed. learn() caches the output it
+        # computes regardless and removes it after accumulating
+        self.forward_cache: bool = False
+        # The number of times cached_y() had to execute forward
+        self.forward_cache_misses: int = 0
+        # The dtype to execute forward and assess_y with under torch.autocast
+        # such as torch.bfloat16. If None, autocast will not be used
+        self.autocast: torch.dtype = None
+        # the device is cached until the module is moved or clear_device_cache() is called
+        self._device_cached: bool = False
+        self._device: torch.device = None
         self._test_posthooks = []
         self._learn_posthooks = []
         self._forward_hooks = []
@@ -249,19 +281,112 @@ class LearningMachine(IDable, StepTheta, StepX, nn.Module, ABC):
         self.forward = self._forward_hook_runner
         self.test = self._test_hook_runner
 
+    def new_state(self) -> State:
+        """Create the state to use when one is not passed in. If reuse_state is True
+        the same state will be reset in place and returned unless a call to the
+        machine is already using it
+
+        Returns:
+            State: The state to use
+        """
+        if not self.reuse_state or self._state_depth > 0:
+            return State()
+        if self._reused_state is None:
+            self._reused_state = State()
+            return self._reused_state
+        return self._reused_state.reset()
+
+    @contextmanager
+    def _use_state(self, state: State = None) -> typing.Iterator[State]:
+        """Use the state passed in or one from new_state() for the duration of a call
+
+        Args:
+            state (State, optional): The state passed to the call. Defaults to None.
+
+        Yields:
+            State: The state to use
+        """
+        if state is not None:
+            yield state
+            return
+        state = self.new_state()
+        self._state_depth += 1
+        try:
+            yield state
+        finally:
+            self._state_depth -= 1
+
+    def set_autocast(
+        self, dtype: torch.dtype = torch.bfloat16, recursive: bool = True
+    ) -> "LearningMachine":
+        """Execute forward and assess_y under torch.autocast. The outputs of
+        step_x are cast back to float32 and the parameters stay in float32
+
+        Args:
+            dtype (torch.dtype, optional): The dtype to autocast to. If None autocast will be
+              disabled. Defaults to torch.bfloat16.
+            recursive (bool, optional): Whether to set the dtype for the learning machines
+              contained in the machine such as the nodes of a GraphLearner. Defaults to True.
+
+        Returns:
+            LearningMachine: self
+        """
+        if recursive:
+            for module in self.modules():
+                if isinstance(module, LearningMachine):
+                    module.autocast = dtype
+        else:
+            self.autocast = dtype
+        return self
+
+    def autocast_context(self):
+        """
+        Returns:
+            A torch.autocast context for the device of the machine if autocast is set
+              else a null context
+        """
+        if self.autocast is None:
+            return nullcontext()
+        device = self.device()
+        return torch.autocast(
+            device.type if device is not None else "cpu", dtype=self.autocast
+        )
+
     def device(self) -> torch.device:
         """Convenience method to get the device for the machine
-        Chooses the first parameter. Assumes all sub machines have the same device
+        Chooses the first parameter. Assumes all sub machines have the same device.
+        The device is cached once the machine has a parameter and is cleared when the
+        machine is moved with to(), cuda() etc. or a module or parameter is set on it.
+        Call clear_device_cache() after moving or replacing a parameter of a sub module
 
         Returns:
             torch.device: Device of the learning machine
         """
-
+        if self._device_cached:
+            return self._device
         try:
-            p = next(self.parameters())
-            return p.device
+            device = next(self.parameters()).device
         except StopIteration:
+            # do not cache so a module that is set later is found
             return None
+        self._device = device
+        self._device_cached = True
+        return device
+
+    def clear_device_cache(self):
+        """Clear the cached device of the machine"""
+        self._device_cached = False
+
+    def _apply(self, fn, *args, **kwargs):
+        # the device may change when moved so the cached device must be cleared
+        self._device_cached = False
+        return super()._apply(fn, *args, **kwargs)
+
+    def __setattr__(self, name: str, value):
+        # setting a module or parameter may change the device
+        if isinstance(value, (nn.Module, nn.Parameter)):
+            self.__dict__["_device_cached"] = False
+        super().__setattr__(name, value)
 
     def to_my_device(
         self, *io: IO
@@ -341,9 +466,77 @@ class LearningMachine(IDable, StepTheta, StepX, nn.Module, ABC):
         Returns:
             IO: The output fo the machine
         """
-        if state is None:
-            state = State()
-        return super().__call__(x, state, release, *args, **kwargs)
+        with self._use_state(state) as state:
+            return super().__call__(x, state, release, *args, **kwargs)
+
+    def cached_y(self, x: IO, state: State, consume: bool = False) -> IO:
+        """Retrieve the unreleased output of forward for x from the forward cache.
+        If it is not cached forward will be executed and the miss will be counted
+        in forward_cache_misses
+
+        Args:
+            x (IO): The input that was passed to forward
+            state (State): The learning state
+            consume (bool, optional): Whether to remove the output from the cache. Use
+              if the graph will be freed by backward. Defaults to False.
+
+        Returns:
+            IO: The unreleased output
+        """
+        y = state.get((self, x, self.FORWARD_Y))
+        if y is None:
+            self.forward_cache_misses += 1
+            y = self(x, state, release=False)
+        if consume:
+            state[self, x, self.FORWARD_Y] = None
+        return y
+
+    def loss_reduction(self, reduction_override: str = None) -> str:
+        """Get the reduction assess_y will use for an override. Override if the
+        machine uses a criterion so that the loss computed in learn() can be reused
+
+        Args:
+            reduction_override (str, optional): The reduction to override with. Defaults to None.
+
+        Returns:
+            str: The reduction that will be used
+        """
+        return reduction_override
+
+    def cached_loss(
+        self,
+        x: IO,
+        y: IO,
+        state: State,
+        reduction_override: str = None,
+        consume: bool = False,
+    ) -> Assessment:
+        """Retrieve the loss computed in learn() so that accumulate does not have
+        to compute it again
+
+        Args:
+            x (IO): The input
+            y (IO): The output the loss must have been computed on
+            state (State): The learning state
+            reduction_override (str, optional): The reduction the loss must have been computed with. Defaults to None.
+            consume (bool, optional): Whether to remove the loss from the cache. Defaults to False.
+
+        Returns:
+            Assessment: The loss or None if it was not computed with y and the reduction
+        """
+        cached = state.get((self, x, self.LEARN_LOSS))
+        if cached is None:
+            return None
+        if consume:
+            state[self, x, self.LEARN_LOSS] = None
+        assessment, reduction, cached_y = cached
+        if (
+            cached_y is not y
+            or reduction != self.loss_reduction(reduction_override)
+            or not assessment.value.requires_grad
+        ):
+            return None
+        return assessment
 
     def forward_hook(self, hook: ForwardHook) -> "LearningMachine":
         """_summary_
@@ -376,6 +569,7 @@ class LearningMachine(IDable, StepTheta, StepX, nn.Module, ABC):
         clear_state: bool = False,
         reduction_override: str = None,
         get_y: bool = False,
+        step: bool = True,
     ):
         """Call step wrapped with the hooks
 
@@ -384,18 +578,25 @@ class LearningMachine(IDable, StepTheta, StepX, nn.Module, ABC):
             t (IO): The target IO
             state (State): The current state
         """
-        state = state or State()
-        assessment, y = self._base_learn(
-            x, t, state, clear_state, reduction_override, True
-        )
+        with self._use_state(state) as state:
+            if not self._learn_posthooks:
+                # skip creating the released output if no hook needs it
+                return self._base_learn(
+                    x, t, state, clear_state, reduction_override, get_y, step=step
+                )
+            assessment, y = self._base_learn(
+                x, t, state, clear_state, reduction_override, True, step=step
+            )
 
-        for posthook in self._learn_posthooks:
-            posthook(x, t, state, y, assessment)
+            for posthook in self._learn_posthooks:
+                posthook(x, t, state, y, assessment)
         if get_y:
             return assessment, y
         return assessment
 
-    def _forward_hook_runner(self, x: IO, state: State, *args, **kwargs):
+    def _forward_hook_runner(
+        self, x: IO, state: State, release: bool = True, *args, **kwargs
+    ):
         """_summary_
 
         Args:
@@ -403,9 +604,32 @@ class LearningMachine(IDable, StepTheta, StepX, nn.Module, ABC):
             t (IO): The target
             state (State, optional): The state at the timestep. Defaults to None.
         """
-        y = self._base_forward(x, state, *args, **kwargs)
-        for hook in self._forward_hooks:
-            y = hook(self, x, y, state)
+        if self.autocast is None:
+            return self._run_forward(x, state, release, *args, **kwargs)
+        with self.autocast_context():
+            return self._run_forward(x, state, release, *args, **kwargs)
+
+    def _run_forward(self, x: IO, state: State, release: bool = True, *args, **kwargs):
+
+        if self.forward_cache:
+            # execute forward without releasing so the output can be cached
+            y = self._base_forward(x, state, False, *args, **kwargs)
+            if isinstance(y, IO):
+                state[self, x, self.FORWARD_Y] = y
+                if release:
+                    if self.release_mode is None:
+                        y = y.out(release)
+                    else:
+                        with release_mode(self.release_mode):
+                            y = y.out(release)
+        elif self.release_mode is None:
+            y = self._base_forward(x, state, release, *args, **kwargs)
+        else:
+            with release_mode(self.release_mode):
+                y = self._base_forward(x, state, release, *args, **kwargs)
+        if self._forward_hooks:
+            for hook in self._forward_hooks:
+                y = hook(self, x, y, state)
         return y
 
     def _test_hook_runner(
@@ -423,11 +647,11 @@ class LearningMachine(IDable, StepTheta, StepX, nn.Module, ABC):
             t (IO): The target IO
             state (State): The current state
         """
-        state = state or State()
-        assessment, y = self._base_test(x, t, state, reduction_override, True)
+        with self._use_state(state) as state:
+            assessment, y = self._base_test(x, t, state, reduction_override, True)
 
-        for posthook in self._test_posthooks:
-            posthook(x, t, state, y, assessment)
+            for posthook in self._test_posthooks:
+                posthook(x, t, state, y, assessment)
         if get_y:
             return assessment, y
 
@@ -441,6 +665,7 @@ class LearningMachine(IDable, StepTheta, StepX, nn.Module, ABC):
         clear_state: bool = False,
         reduction_override: str = None,
         get_y: bool = False,
+        step: bool = True,
     ) -> Assessment:
         """Learn method . This includes cleanup and initialization so it is easier to use in practice
         than step
@@ -451,6 +676,8 @@ class LearningMachine(IDable, StepTheta, StepX, nn.Module, ABC):
             state (State, optional): The current learning state. Defaults to None.
             return_step (bool, optional): Whether to return step_x based on the inputs. Defaults to False.
             clear_state (bool, optional): Whether to clear teh state for the machine. Defaults to False.
+            step (bool, optional): Whether to call step after accumulating. Set to False to
+              accumulate over multiple batches before stepping. Defaults to True.
 
         Returns:
             Assessment: _description_
@@ -459,16 +686,46 @@ class LearningMachine(IDable, StepTheta, StepX, nn.Module, ABC):
         self.train()
         x, t = self.to_my_device(x, t)
         state = state or State()
-        y = self(x, state)
-        assessment = self.assess_y(y, t, reduction_override=reduction_override)
+        # compute the loss once with grad so that accumulate can reuse it
+        y = self(x, state, release=False)
+        with self.autocast_context():
+            assessment = self.assess_y(y, t, reduction_override=reduction_override)
+        state[self, x, self.FORWARD_Y] = y
+        state[self, x, self.LEARN_LOSS] = (
+            assessment,
+            self.loss_reduction(reduction_override),
+            y,
+        )
         self.accumulate(x, t, state)
-        self.step(x, t, state)
+        # do not keep the graph alive after accumulating
+        state[self, x, self.FORWARD_Y] = None
+        state[self, x, self.LEARN_LOSS] = None
+        if step:
+            self.step(x, t, state)
+        # detach in place rather than creating another assessment
+        assessment.value = assessment.value.detach()
         if clear_state:
             state.clear(self)
         if get_y:
-            return assessment, y
+            return assessment, y.out()
         return assessment
 
+    def _step_x_hook_runner(self, x: IO, t: IO, state: State, *args, **kwargs) -> IO:
+
+        x_prime = super()._step_x_hook_runner(x, t, state, *args, **kwargs)
+        if self.autocast is None or not isinstance(x_prime, IO):
+            return x_prime
+        # targets stay in float32 so the reduced precision does not accumulate
+        return IO(
+            *[
+                x_i.float()
+                if isinstance(x_i, torch.Tensor) and x_i.dtype == self.autocast
+                else x_i
+                for x_i in x_prime
+            ],
+            names=x_prime.names,
+        )
+
     def backward(self, x: IO, t: IO, state: State, step: bool = False) -> IO:
         """
         Go backward through the network
@@ -510,11 +767,9 @@ class LearningMachine(IDable, StepTheta, StepX, nn.Module, ABC):
         with torch.no_grad():
             x, t = self.to_my_device(x, t)
             y = self(x, state=state)
-            result = (
-                self.assess_y(y, t, reduction_override=reduction_override)
-                .cpu()
-                .detach()
-            )
+            with self.autocast_context():
+                result = self.assess_y(y, t, reduction_override=reduction_override)
+            result = result.cpu().detach()
             if get_y:
                 return result, y
             return result
@@ -0,0 +1,188 @@
+"""
+Columnar store to keep the assessments logged over a long run at a constant memory
+"""
+
+# 1st party
+import csv
+import queue
+import threading
+import typing
+
+# 3rd party
+import numpy as np
+import torch
+
+
+class MetricLog(object):
+    """Store each metric in a preallocated ring buffer column. Appending is O(1)
+    and once a column is full the oldest values are overwritten. Columns are
+    kept on the device of the value that was first appended so appending does not
+    synchronize with the host
+    """
+
+    def __init__(self, capacity: int = 65536, dtype: torch.dtype = torch.float32):
+        """initializer
+
+        Args:
+            capacity (int, optional): The number of values to keep for each column. Defaults to 65536.
+            dtype (torch.dtype, optional): The dtype of the columns. Defaults to torch.float32.
+
+        Raises:
+            ValueError: If the capacity is not positive
+        """
+        if capacity <= 0:
+            raise ValueError(f"Capacity must be greater than 0 not {capacity}")
+        self.capacity = capacity
+        self.dtype = dtype
+        self._columns: typing.Dict[typing.Tuple, torch.Tensor] = {}
+        # the number of values that have been appended to each column
+        self._counts: typing.Dict[typing.Tuple, int] = {}
+        self._queue: queue.Queue = None
+        self._writer: threading.Thread = None
+
+    def append(
+        self, id, name: str, value: typing.Union[torch.Tensor, float]
+    ) -> "MetricLog":
+        """Append a value to a column. If the value has more than one element the
+        mean will be appended
+
+        Args:
+            id: The id of the object the metric is for
+            name (str): The name of the metric
+            value (typing.Union[torch.Tensor, float]): The value to append
+
+        Returns:
+            MetricLog: self
+        """
+        key = (id, name)
+        column = self._columns.get(key)
+        if column is None:
+            device = value.device if isinstance(value, torch.Tensor) else None
+            column = self._columns[key] = torch.zeros(
+                self.capacity, dtype=self.dtype, device=device
+            )
+            self._counts[key] = 0
+        if isinstance(value, torch.Tensor):
+            value = value.detach()
+            if value.numel() != 1:
+                value = value.float().mean()
+            value = value.reshape(())
+        count = self._counts[key]
+        column[count % self.capacity] = value
+        self._counts[key] = count + 1
+        return self
+
+    def keys(self) -> typing.List[typing.Tuple]:
+        """
+        Returns:
+            typing.List[typing.Tuple]: The id and name of each column
+        """
+        return list(self._columns.keys())
+
+    def count(self, id, name: str) -> int:
+        """
+        Args:
+            id: The id of the object the metric is for
+            name (str): The name of the metric
+
+        Returns:
+            int: The number of values that have been appended to the column
+        """
+        return self._counts.get((id, name), 0)
+
+    def column(self, id, name: str) -> torch.Tensor:
+        """Retrieve the values that are still stored for a column in the order
+        they were appended
+
+        Args:
+            id: The id of the object the metric is for
+            name (str): The name of the metric
+
+        Returns:
+            torch.Tensor: The values of the column
+        """
+        key = (id, name)
+        column = self._columns[key]
+        count = self._counts[key]
+        if count <= self.capacity:
+            return column[:count]
+        start = count % self.capacity
+        return torch.cat([column[start:], column[:start]])
+
+    def snapshot(self) -> typing.Dict[str, torch.Tensor]:
+        """
+        Returns:
+            typing.Dict[str, torch.Tensor]: A copy of each column in the order appended
+              keyed by '<id>/<name>'
+        """
+        return {
+            f"{id}/{name}": self.column(id, name).clone()
+            for id, name in self._columns.keys()
+        }
+
+    def clear(self):
+        """Remove all columns"""
+        self._columns.clear()
+        self._counts.clear()
+
+    def _write(self, path: str, snapshot: typing.Dict[str, torch.Tensor], format: str):
+
+        arrays = {key: value.cpu().numpy() for key, value in snapshot.items()}
+        if format == "npz":
+            np.savez(path, **arrays)
+            return
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["column", "index", "value"])
+            for key, array in arrays.items():
+                for i, value in enumerate(array.tolist()):
+                    writer.writerow([key, i, value])
+
+    def _run_writer(self):
+
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            finally:
+                self._queue.task_done()
+
+    def export(self, path: str, format: str = None, background: bool = True):
+        """Export the columns to a file. The columns are copied when export is called
+        and written in a background thread so that training is not stalled
+
+        Args:
+            path (str): The path to write to
+            format (str, optional): 'npz' or 'csv'. If None will use the extension of the path. Defaults to None.
+            background (bool, optional): Whether to write in the background writer thread. Defaults to True.
+
+        Raises:
+            ValueError: If the format is not npz or csv
+        """
+        if format is None:
+            format = "csv" if path.endswith(".csv") else "npz"
+        if format not in ("npz", "csv"):
+            raise ValueError(f"Format must be npz or csv not {format}")
+        snapshot = self.snapshot()
+        if not background:
+            self._write(path, snapshot, format)
+            return
+        if self._writer is None or not self._writer.is_alive():
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._run_writer, daemon=True)
+            self._writer.start()
+        self._queue.put((path, snapshot, format))
+
+    def wait(self):
+        """Wait for all exports to be written"""
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self):
+        """Wait for the exports to be written and stop the writer thread"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._writer = None
@@ -1,13 +1,19 @@
 # 1st party
 import typing
+import weakref
 from dataclasses import dataclass
 from collections import OrderedDict
 from dataclasses import field
 
 # local
 from ._assess import Assessment, AssessmentDict
+from ._io import IO, IOBuffer
+from ._metrics import MetricLog
 from uuid import uuid4
 
+# 3rd party
+import torch
+
 
 class IDable(object):
     def __init__(self, *args, **kwargs):
@@ -46,16 +52,84 @@ class StateKeyError(KeyError):
     pass
 
 
+class StateBudgetError(RuntimeError):
+    """Raised when the tensors in a state exceed its memory budget"""
+
+    pass
+
+
+def _tensors(value) -> typing.Iterator[torch.Tensor]:
+    """Iterate over the tensors contained in a value stored in the state"""
+    if isinstance(value, torch.Tensor):
+        yield value
+    elif isinstance(value, Assessment):
+        yield from _tensors(value.value)
+    elif isinstance(value, IOBuffer):
+        yield from _tensors(value._buffers)
+    elif isinstance(value, typing.Dict):
+        for value_i in value.values():
+            yield from _tensors(value_i)
+    elif isinstance(value, (IO, list, tuple)):
+        for value_i in value:
+            yield from _tensors(value_i)
+
+
+def _storages(value) -> typing.Dict[typing.Tuple, int]:
+    """Retrieve the storages of the tensors in a value
+
+    Args:
+        value: The value to retrieve the storages of
+
+    Returns:
+        typing.Dict[typing.Tuple, int]: The bytes of each storage keyed by its device and pointer
+    """
+    storages = {}
+    for tensor in _tensors(value):
+        storage = tensor.untyped_storage()
+        storages[(tensor.device, storage.data_ptr())] = storage.nbytes()
+    return storages
+
+
+def _nbytes(value, seen: typing.Set[int] = None) -> int:
+    """Count the bytes of the storages of the tensors in a value
+
+    Args:
+        value: The value to count the bytes of
+        seen (typing.Set[int], optional): The storages that have already been counted.
+          Will be updated with the storages in the value. Defaults to None.
+
+    Returns:
+        int: The number of bytes
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    for ptr, nbytes in _storages(value).items():
+        if ptr in seen:
+            continue
+        seen.add(ptr)
+        total += nbytes
+    return total
+
+
 class AssessmentLog(object):
     """Class to log assessments during training. Especially ones that may occur 
     inside the network"""
 
-    def __init__(self):
-        """Instantiate the AssessmentLog"""
+    def __init__(self, deferred: bool = False):
+        """Instantiate the AssessmentLog
+
+        Args:
+            deferred (bool, optional): Whether to keep the assessments on the device
+              until the log is read or flush() is called. The assessments will then be
+              transferred to the cpu with one copy. Defaults to False.
+        """
 
         self._log: typing.Dict[
             typing.Any, typing.Dict[str, typing.Dict[str, typing.Dict[str, Assessment]]]
         ] = {}
+        self.deferred = deferred
+        # the dict and name of the assessments to transfer on flush
+        self._pending: typing.List[typing.Tuple[typing.Dict, str, Assessment]] = []
 
     def update(
         self,
@@ -79,7 +153,8 @@ class AssessmentLog(object):
             to_cpu (bool): Whether to convert to cpu or not
         """
         assessment = assessment.detach()
-        if to_cpu:
+        defer = to_cpu and self.deferred
+        if to_cpu and not defer:
             assessment = assessment.cpu()
 
         if id not in self._log:
@@ -95,15 +170,56 @@ class AssessmentLog(object):
             self._log[id][sub_id][obj_name] = cur
         else:
             self._log[id][sub_id][obj_name].update(cur)
+        if defer:
+            target = self._log[id][sub_id][obj_name]
+            for name, value in cur.items():
+                self._pending.append((target, name, value))
+
+    def flush(self):
+        """Transfer the deferred assessments to the cpu. The values are packed into
+        one buffer per device and dtype so that only one copy is made for each
+        """
+        if len(self._pending) == 0:
+            return
+        groups: typing.Dict[
+            typing.Tuple, typing.List[typing.Tuple[typing.Dict, str, Assessment]]
+        ] = {}
+        for target, name, assessment in self._pending:
+            # skip assessments that have been replaced since they were logged
+            if target.get(name) is not assessment:
+                continue
+            value = assessment.value
+            if value.device.type == "cpu":
+                continue
+            groups.setdefault((value.device, value.dtype), []).append(
+                (target, name, assessment)
+            )
+        self._pending.clear()
+
+        for entries in groups.values():
+            packed = torch.cat(
+                [assessment.value.reshape(-1) for _, _, assessment in entries]
+            ).cpu()
+            sizes = [assessment.value.numel() for _, _, assessment in entries]
+            for (target, name, assessment), value in zip(
+                entries, torch.split(packed, sizes)
+            ):
+                target[name] = Assessment(
+                    value.view(assessment.value.shape),
+                    assessment.maximize,
+                    assessment.name,
+                )
 
     @property
     def dict(self) -> typing.Dict:
+        self.flush()
         return self._log
 
     def clear(self, id=None, sub_id=None):
 
         if id is None:
             self._log.clear()
+            self._pending.clear()
             return
 
         self._log[id][sub_id].clear()
@@ -115,6 +231,7 @@ class AssessmentLog(object):
             typing.Dict[str, Assessment]: The assessment log converted to a dictionary of assessments
         """
 
+        self.flush()
         result = {}
         for key, val in self._log.items():
 
@@ -157,11 +274,35 @@ class DataContainer(object):
 class State(object):
     """Class to store the learning state for one learning iteration"""
 
-    def __init__(self):
-        """initializer"""
+    # the record used to store a value
+    _record = StateData
+
+    def __init__(self, deferred_logs: bool = False, metrics: MetricLog = None):
+        """initializer
+
+        Args:
+            deferred_logs (bool, optional): Whether to transfer the logged assessments
+              to the cpu only when the logs are read. Defaults to False.
+            metrics (MetricLog, optional): Store to stream the logged assessments into.
+              Pass the same store to each state to keep the metrics for a run. Defaults to None.
+        """
         super().__init__()
         self._data: typing.Dict[str, typing.Dict[str, DataContainer]] = {}
-        self._logs = AssessmentLog()
+        self._logs = AssessmentLog(deferred_logs)
+        self._metrics = metrics
+        self._budget: int = None
+        self._evict_on_budget: bool = True
+        # the least recently used entries if a budget is set
+        self._lru: typing.OrderedDict[typing.Tuple, typing.Tuple] = OrderedDict()
+        # the bytes and the number of entries in the lru for each storage so a
+        # storage shared by multiple entries is only counted once
+        self._storage_refs: typing.Dict[typing.Tuple, typing.List[int]] = {}
+        # the total bytes of the storages of the entries in the lru
+        self._used: int = 0
+        # the IOs used in keys. Their entries are evicted when they are collected
+        self._tracked: typing.Dict[
+            int, typing.Tuple[weakref.ref, typing.Set[typing.Tuple]]
+        ] = {}
 
     def id(self, obj) -> str:
         """Get the key for an object
@@ -194,8 +335,132 @@ class State(object):
             if not to_add:
                 return None
             self._data[id][sub_obj_id] = DataContainer()
+            self._track(obj, (id, sub_obj_id))
+            self._track(sub_obj, (id, sub_obj_id))
         return self._data[id][sub_obj_id]
 
+    def _track(self, obj, key: typing.Tuple):
+        """Evict the entries for a key when an IO used in it is garbage collected
+
+        Args:
+            obj: The object or tuple of objects used in the key
+            key (typing.Tuple): The id and sub id of the entries
+        """
+        for el in obj if isinstance(obj, tuple) else (obj,):
+            if not isinstance(el, IO):
+                continue
+            el_id = id(el)
+            tracked = self._tracked.get(el_id)
+            if tracked is None:
+                tracked = self._tracked[el_id] = (
+                    weakref.ref(el, self._evict_callback(el_id)),
+                    set(),
+                )
+            tracked[1].add(key)
+
+    def _evict_callback(self, el_id: int) -> typing.Callable:
+
+        # use a weak reference so the callback does not keep the state alive
+        state_ref = weakref.ref(self)
+
+        def evict(_):
+            state = state_ref()
+            if state is not None:
+                state._evict(el_id)
+
+        return evict
+
+    def _evict(self, el_id: int):
+        """Remove all entries that use an IO that has been collected
+
+        Args:
+            el_id (int): The id of the IO
+        """
+        _, keys = self._tracked.pop(el_id, (None, ()))
+        for key in keys:
+            self._remove_container(key)
+
+    def _remove_container(self, key: typing.Tuple):
+
+        id, sub_obj_id = key
+        containers = self._data.get(id)
+        if containers is None:
+            return
+        container = containers.pop(sub_obj_id, None)
+        if container is not None:
+            self._forget_all(key, container.info)
+        if len(containers) == 0:
+            del self._data[id]
+
+    def _forget(self, lru_key: typing.Tuple):
+        """Remove an entry from the lru"""
+        entry = self._lru.pop(lru_key, None)
+        if entry is None:
+            return
+        for ptr in entry[2]:
+            ref = self._storage_refs[ptr]
+            ref[1] -= 1
+            if ref[1] == 0:
+                del self._storage_refs[ptr]
+                self._used -= ref[0]
+
+    def _forget_all(self, key: typing.Tuple, keys: typing.Iterable[typing.Hashable]):
+        """Remove the entries of a container from the lru"""
+        if not self._lru:
+            return
+        id, sub_obj_id = key
+        for key_i in keys:
+            self._forget((id, sub_obj_id, key_i))
+
+    def _container_iter(
+        self,
+    ) -> typing.Iterator[typing.Tuple[typing.Tuple, DataContainer]]:
+
+        for id, containers in list(self._data.items()):
+            for sub_obj_id, container in list(containers.items()):
+                yield (id, sub_obj_id), container
+
+    def _copy_tracked(self, state: "State"):
+        """Track the IOs that are still alive in a spawned state"""
+        for el_id, (ref, keys) in list(self._tracked.items()):
+            el = ref()
+            if el is None:
+                continue
+            for key in keys:
+                state._track(el, key)
+
+    def size(self) -> typing.Dict[str, int]:
+        """
+        Returns:
+            typing.Dict[str, int]: The number of containers, values, sub states and
+              IOs tracked in the state
+        """
+        containers = values = subs = 0
+        for _, container in self._container_iter():
+            containers += 1
+            values += len(container.info)
+            subs += len(container.subs)
+        return {
+            "containers": containers,
+            "values": values,
+            "subs": subs,
+            "tracked": len(self._tracked),
+        }
+
+    def compact(self) -> typing.Dict[str, int]:
+        """Remove the entries for IOs that have been collected and all empty containers
+
+        Returns:
+            typing.Dict[str, int]: The size of the state after compacting
+        """
+        for el_id, (ref, _) in list(self._tracked.items()):
+            if ref() is None:
+                self._evict(el_id)
+        for key, container in self._container_iter():
+            if len(container.info) == 0 and len(container.subs) == 0:
+                self._remove_container(key)
+        return self.size()
+
     def set(self, index, value, to_keep: bool = False) -> typing.Any:
         """Store data in the state
 
@@ -208,10 +473,122 @@ class State(object):
             The value that was stored
         """
         obj, sub_obj, key = self._split_index(index)
+        return self._store(obj, sub_obj, key, value, to_keep)
+
+    def _store(self, obj, sub_obj, key, value, keep: bool = False) -> typing.Any:
+
         data_container = self._get_data_container(obj, sub_obj)
-        data_container.info[key] = StateData(value, to_keep)
+        record = data_container.info[key] = self._record(value, keep)
+        if self._budget is not None:
+            lru_key = (self.id(obj), self.id(sub_obj), key)
+            self._forget(lru_key)
+            storages = _storages(value)
+            for ptr, nbytes in storages.items():
+                ref = self._storage_refs.get(ptr)
+                if ref is None:
+                    self._storage_refs[ptr] = [nbytes, 1]
+                    self._used += nbytes
+                else:
+                    ref[1] += 1
+            self._lru[lru_key] = (data_container, record, tuple(storages))
+            self._enforce_budget(lru_key)
         return value
 
+    def _touch(self, obj, sub_obj, key):
+        """Mark an entry as used for the LRU eviction"""
+        keys = key if isinstance(key, typing.List) else [key]
+        id, sub_obj_id = self.id(obj), self.id(sub_obj)
+        for key in keys:
+            lru_key = (id, sub_obj_id, key)
+            if lru_key in self._lru:
+                self._lru.move_to_end(lru_key)
+
+    def _enforce_budget(self, newest: typing.Tuple):
+
+        if self._used <= self._budget:
+            return
+        if self._evict_on_budget:
+            # evict from the least recently used until the state is within the budget.
+            # evicting an entry does not free a storage another entry still uses
+            for lru_key, (container, record, _) in list(self._lru.items()):
+                if record.keep or lru_key == newest:
+                    continue
+                if container.info.get(lru_key[2]) is record:
+                    del container.info[lru_key[2]]
+                self._forget(lru_key)
+                if self._used <= self._budget:
+                    return
+        raise StateBudgetError(
+            f"The tensors in the state use {self._used} bytes which exceeds the budget "
+            f"of {self._budget} bytes. Usage by object: {self.memory_report()}"
+        )
+
+    def set_budget(self, budget: int = None, evict: bool = True) -> "State":
+        """Set the maximum number of bytes the tensors set in the state can use.
+        Only the entries set after the budget is set are counted. A storage that is shared
+        by multiple entries is only counted once. Sub states created afterwards have the
+        same budget
+
+        Args:
+            budget (int, optional): The budget in bytes. If None there will be no budget. Defaults to None.
+            evict (bool, optional): Whether to evict the least recently used entries that
+              are not kept when the budget is exceeded. If False or if evicting is not
+              enough a StateBudgetError will be raised. Defaults to True.
+
+        Returns:
+            State: self
+        """
+        self._budget = budget
+        self._evict_on_budget = evict
+        self._lru.clear()
+        self._storage_refs.clear()
+        self._used = 0
+        return self
+
+    def _new_sub(self) -> "State":
+        """Create a sub state with the budget of this state"""
+        state = self.__class__()
+        if self._budget is not None:
+            state.set_budget(self._budget, self._evict_on_budget)
+        return state
+
+    def memory_report(
+        self, seen: typing.Set = None
+    ) -> typing.Dict[typing.Any, typing.Dict[typing.Hashable, int]]:
+        """Report the bytes of the tensors stored in the state for each object id and key.
+        A storage that is shared by multiple entries is only counted once
+
+        Args:
+            seen (typing.Set, optional): The storages that have already been counted. Defaults to None.
+
+        Returns:
+            typing.Dict[typing.Any, typing.Dict[typing.Hashable, int]]: The bytes used for
+              each object id and key
+        """
+        seen = set() if seen is None else seen
+        report = {}
+        for (id, _), container in self._container_iter():
+            obj_report = report.setdefault(id, {})
+            for key, record in list(container.info.items()):
+                obj_report[key] = obj_report.get(key, 0) + _nbytes(record.data, seen)
+            for sub in container.subs.values():
+                for sub_id, sub_report in sub.memory_report(seen).items():
+                    cur = report.setdefault(sub_id, {})
+                    for key, nbytes in sub_report.items():
+                        cur[key] = cur.get(key, 0) + nbytes
+        return report
+
+    def memory_total(self) -> int:
+        """
+        Returns:
+            int: The total bytes of the tensors stored in the state
+        """
+        return sum(
+            nbytes
+            for obj_report in self.memory_report().values()
+            for nbytes in obj_report.values()
+        )
+
     def get(self, index, default=None) -> typing.Any:
         """Retrieve the value for a key
 
@@ -226,6 +603,8 @@ class State(object):
         obj, sub_obj, key = self._split_index(index)
 
         data_container = self._get_data_container(obj, sub_obj, False)
+        if self._budget is not None:
+            self._touch(obj, sub_obj, key)
         if data_container is None:
             return None
         try:
@@ -284,6 +663,8 @@ class State(object):
         """
         obj, sub_obj, key = self._split_index(index)
         data_container = self._get_data_container(obj, sub_obj, False)
+        if self._budget is not None:
+            self._touch(obj, sub_obj, key)
 
         if data_container is None:
             raise StateKeyError(
@@ -310,10 +691,7 @@ class State(object):
             value: The value to set
         """
         obj, sub_obj, key = self._split_index(index)
-
-        data_container = self._get_data_container(obj, sub_obj)
-        data_container.info[key] = StateData(value)
-        return value
+        return self._store(obj, sub_obj, key, value)
 
     def sub(self, index, to_add: bool = True) -> "State":
         """Retrieve a sub state
@@ -333,7 +711,7 @@ class State(object):
         if data_container is None:
             return None
         if to_add and key not in data_container.subs:
-            state = data_container.subs[key] = State()
+            state = data_container.subs[key] = self._new_sub()
             return state
         return data_container.subs[key]
 
@@ -357,7 +735,7 @@ class State(object):
             raise StateKeyError(
                 f"Subs State {key} is already in State and ignore exists is False."
             )
-        result = data_container.subs[key] = State()
+        result = data_container.subs[key] = self._new_sub()
         return result
 
     # NOT DONE
@@ -420,13 +798,10 @@ class State(object):
             bool: Whether the key is contained
         """
         obj, sub_obj, key = self._split_index(index)
-        id_ = self.id(obj)
-        sub_id = self.id(sub_obj)
-        if id_ not in self._data:
-            return False
-        if sub_id not in self._data[id_]:
+        data_container = self._get_data_container(obj, sub_obj, False)
+        if data_container is None:
             return False
-        return key in self._data[id_][sub_id].info
+        return key in data_container.info
 
     def log_assessment(
         self,
@@ -447,9 +822,26 @@ class State(object):
         obj_id = self.id(obj)
         sub_obj_id = self.id(sub_obj)
         self._logs.update(obj_id, obj_name, log_name, assessment, sub_obj_id)
+        if self._metrics is not None:
+            if isinstance(assessment, typing.Dict):
+                for name, value in assessment.items():
+                    self._metrics.append(obj_id, f"{obj_name}_{name}", value.value)
+            else:
+                self._metrics.append(
+                    obj_id, f"{obj_name}_{log_name}", assessment.value
+                )
+
+    @property
+    def metrics(self) -> MetricLog:
+        """
+        Returns:
+            MetricLog: The store the logged assessments are streamed into
+        """
+        return self._metrics
 
     @property
     def logs(self) -> AssessmentLog:
+        self._logs.flush()
         return self._logs
 
     def spawn(self, spawn_logs: bool = False) -> "State":
@@ -463,13 +855,310 @@ class State(object):
             State: The spawned state
         """
         spawned = {}
-        for k1, v1 in self._data.items():
-            spawned[k1] = {}
-            for k2, v2 in v1.items():
-                spawned[k1][k2] = v2.spawn()
+        for (k1, k2), v2 in self._container_iter():
+            spawned.setdefault(k1, {})[k2] = v2.spawn()
 
-        state = State()
+        state = self.__class__(self._logs.deferred, self._metrics)
         state._data = spawned
+        self._copy_tracked(state)
+        if spawn_logs:
+            state._logs = self._logs
+        return state
+
+    def reset(self, reset_logs: bool = True) -> "State":
+        """Reset the state in place to be used for another iteration. Unlike spawn()
+        the containers are reused. All data that is not to be kept will be cleared
+
+        Args:
+            reset_logs (bool, optional): Whether to clear the logs as well. Defaults to True.
+
+        Returns:
+            State: The state (self)
+        """
+        for container_key, container in self._container_iter():
+            info = container.info
+            removed = [key for key, data in info.items() if not data.keep]
+            for key in removed:
+                del info[key]
+            self._forget_all(container_key, removed)
+            for sub in container.subs.values():
+                sub.reset(reset_logs)
+        if reset_logs:
+            self._logs.clear()
+        return self
+
+    def clear(self, obj, sub_obj=None):
+        """Clear all of the data for an object
+
+        Args:
+            obj: The object to clear the data for
+            sub_obj (optional): The sub object to clear the data for. Defaults to None.
+        """
+        data_container = self._get_data_container(obj, sub_obj, False)
+        if data_container is not None:
+            self._forget_all((self.id(obj), self.id(sub_obj)), data_container.info)
+            data_container.info.clear()
+            data_container.subs.clear()
+
+    def buffer(
+        self, index, like: typing.Union[torch.Tensor, IO]
+    ) -> typing.Union[torch.Tensor, IO]:
+        """Retrieve a buffer that is kept in the state so that the output can be
+        written into it rather than allocated each iteration. The buffer will be
+        reallocated if it does not match like
+
+        Args:
+            index: The object and key for the buffer
+            like (typing.Union[torch.Tensor, IO]): The tensor or IO to match
+
+        Returns:
+            typing.Union[torch.Tensor, IO]: The buffer. Its values are not initialized
+        """
+        buffer = self.get(index)
+        if isinstance(like, IO):
+            if (
+                not isinstance(buffer, IO)
+                or len(buffer) != len(like)
+                or any(not _matches(b, l) for b, l in zip(buffer, like))
+            ):
+                buffer = IO(*[torch.empty_like(like_i) for like_i in like])
+                self.set(index, buffer, True)
+            return buffer
+        if not _matches(buffer, like):
+            buffer = torch.empty_like(like)
+            self.set(index, buffer, True)
+        return buffer
+
+
+def _matches(buffer, like: torch.Tensor) -> bool:
+
+    return (
+        isinstance(buffer, torch.Tensor)
+        and buffer.shape == like.shape
+        and buffer.dtype == like.dtype
+        and buffer.device == like.device
+    )
+
+
+class StateSlot(object):
+    """Record for a value stored in a CompactState"""
+
+    __slots__ = ("data", "keep")
+
+    def __init__(self, data: typing.Any, keep: bool = False):
+        self.data = data
+        self.keep = keep
+
+
+class SlotContainer(object):
+    """Container for the values of one object in a CompactState"""
+
+    __slots__ = ("info", "subs")
+
+    def __init__(
+        self,
+        info: typing.Dict[str, StateSlot] = None,
+        subs: typing.Dict[str, "State"] = None,
+    ):
+        self.info = info if info is not None else {}
+        self.subs = subs if subs is not None else {}
+
+    def spawn(self, spawn_logs: bool = False) -> "SlotContainer":
+
+        subs = {k: sub.spawn(spawn_logs) for k, sub in self.subs.items()}
+        infos = {
+            k: StateSlot(data.data, True) for k, data in self.info.items() if data.keep
+        }
+        return SlotContainer(infos, subs)
+
+
+class StateHandle(object):
+    """Direct access to the values stored for one object in a CompactState.
+    The handle is bound to the state it was retrieved from. If the state has a
+    budget, values are set through the state so that they are counted
+    """
+
+    __slots__ = ("_container", "_state", "_obj", "_sub_obj")
+
+    def __init__(
+        self, container: SlotContainer, state: "CompactState" = None, obj=None, sub_obj=None
+    ):
+        self._container = container
+        self._state = state
+        self._obj = obj
+        self._sub_obj = sub_obj
+
+    def __getitem__(self, key: typing.Hashable) -> typing.Any:
+        try:
+            return self._container.info[key].data
+        except KeyError:
+            raise StateKeyError(f"There is no recorded state for key {key}")
+
+    def __setitem__(self, key: typing.Hashable, value):
+        self.set(key, value)
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return key in self._container.info
+
+    def get(self, key: typing.Hashable, default=None) -> typing.Any:
+        record = self._container.info.get(key)
+        if record is None:
+            return default
+        return record.data
+
+    def set(self, key: typing.Hashable, value, keep: bool = False) -> typing.Any:
+        if self._state is not None and self._state._budget is not None:
+            return self._state._store(self._obj, self._sub_obj, key, value, keep)
+        self._container.info[key] = StateSlot(value, keep)
+        return value
+
+    def keep(self, key: typing.Hashable, keep: bool = True):
+        self._container.info[key].keep = keep
+
+
+def _no_ref() -> None:
+    return None
+
+
+class CompactState(State):
+    """State that interns each object / sub object pair to an integer slot. The
+    container for a pair is resolved once and then cached by the identity of the
+    objects so that repeated access for the same learner and input does not compute
+    their ids. Use handle() to access the values of an object without any lookup
+    """
+
+    _record = StateSlot
+
+    def __init__(self, deferred_logs: bool = False, metrics: MetricLog = None):
+        """initializer
+
+        Args:
+            deferred_logs (bool, optional): Whether to transfer the logged assessments
+              to the cpu only when the logs are read. Defaults to False.
+            metrics (MetricLog, optional): Store to stream the logged assessments into.
+              Defaults to None.
+        """
+        super().__init__(deferred_logs, metrics)
+        self._slots: typing.Dict[typing.Tuple, int] = {}
+        self._containers: typing.List[SlotContainer] = []
+        # slots that were evicted and can be reused
+        self._free: typing.List[int] = []
+        # the containers resolved for the identities of an object and sub object
+        self._resolved: typing.Dict[
+            typing.Tuple[int, int], typing.Tuple[weakref.ref, weakref.ref, SlotContainer]
+        ] = {}
+
+    def id(self, obj) -> str:
+        """Get the key for an object
+
+        Args:
+            obj: The object to get the key for
+
+        Returns:
+            str: The key
+        """
+        if obj is None:
+            return None
+        if isinstance(obj, IDable):
+            return obj._id
+        return super().id(obj)
+
+    def slot(self, obj, sub_obj=None, to_add: bool = True) -> int:
+        """Retrieve the slot for an object
+
+        Args:
+            obj: The object to get the slot for
+            sub_obj (optional): The sub object to get the slot for. Defaults to None.
+            to_add (bool, optional): Whether to add the slot if it does not exist. Defaults to True.
+
+        Returns:
+            int: The slot or None if it does not exist and to_add is False
+        """
+        key = (self.id(obj), self.id(sub_obj))
+        slot = self._slots.get(key)
+        if slot is None and to_add:
+            if self._free:
+                slot = self._free.pop()
+                self._containers[slot] = SlotContainer()
+            else:
+                slot = len(self._containers)
+                self._containers.append(SlotContainer())
+            self._slots[key] = slot
+            self._track(obj, key)
+            self._track(sub_obj, key)
+        return slot
+
+    def _remove_container(self, key: typing.Tuple):
+
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        self._forget_all(key, self._containers[slot].info)
+        self._containers[slot] = None
+        self._free.append(slot)
+        self._resolved.clear()
+
+    def _container_iter(
+        self,
+    ) -> typing.Iterator[typing.Tuple[typing.Tuple, SlotContainer]]:
+
+        for key, slot in list(self._slots.items()):
+            yield key, self._containers[slot]
+
+    def _get_data_container(
+        self, obj, sub_obj=None, to_add: bool = True
+    ) -> SlotContainer:
+
+        key = (id(obj), id(sub_obj))
+        resolved = self._resolved.get(key)
+        if resolved is not None and resolved[0]() is obj and resolved[1]() is sub_obj:
+            return resolved[2]
+        slot = self.slot(obj, sub_obj, to_add)
+        if slot is None:
+            return None
+        container = self._containers[slot]
+        try:
+            self._resolved[key] = (
+                weakref.ref(obj) if obj is not None else _no_ref,
+                weakref.ref(sub_obj) if sub_obj is not None else _no_ref,
+                container,
+            )
+        except TypeError:
+            # objects that cannot be weakly referenced, such as tuples, are not cached
+            pass
+        return container
+
+    def handle(self, obj, sub_obj=None) -> StateHandle:
+        """Retrieve a handle to access the values for an object directly. The handle
+        will no longer be connected to the state if the entries for the object are evicted
+
+        Args:
+            obj: The object to get the handle for
+            sub_obj (optional): The sub object. Defaults to None.
+
+        Returns:
+            StateHandle: The handle
+        """
+        return StateHandle(self._get_data_container(obj, sub_obj), self, obj, sub_obj)
+
+    def spawn(self, spawn_logs: bool = False) -> "CompactState":
+        """Spawn the state to be used for another time step or another instance of the machine
+        All data that is not to be kept will be cleared
+
+        Args:
+            spawn_logs (bool, optional): Whether to pass on the logs as well. Defaults to False.
+
+        Returns:
+            CompactState: The spawned state
+        """
+        state = self.__class__(self._logs.deferred, self._metrics)
+        state._slots = dict(self._slots)
+        state._free = list(self._free)
+        state._containers = [
+            container.spawn(spawn_logs) if container is not None else None
+            for container in self._containers
+        ]
+        self._copy_tracked(state)
         if spawn_logs:
             state._logs = self._logs
         return state
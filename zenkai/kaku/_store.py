@@ -0,0 +1,198 @@
+"""
+Store IOs on disk as memory-mapped arrays so that datasets larger than memory
+can be looped over
+"""
+
+# 1st party
+import json
+import os
+import typing
+
+# 3rd party
+import numpy as np
+import torch
+
+# local
+from ._io import IO, Idx
+
+
+class IOStore(object):
+    """
+    Store each element of an IO as a memory-mapped .npy file. Minibatches are
+    wrapped with torch.from_numpy so contiguous minibatches do not copy the data
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, path: str, writable: bool = False):
+        """Open an IOStore that has already been created
+
+        Args:
+            path (str): The directory of the store
+            writable (bool, optional): Whether writes to the IO will be written to disk.
+              If False, writes are copy on write and are not saved. Defaults to False.
+
+        Raises:
+            FileNotFoundError: If there is no store at the path
+        """
+        self.path = path
+        index_path = os.path.join(path, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"No IOStore index at {index_path}")
+        with open(index_path, "r") as file:
+            index = json.load(file)
+        self._names = index.get("names")
+        mode = "r+" if writable else "c"
+        self._arrays: typing.List[np.memmap] = [
+            np.load(os.path.join(path, file_name), mmap_mode=mode)
+            for file_name in index["files"]
+        ]
+        self._tensors = [torch.from_numpy(array) for array in self._arrays]
+
+    @classmethod
+    def allocate(
+        cls,
+        path: str,
+        shapes: typing.List[typing.Tuple[int]],
+        dtypes: typing.List[typing.Union[np.dtype, str]],
+        names: typing.List[str] = None,
+    ) -> "IOStore":
+        """Create an empty writable store. Use to fill a store that is larger than memory
+        with write()
+
+        Args:
+            path (str): The directory to create the store in
+            shapes (typing.List[typing.Tuple[int]]): The shape of each element
+            dtypes (typing.List[typing.Union[np.dtype, str]]): The dtype of each element
+            names (typing.List[str], optional): The names of each element. Defaults to None.
+
+        Raises:
+            ValueError: If the number of shapes and dtypes differ or the
+              first dimensions of the shapes are not the same
+
+        Returns:
+            IOStore: The allocated store
+        """
+        if len(shapes) != len(dtypes):
+            raise ValueError(
+                f"Number of shapes {len(shapes)} must be the same as the number of dtypes {len(dtypes)}"
+            )
+        if len(set(shape[0] for shape in shapes)) > 1:
+            raise ValueError("The first dimension of all elements must be the same")
+        os.makedirs(path, exist_ok=True)
+        files = []
+        for i, (shape, dtype) in enumerate(zip(shapes, dtypes)):
+            file_name = f"{i}.npy"
+            array = np.lib.format.open_memmap(
+                os.path.join(path, file_name), mode="w+", dtype=dtype, shape=tuple(shape)
+            )
+            array.flush()
+            del array
+            files.append(file_name)
+        with open(os.path.join(path, cls.INDEX_FILE), "w") as file:
+            json.dump({"files": files, "names": names}, file)
+        return IOStore(path, writable=True)
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        *x: typing.Union[torch.Tensor, np.ndarray],
+        names: typing.List[str] = None,
+        chunk_size: int = 65536,
+    ) -> "IOStore":
+        """Create a store from tensors or arrays
+
+        Args:
+            path (str): The directory to create the store in
+            x: The values making up the IO
+            names (typing.List[str], optional): The names of each element. Defaults to None.
+            chunk_size (int, optional): The number of rows to write at a time. Defaults to 65536.
+
+        Returns:
+            IOStore: The created store
+        """
+        x = [x_i.detach().cpu().numpy() if isinstance(x_i, torch.Tensor) else x_i for x_i in x]
+        store = cls.allocate(
+            path, [x_i.shape for x_i in x], [x_i.dtype for x_i in x], names
+        )
+        n = len(store)
+        for start in range(0, n, chunk_size):
+            end = min(start + chunk_size, n)
+            store.write(start, IO(*[x_i[start:end] for x_i in x]))
+        store.flush()
+        return store
+
+    def write(self, start: int, io: IO):
+        """Write an IO into the store starting at a row
+
+        Args:
+            start (int): The first row to write to
+            io (IO): The values to write
+        """
+        for array, x_i in zip(self._arrays, io):
+            if isinstance(x_i, torch.Tensor):
+                x_i = x_i.detach().cpu().numpy()
+            array[start : start + len(x_i)] = x_i
+
+    def flush(self):
+        """Flush the writes to disk"""
+        for array in self._arrays:
+            array.flush()
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: The number of rows in the store
+        """
+        if len(self._arrays) == 0:
+            return 0
+        return len(self._arrays[0])
+
+    @property
+    def names(self) -> typing.List[str]:
+        """
+        Returns:
+            typing.List[str]: The names of the elements
+        """
+        return self._names
+
+    def io(self) -> IO:
+        """
+        Returns:
+            IO: An IO that wraps the memory-mapped arrays. The data will only be loaded
+              into memory when it is accessed so it can be passed to StepLoop, IterStepTheta etc
+        """
+        return IO(*self._tensors, names=self._names)
+
+    def __getitem__(self, idx: typing.Union[Idx, slice, torch.LongTensor]) -> IO:
+        """
+        Args:
+            idx (typing.Union[Idx, slice, torch.LongTensor]): The rows to retrieve. Slices will
+              not copy the data
+
+        Returns:
+            IO: The rows of the store
+        """
+        if not isinstance(idx, Idx):
+            idx = Idx(idx)
+        return idx(self.io())
+
+    def loop(
+        self, batch_size: int, shuffle: bool = False
+    ) -> typing.Iterator[IO]:
+        """Loop over contiguous minibatches of the store
+
+        Args:
+            batch_size (int): The number of rows in each minibatch
+            shuffle (bool, optional): Whether to shuffle the order of the minibatches. Defaults to False.
+
+        Yields:
+            IO: The minibatch
+        """
+        n = len(self)
+        starts = list(range(0, n, batch_size))
+        if shuffle:
+            starts = [starts[i] for i in torch.randperm(len(starts)).tolist()]
+        for start in starts:
+            yield self[slice(start, min(start + batch_size, n))]
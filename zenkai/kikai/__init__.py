@@ -39,6 +39,7 @@ from .utils._assess import (
     StepXLayerAssessor,
     StepFullLayerAssessor,
 )
+from .utils._profile import Profiler, TraceRecorder
 from . import utils
 from ._grad import (
     GradLearner,
@@ -51,6 +52,16 @@ from ._grad import (
     CriterionGrad,
     grad,
 )
+from ._parallel import (
+    DataParallelLearner,
+    run_data_parallel,
+    all_reduce_mean,
+    shard_io,
+    grad_updaters,
+)
+from ._pipeline import PipelineScheduler, graph_stages
+from ._export import export, register_exporter, MachineModule, EXPORTERS
+from ._serve import BatchServer
 from ._backtarget import (
     BackTarget,
 )
@@ -0,0 +1,149 @@
+# 1st party
+import copy
+import itertools
+import typing
+import warnings
+
+# 3rd party
+import torch
+import torch.nn as nn
+
+# local
+from ..kaku import IO, LearningMachine, State
+from ._containers import GraphLearnerBase
+from ._feedback_alignment import DFALearner, FALearner, FALinearLearner
+from ._grad import GradLearner, GradLoopLearner
+from ._least_squares import GradLeastSquaresLearner, LeastSquaresLearner
+from ._pipeline import graph_stages
+from ._reversible import ReversibleMachine
+from ._scikit import ScikitMachine, ScikitMultiMachine
+
+
+class MachineModule(nn.Module):
+    """Module that executes the forward of a learning machine on tensors. Used
+    for machines that cannot be exported to plain modules. One state is reused
+    for every call and gradients are not computed
+    """
+
+    def __init__(self, machine: LearningMachine):
+        """initializer
+
+        Args:
+            machine (LearningMachine): The machine to execute
+        """
+        super().__init__()
+        self.machine = machine
+        self._state = State()
+
+    def forward(self, *x: torch.Tensor) -> typing.Union[torch.Tensor, typing.Tuple]:
+
+        with torch.no_grad():
+            y = self.machine(IO(*x), self._state.reset(), release=False)
+        if len(y) > 1:
+            return tuple(y)
+        return y.f
+
+
+def _export_graph(
+    graph: GraphLearnerBase, x: typing.Optional[IO]
+) -> typing.Optional[nn.Module]:
+
+    if x is None:
+        return None
+    try:
+        stages = graph_stages(graph, x)
+    except ValueError:
+        return None
+    return nn.Sequential(*[export(stage, x=None) for stage in stages])
+
+
+def _export_fa(machine: typing.Union[FALearner, DFALearner], x) -> nn.Module:
+    return nn.Sequential(machine.net, machine.activation)
+
+
+EXPORTERS: typing.Dict[
+    typing.Type[LearningMachine],
+    typing.Callable[[LearningMachine, typing.Optional[IO]], typing.Optional[nn.Module]],
+] = {
+    GradLearner: lambda machine, x: machine._net,
+    GradLoopLearner: lambda machine, x: machine._net,
+    LeastSquaresLearner: lambda machine, x: machine._linear,
+    GradLeastSquaresLearner: lambda machine, x: machine._linear,
+    FALinearLearner: lambda machine, x: machine.linear,
+    FALearner: _export_fa,
+    DFALearner: _export_fa,
+    ReversibleMachine: lambda machine, x: machine.reversible,
+    ScikitMachine: lambda machine, x: machine._module,
+    ScikitMultiMachine: lambda machine, x: (
+        machine._module
+        if machine._preprocessor is None
+        else nn.Sequential(machine._preprocessor, machine._module)
+    ),
+    GraphLearnerBase: _export_graph,
+}
+
+
+def register_exporter(
+    machine_cls: typing.Type[LearningMachine],
+    exporter: typing.Callable[
+        [LearningMachine, typing.Optional[IO]], typing.Optional[nn.Module]
+    ],
+):
+    """Register a function to export a type of machine. The function receives the
+    machine and the sample input (which may be None) and returns the module
+    or None if the machine cannot be exported
+
+    Args:
+        machine_cls (typing.Type[LearningMachine]): The class of machine to export
+        exporter: The function to export with
+    """
+    EXPORTERS[machine_cls] = exporter
+
+
+def export(
+    machine: LearningMachine,
+    x: IO = None,
+    script: bool = False,
+    copy_params: bool = False,
+) -> nn.Module:
+    """Export the forward computation of a learning machine to a module that operates
+    on tensors without IO, State or the forward hooks. Machines with a registered
+    exporter are replaced by the modules that do their computation. Other
+    machines and machines with forward hooks are wrapped in a MachineModule
+
+    Args:
+        machine (LearningMachine): The machine to export
+        x (IO, optional): A sample input. Required to export the stages of a
+          sequential GraphLearner. Defaults to None.
+        script (bool, optional): Whether to convert the module with torch.jit.script.
+          If it cannot be scripted the module is returned unscripted. Defaults to False.
+        copy_params (bool, optional): Whether to copy the parameters rather than share them
+          with the machine. The modules and other attributes such as scikit-learn estimators
+          are copied either way so setting the exported module to eval mode does not change
+          the mode of the machine. Defaults to False.
+
+    Returns:
+        nn.Module: The exported module in eval mode
+    """
+    module = None
+    if not machine._forward_hooks:
+        for cls in type(machine).__mro__:
+            exporter = EXPORTERS.get(cls)
+            if exporter is not None:
+                module = exporter(machine, x)
+                break
+    if module is None:
+        module = MachineModule(machine)
+    if copy_params:
+        module = copy.deepcopy(module)
+    else:
+        # share the parameters and buffers but not the training flags
+        memo = {id(p): p for p in itertools.chain(module.parameters(), module.buffers())}
+        module = copy.deepcopy(module, memo)
+    module.eval()
+    if script:
+        try:
+            module = torch.jit.script(module)
+        except Exception as e:
+            warnings.warn(f"Could not script the exported module: {e}")
+    return module
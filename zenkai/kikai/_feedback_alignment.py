@@ -68,7 +68,7 @@ class FALinearLearner(LearningMachine):
 
     def forward(self, x: IO, state: State, release: bool = True) -> IO:
 
-        x = state[self, "y"] = IO(self.linear(x.f))
+        x = state[self, "y"] = IO(self.compiled("linear", self.linear)(x.f))
         return x.out(release)
 
     def assess_y(self, y: IO, t: IO, reduction_override: str = None) -> Assessment:
@@ -172,7 +172,7 @@ class FALearner(LearningMachine):
     def forward(self, x: IO, state: State, release: bool = True) -> IO:
 
         x.freshen()
-        y = self.net(x.f)
+        y = self.compiled("net", self.net)(x.f)
         y = y.detach()
         state[self, x, "y_det"] = y
         y.requires_grad = True
@@ -199,7 +199,8 @@ class FALearner(LearningMachine):
         self.netB.zero_grad()
 
         if "y" not in my_state:
-            self(x, state=state)
+            # forward was not executed with the state so count the miss
+            self.cached_y(x, state)
 
         y = state[self, x, "y"]
         y2 = self.netB(x.f)
@@ -301,7 +302,7 @@ class DFALearner(LearningMachine):
     def forward(self, x: IO, state: State, release: bool = True) -> IO:
 
         x.freshen()
-        y = self.net(x.f)
+        y = self.compiled("net", self.net)(x.f)
         y = y.detach()
         state[self, x, "y_det"] = y
         y.requires_grad = True
@@ -328,7 +329,8 @@ class DFALearner(LearningMachine):
         self.netB.zero_grad()
         self.B.zero_grad()
         if "y" not in my_state:
-            self(x, state=state)
+            # forward was not executed with the state so count the miss
+            self.cached_y(x, state)
 
         y2 = self.netB(x.f)
 
@@ -24,7 +24,7 @@ from ..kaku import (
     XCriterion,
 )
 from ..mod import Lambda
-from ..utils import get_model_grads, set_model_grads
+from ..utils import get_model_grads, get_model_parameters, set_model_grads
 from ..mod import Null
 from ._null import NullStepTheta
 
@@ -38,20 +38,32 @@ class GradUpdater(object):
         optim: torch.optim.Optimizer,
         to_update_theta: bool = True,
         to_update_x: bool = True,
+        grad_reducer: typing.Callable[[torch.Tensor], torch.Tensor] = None,
+        average: bool = False,
     ):
         """initializer
 
         Args:
             net (nn.Module): The network to manage for
             optim (torch.optim.Optimizer): The optimizer to use for updating
+            grad_reducer (typing.Callable[[torch.Tensor], torch.Tensor], optional): Function
+              applied to the flattened grads before the optimizer steps, such as an all-reduce
+              over processes. It is called on every update with zeros if no grads have been
+              accumulated. Defaults to None.
+            average (bool, optional): Whether to average the grads accumulated since the last
+              update rather than sum them. Use so that accumulating over multiple batches
+              matches a step on their mean loss. Defaults to False.
         """
         self.net = net
         self.optim = optim
         self.to_update_theta = to_update_theta
         self.to_update_x = to_update_x
+        self.grad_reducer = grad_reducer
+        self.average = average
 
     def accumulate(self, x: IO, state: State):
-        """accumulate the gradients
+        """accumulate the gradients. The gradients are summed for each input and over
+        all inputs accumulated since the last update
 
         Args:
             x (IO): The input
@@ -59,18 +71,26 @@ class GradUpdater(object):
         """
         my_state = state.mine(self, x)
         grads = state.get((self, x, "grad"))
+        cur = get_model_grads(self.net) if self.to_update_theta else None
 
         if grads is None:
             if self.to_update_theta:
-                my_state.grad = get_model_grads(self.net)
+                my_state.grad = cur
             if self.to_update_x:
                 my_state.x_grad = x.f.grad
         else:
             if self.to_update_theta:
-                my_state.grad = get_model_grads(self.net) + grads
+                my_state.grad = cur + grads
             if self.to_update_x:
                 my_state.x_grad = my_state["x_grad"] + x.f.grad
 
+        if cur is not None:
+            # sum the grads over all inputs accumulated since the last update
+            # so that the grads of multiple batches can be accumulated
+            acc_grad = state.get((self, "acc_grad"))
+            state[self, "acc_grad"] = cur if acc_grad is None else acc_grad + cur
+            state[self, "acc_count"] = state.get((self, "acc_count"), 0) + 1
+
     def update(self, x: IO, state: State, net_override: nn.Module = None) -> bool:
         """Update the network
 
@@ -81,13 +101,26 @@ class GradUpdater(object):
               update the network for a different network than the member network. Defaults to None.
 
         Returns:
-            bool: Whether the update was successful. Will return false if no grads have been set
+            bool: Whether the update was successful. Will return false if no grads have been
+              accumulated since the last update and there is no grad_reducer
         """
-        grad = state.get((self, x, "grad"))
-
+        grad = state.get((self, "acc_grad"))
+        net = net_override or self.net
+        if grad is not None:
+            # the grads are consumed so that they cannot be applied twice
+            count = state.get((self, "acc_count"), 1)
+            state[self, "acc_grad"] = None
+            state[self, "acc_count"] = 0
+            state[self, x, "grad"] = None
+            if self.average and count > 1:
+                grad = grad / count
+        if self.grad_reducer is not None:
+            # the reducer must be called on every process even if there are no local
+            # grads so that a collective operation such as all_reduce does not block
+            if grad is None:
+                grad = torch.zeros_like(get_model_parameters(net))
+            grad = self.grad_reducer(grad)
         if grad is not None:
-            net = net_override or self.net
-
             self.optim.zero_grad()
             set_model_grads(net, grad)
             self.optim.step()
@@ -114,6 +147,7 @@ class GradStepTheta(StepTheta):
         reduction: str = "mean",
         y_name: str = "y",
         criterion: typing.Union[Criterion, XCriterion] = None,
+        average_grads: bool = False,
     ):
         """Update theta with the objective between y and t on the forward pass
 
@@ -121,13 +155,19 @@ class GradStepTheta(StepTheta):
             learner (LearningMachine): Whether
             optim_factory (OptimFactory):
             reduction (str, optional): _description_. Defaults to "mean".
+            y_name (str, optional): The name the learner stores its unreleased output under. If
+              it is not stored the output is retrieved from the forward cache of the learner. Defaults to "y".
+            average_grads (bool, optional): Whether to average the grads accumulated over
+              multiple batches rather than sum them. Defaults to False.
         """
         super().__init__()
         self._learner = learner
         self._optim = optim_factory(self._learner.parameters())
         self.reduction = reduction
         self.y_name = y_name
-        self._grad_updater = GradUpdater(self._learner, self._optim, to_update_x=False)
+        self._grad_updater = GradUpdater(
+            self._learner, self._optim, to_update_x=False, average=average_grads
+        )
         self.criterion = criterion
 
     def accumulate(self, x: IO, t: IO, state: State):
@@ -136,10 +176,22 @@ class GradStepTheta(StepTheta):
 
         if stepped or y is None:
             x.freshen(False)
-            y = self._learner(x, release=False)
+            if stepped:
+                # the cached output was computed before the parameters were updated
+                state[self._learner, x, self._learner.FORWARD_Y] = None
+            # the graph will be freed by backward so remove it from the cache
+            y = self._learner.cached_y(x, state, consume=True)
 
         self._learner.zero_grad()
-        assessment = grad_assess(x, y, t, self._learner, self.criterion, self.reduction)
+        assessment = None
+        if self.criterion is None:
+            # reuse the loss computed in learn() if it was computed the same way
+            assessment = self._learner.cached_loss(x, y, state, self.reduction, True)
+        if assessment is None:
+            with self._learner.autocast_context():
+                assessment = grad_assess(
+                    x, y, t, self._learner, self.criterion, self.reduction
+                )
         assessment.backward()
         self._grad_updater.accumulate(x, state)
 
@@ -359,6 +411,7 @@ class GradLearner(LearningMachine):
         x_lr: float = None,
         step_dep: bool = True,
         learn_criterion: typing.Union[XCriterion, Criterion] = None,
+        average_grads: bool = False,
     ):
         """Standard gradient learner
 
@@ -372,6 +425,8 @@ class GradLearner(LearningMachine):
               Defaults to "mean".
             step_dep (bool, optional): Whether step_x is dependent on step. If False, GradLoopStepX will
              be used otherwise
+            average_grads (bool, optional): Whether to average the grads of the batches accumulated
+              before step rather than sum them. Defaults to False.
 
         """
         super().__init__()
@@ -391,7 +446,11 @@ class GradLearner(LearningMachine):
         self._criterion = criterion
         if optim_factory is not None:
             self._theta_step = GradStepTheta(
-                self, optim_factory, reduction, criterion=learn_criterion
+                self,
+                optim_factory,
+                reduction,
+                criterion=learn_criterion,
+                average_grads=average_grads,
             )
         else:
             self._theta_step = NullStepTheta()
@@ -406,6 +465,9 @@ class GradLearner(LearningMachine):
         assessment = self._criterion.assess(y, t, reduction_override)
         return assessment
 
+    def loss_reduction(self, reduction_override: str = None) -> str:
+        return self._criterion.resolve_reduction(reduction_override)
+
     def accumulate(self, x: IO, t: IO, state: State):
         if self._net is None:
             return
@@ -416,7 +478,7 @@ class GradLearner(LearningMachine):
 
     def forward(self, x: IO, state: State, release: bool = True) -> IO:
         x.freshen(False)
-        y = IO(self._net(*x), detach=False)
+        y = IO(self.compiled("net", self._net)(*x), detach=False)
         return y.out(release)
 
     def step(self, x: IO, t: IO, state: State):
@@ -485,7 +547,9 @@ class GradLoopLearner(LearningMachine, BatchIdxStepX):
 
     def forward(self, x: IO, state: State, release: bool = True) -> IO:
         x.freshen(False)
-        y = state[self, self.Y_NAME] = IO(self._net(*x), detach=False)
+        y = state[self, self.Y_NAME] = IO(
+            self.compiled("net", self._net)(*x), detach=False
+        )
         return y.out(release)
 
 
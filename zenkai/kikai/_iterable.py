@@ -17,69 +17,77 @@ from ..kaku import (
     StepX,
     Idx,
 )
-from torch.utils import data as torch_data
 
 
 class StepLoop(object):
-    def __init__(self, batch_size: int = None, shuffle: bool = True):
+    def __init__(
+        self, batch_size: int = None, shuffle: bool = True, contiguous: bool = False
+    ):
         """Loop over a connection by indexing
 
         Args:
             batch_size (int): The size of the batch for the loop. If None. There will only be one iteration
             shuffle (bool, optional): whether to shuffle the indices. Defaults to True.
+            contiguous (bool, optional): whether to loop over contiguous blocks. If shuffle is
+              True the order of the blocks will be shuffled. Defaults to False.
         """
         self.batch_size = batch_size
         self.shuffle = shuffle
-
-    def create_dataloader(self, io: IO) -> torch_data.DataLoader:
-        """
-        Args:
-            io (IO): the IO to create the dataloader for
-
-        Returns:
-            DataLoader: The data loader to loop over
-        """
-
-        batch_size = self.batch_size if self.batch_size is not None else len(io[0])
-
-        # TODO: Change so 0 is not indexed
-        indices = torch_data.TensorDataset(torch.arange(0, len(io.f)).long())
-        return torch_data.DataLoader(indices, batch_size, self.shuffle)
+        self.contiguous = contiguous
 
     def loop(self, io: IO) -> typing.Iterator[Idx]:
-        """Loop over the io
+        """Loop over the io. Unshuffled and contiguous loops will output slice indices
+        so the minibatches are views of the io
 
         Args:
             io (IO): The io to iterate over
 
-        Returns:
-            typing.Iterator[Idx]: Return
-
         Yields:
-            Iterator[typing.Iterator[Conn]]: _description_
+            Idx: The index for the minibatch
         """
         if self.batch_size is None:
             yield Idx(dim=0)
-        else:
-            for (idx,) in self.create_dataloader(io):
-                yield Idx(idx.to(io.f.device), dim=0)
+            return
+
+        n = len(io.f)
+        if not self.shuffle or self.contiguous:
+            blocks = range(0, n, self.batch_size)
+            if self.shuffle:
+                blocks = [blocks[i] for i in torch.randperm(len(blocks)).tolist()]
+            for start in blocks:
+                yield Idx(slice(start, min(start + self.batch_size, n)), dim=0)
+            return
+
+        device = io.f.device if isinstance(io.f, torch.Tensor) else None
+        indices = torch.randperm(n, device=device)
+        for start in range(0, n, self.batch_size):
+            yield Idx(indices[start : start + self.batch_size], dim=0)
 
 
 class IterStepTheta(StepTheta):
     """Do multiple iterations on the outer layer"""
 
-    def __init__(self, base_step: StepTheta, n_epochs: int = 1, batch_size: int = None):
+    def __init__(
+        self,
+        base_step: StepTheta,
+        n_epochs: int = 1,
+        batch_size: int = None,
+        contiguous: bool = False,
+    ):
         """
         Args:
             learner (LearningMachine): The LearningMachine to optimize
             n_epochs (int, optional): The number of epochs. Defaults to 1.
             batch_size (int, optional): . Defaults to None.
+            contiguous (bool, optional): Whether to shuffle contiguous blocks
+              rather than samples. Defaults to False.
         """
         super().__init__()
 
         self.base_step = base_step
         self.n_epochs = n_epochs
         self.batch_size = batch_size
+        self.contiguous = contiguous
 
     def step(self, x: IO, t: IO, state: State):
         """
@@ -89,7 +97,7 @@ class IterStepTheta(StepTheta):
             t (IO): the output value for the layer
             state (State): The learning state
         """
-        loop = StepLoop(self.batch_size, True)
+        loop = StepLoop(self.batch_size, True, self.contiguous)
         for _ in range(self.n_epochs):
             for idx in loop.loop(x):
 
@@ -106,17 +114,32 @@ class IterStepTheta(StepTheta):
 class IterStepX(StepX):
     """Do multiple iterations on the outer layer"""
 
-    def __init__(self, base_step: StepX, n_epochs: int = 1, batch_size: int = None):
+    def __init__(
+        self,
+        base_step: StepX,
+        n_epochs: int = 1,
+        batch_size: int = None,
+        contiguous: bool = False,
+        reuse_buffer: bool = False,
+    ):
         """
         Args:
             learner (LearningMachine): The LearningMachine to optimize
             n_epochs (int, optional): The number of epochs. Defaults to 1.
             batch_size (int, optional): . Defaults to None.
+            contiguous (bool, optional): Whether to shuffle contiguous blocks
+              rather than samples. Defaults to False.
+            reuse_buffer (bool, optional): Whether to write the output into a buffer kept
+              in the state rather than allocating it on each call. Use with a state that is
+              reset in place. The output is overwritten by the next call with the
+              same state. Defaults to False.
         """
         super().__init__()
         self.base_step = base_step
         self.n_epochs = n_epochs
         self.batch_size = batch_size
+        self.contiguous = contiguous
+        self.reuse_buffer = reuse_buffer
 
     def step_x(self, x: IO, t: IO, state: State) -> IO:
         """
@@ -126,19 +149,34 @@ class IterStepX(StepX):
             t (IO): the output value for the layer
             state (State): The learning state
         """
-        loop = StepLoop(self.batch_size, True)
+        if not all(isinstance(x_i, torch.Tensor) for x_i in x):
+            # wrap numpy and memory-mapped arrays without copying them
+            x = IO(*[torch.as_tensor(x_i) for x_i in x], names=x.names)
+        if self.n_epochs <= 0:
+            return x.clone()
+        loop = StepLoop(self.batch_size, True, self.contiguous)
+        # x is not cloned so that it can be memory mapped. The first epoch
+        # reads the minibatches from x and writes the updated minibatches
+        # to a new IO. Every row is updated once in an epoch so the
+        # later epochs read from the new IO
+        if self.reuse_buffer:
+            updated = IO(*state.buffer((self, "x_prime"), x), names=x.names)
+        else:
+            updated = IO(*[torch.empty_like(x_i) for x_i in x], names=x.names)
+        source = x
         for _ in range(self.n_epochs):
-            for idx in loop.loop(x):
+            for idx in loop.loop(source):
 
                 if isinstance(self.base_step, BatchIdxStepX):
-                    updated_x = self.base_step.step_x(x, t, state, idx)
+                    updated_x = self.base_step.step_x(source, t, state, idx)
                 else:
                     updated_x = self.base_step.step_x(
-                        idx(x, detach=True), idx(t, detach=True), state
+                        idx(source, detach=True), idx(t, detach=True), state
                     )
 
-                x = update_io(updated_x, x, idx)
-        return x
+                updated = update_io(updated_x, updated, idx, inplace=True)
+            source = updated
+        return updated
 
 
 class IterHiddenStepTheta(OutDepStepTheta):
@@ -202,6 +240,9 @@ class IterHiddenStepTheta(OutDepStepTheta):
         x_loop = StepLoop(self.x_batch_size, True)
 
         outgoing_x = outgoing_x or t
+        if outgoing_t is not None and self.outgoing is not None:
+            # clone once so the minibatches can be written in place
+            outgoing_x = outgoing_x.clone()
 
         for i in range(self.n_epochs):
 
@@ -219,7 +260,9 @@ class IterHiddenStepTheta(OutDepStepTheta):
                             x_idx = self.outgoing.step_x(
                                 idx(outgoing_x), idx(outgoing_t), state
                             )
-                        outgoing_x = update_io(x_idx, outgoing_x, idx, detach=True)
+                        outgoing_x = update_io(
+                            x_idx, outgoing_x, idx, detach=True, inplace=True
+                        )
 
                 t = outgoing_x
 
@@ -269,7 +269,7 @@ class LeastSquaresLearner(LearningMachine):
 
     def forward(self, x: IO, state: State, release: bool = True) -> IO:
         x.freshen(False)
-        return IO(self._linear(x.f), detach=release)
+        return IO(self.compiled("linear", self._linear)(x.f), detach=release)
 
 
 class GradLeastSquaresLearner(LearningMachine):
@@ -311,6 +311,9 @@ class GradLeastSquaresLearner(LearningMachine):
         assessment = self._loss.assess(y, t, reduction_override=reduction_override)
         return assessment
 
+    def loss_reduction(self, reduction_override: str = None) -> str:
+        return self._loss.resolve_reduction(reduction_override)
+
     def accumulate(self, x: IO, t: IO, state: State):
         self._step_theta.accumulate(x, t, state)
 
@@ -318,7 +321,7 @@ class GradLeastSquaresLearner(LearningMachine):
         return self._step_x.step_x(x, t, state)
 
     def forward(self, x: IO, state: State, release: bool = True) -> IO:
-        return IO(self._linear(x.f), detach=release)
+        return IO(self.compiled("linear", self._linear)(x.f), detach=release)
 
     def step(self, x: IO, t: typing.Union[IO, None], state: State):
 
@@ -0,0 +1,270 @@
+# 1st party
+import os
+import typing
+
+# 3rd party
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+import torch.nn as nn
+
+# local
+from ..kaku import IO, Assessment, LearningMachine, State, StepTheta
+from ._grad import GradUpdater
+
+
+def all_reduce_mean(value: torch.Tensor, group=None) -> torch.Tensor:
+    """Average a tensor over all processes in the group
+
+    Args:
+        value (torch.Tensor): The tensor to average
+        group (optional): The process group. Defaults to the default group.
+
+    Returns:
+        torch.Tensor: The average. The input is not modified
+    """
+    value = value.detach().clone()
+    dist.all_reduce(value, op=dist.ReduceOp.SUM, group=group)
+    return value / dist.get_world_size(group)
+
+
+def shard_io(io: IO, rank: int, world_size: int) -> IO:
+    """Retrieve the contiguous shard of the batch for a process. The tensors in the IO
+    are split along the first dimension and any other values are kept as is
+
+    Args:
+        io (IO): The batch to shard
+        rank (int): The rank of the process
+        world_size (int): The number of processes
+
+    Returns:
+        IO: The shard
+    """
+    return IO(
+        *[
+            torch.tensor_split(x_i, world_size)[rank]
+            if isinstance(x_i, torch.Tensor)
+            else x_i
+            for x_i in io
+        ],
+        names=io.names,
+    )
+
+
+def _find_updaters(
+    value, updaters: typing.Dict[int, GradUpdater], visited: typing.Set[int]
+):
+
+    if id(value) in visited:
+        return
+    if isinstance(value, GradUpdater):
+        updaters[id(value)] = value
+    elif isinstance(value, (list, tuple, set)):
+        visited.add(id(value))
+        for value_i in value:
+            _find_updaters(value_i, updaters, visited)
+    elif isinstance(value, dict):
+        visited.add(id(value))
+        for value_i in value.values():
+            _find_updaters(value_i, updaters, visited)
+    elif isinstance(value, StepTheta) and not isinstance(value, nn.Module):
+        # modules are searched by module.modules()
+        visited.add(id(value))
+        for value_i in vars(value).values():
+            _find_updaters(value_i, updaters, visited)
+
+
+def grad_updaters(module: nn.Module) -> typing.List[GradUpdater]:
+    """Find the GradUpdaters used by the learning machines in a module. The updaters
+    are members of the machines or of the StepThetas they contain, including StepThetas
+    nested in other StepThetas or held in lists, tuples and dicts
+
+    Args:
+        module (nn.Module): The module to search
+
+    Returns:
+        typing.List[GradUpdater]: The updaters found
+    """
+    updaters = {}
+    visited = set()
+    for module_i in module.modules():
+        for key, value in vars(module_i).items():
+            if key in ("_parameters", "_buffers", "_modules"):
+                continue
+            _find_updaters(value, updaters, visited)
+    return list(updaters.values())
+
+
+class DataParallelLearner(LearningMachine):
+    """Wrap a learning machine to train it on a shard of each batch in each of
+    the processes of a torch.distributed group.
+
+    Gradients managed by a GradUpdater are averaged over the processes before the
+    optimizer steps so the parameters they update stay in sync. The remaining
+    parameters are synchronized after step() by broadcasting from the source rank
+    (or averaging). step_x is computed on the local shard only
+
+    usage:
+        def train(rank, world_size, x, t):
+            learner = DataParallelLearner(MyLearner())
+            for _ in range(epochs):
+                learner.learn(*learner.shard(x, t))
+
+        run_data_parallel(train, 4, x, t)
+    """
+
+    def __init__(
+        self,
+        learner: LearningMachine,
+        group=None,
+        sync: str = "broadcast",
+        src: int = 0,
+    ):
+        """initializer. The process group must be initialized and the parameters
+        are broadcast from src so all processes start from the same parameters
+
+        Args:
+            learner (LearningMachine): The learner to wrap
+            group (optional): The process group. Defaults to the default group.
+            sync (str, optional): How to synchronize parameters not updated by a
+              GradUpdater after step(). 'broadcast' or 'average'. Defaults to "broadcast".
+            src (int, optional): The rank to broadcast from. Defaults to 0.
+
+        Raises:
+            RuntimeError: If the process group has not been initialized
+            ValueError: If sync is not valid
+        """
+        super().__init__()
+        if not dist.is_initialized():
+            raise RuntimeError(
+                "The process group must be initialized to use DataParallelLearner"
+            )
+        if sync not in ("broadcast", "average"):
+            raise ValueError(f"Argument sync must be broadcast or average not {sync}")
+        self.learner = learner
+        self.group = group
+        self.sync = sync
+        self.src = src
+        self.rank = dist.get_rank(group)
+        self.world_size = dist.get_world_size(group)
+
+        grad_params = set()
+        for updater in grad_updaters(learner):
+            updater.grad_reducer = self._reduce_grad
+            grad_params.update(id(p) for p in updater.net.parameters())
+        # the parameters that must be synchronized after step
+        self._synced_params = [
+            p for p in learner.parameters() if id(p) not in grad_params
+        ]
+        self.broadcast_parameters()
+
+    def _reduce_grad(self, grad: torch.Tensor) -> torch.Tensor:
+        return all_reduce_mean(grad, self.group)
+
+    def broadcast_parameters(self):
+        """Broadcast all parameters and buffers of the learner from the source rank"""
+        with torch.no_grad():
+            for p in self.learner.parameters():
+                dist.broadcast(p.data, self.src, group=self.group)
+            for b in self.learner.buffers():
+                dist.broadcast(b, self.src, group=self.group)
+
+    def sync_parameters(self):
+        """Synchronize the parameters not updated by a GradUpdater"""
+        with torch.no_grad():
+            for p in self._synced_params:
+                if self.sync == "broadcast":
+                    dist.broadcast(p.data, self.src, group=self.group)
+                else:
+                    p.data.copy_(all_reduce_mean(p.data, self.group))
+
+    def shard(self, *io: IO) -> typing.Union[IO, typing.Tuple[IO]]:
+        """Retrieve the shard of each IO for this process
+
+        Returns:
+            typing.Union[IO, typing.Tuple[IO]]: The shards
+        """
+        result = tuple(shard_io(io_i, self.rank, self.world_size) for io_i in io)
+        if len(result) == 1:
+            return result[0]
+        return result
+
+    def assess_y(self, y: IO, t: IO, reduction_override: str = None) -> Assessment:
+        return self.learner.assess_y(y, t, reduction_override)
+
+    def loss_reduction(self, reduction_override: str = None) -> str:
+        return self.learner.loss_reduction(reduction_override)
+
+    def accumulate(self, x: IO, t: IO, state: State):
+        # learn() caches the output and loss under the wrapper so pass them
+        # to the learner to not compute them again
+        keys = (self.FORWARD_Y, self.LEARN_LOSS)
+        for key in keys:
+            value = state.get((self, x, key))
+            if value is not None:
+                state[self.learner, x, key] = value
+        self.learner.accumulate(x, t, state)
+        for key in keys:
+            if state.get((self.learner, x, key)) is not None:
+                state[self.learner, x, key] = None
+
+    def step(self, x: IO, t: IO, state: State):
+        self.learner.step(x, t, state)
+        if len(self._synced_params) > 0:
+            self.sync_parameters()
+
+    def step_x(self, x: IO, t: IO, state: State) -> IO:
+        return self.learner.step_x(x, t, state)
+
+    def forward(self, x: IO, state: State, release: bool = True) -> IO:
+        return self.learner(x, state, release)
+
+
+def _run_worker(
+    rank: int,
+    f: typing.Callable,
+    world_size: int,
+    backend: str,
+    num_threads: int,
+    args: typing.Tuple,
+):
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    dist.init_process_group(backend, rank=rank, world_size=world_size)
+    try:
+        f(rank, world_size, *args)
+    finally:
+        dist.destroy_process_group()
+
+
+def run_data_parallel(
+    f: typing.Callable,
+    world_size: int,
+    *args,
+    backend: str = "gloo",
+    num_threads: int = None,
+    master_addr: str = "127.0.0.1",
+    master_port: int = 29500,
+):
+    """Run a function in world_size local processes with the process group initialized.
+    The function is called with f(rank, world_size, *args) and must be picklable
+
+    Args:
+        f (typing.Callable): The function to run
+        world_size (int): The number of processes
+        backend (str, optional): The torch.distributed backend. Defaults to "gloo".
+        num_threads (int, optional): The number of threads for each process. If None the
+          cpus will be split evenly between the processes. Defaults to None.
+        master_addr (str, optional): The address of the rank 0 process. Defaults to "127.0.0.1".
+        master_port (int, optional): The port of the rank 0 process. Defaults to 29500.
+    """
+    if num_threads is None:
+        num_threads = max((os.cpu_count() or 1) // world_size, 1)
+    os.environ["MASTER_ADDR"] = master_addr
+    os.environ["MASTER_PORT"] = str(master_port)
+    mp.spawn(
+        _run_worker,
+        args=(f, world_size, backend, num_threads, args),
+        nprocs=world_size,
+        join=True,
+    )
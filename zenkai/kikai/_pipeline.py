@@ -0,0 +1,269 @@
+# 1st party
+import itertools
+import queue
+import threading
+import typing
+
+# 3rd party
+import torch
+
+# local
+from ..kaku import IO, Assessment, LearningMachine, State
+from ._containers import GraphLearnerBase
+from ._parallel import shard_io
+
+
+def graph_stages(graph: GraphLearnerBase, x: IO) -> typing.List[LearningMachine]:
+    """Retrieve the machines of a sequential graph in the order they are executed
+    by passing a sample input through the graph
+
+    Args:
+        graph (GraphLearnerBase): The graph to retrieve the stages for
+        x (IO): A sample input
+
+    Raises:
+        ValueError: If the graph is not a sequential chain of nodes that
+          use the default target from the input of the graph to its output
+
+    Returns:
+        typing.List[LearningMachine]: The machines in the order they are executed
+    """
+    state = State()
+    # do not release so the output is the output of the last node
+    y = graph(x, state, release=False)
+    steps, _ = graph.get_steps(x, state, validate=True)
+    if steps[0].x is not x:
+        raise ValueError(
+            "The input to the first node of a pipelined graph must be the input to the graph"
+        )
+    if steps[-1].y is not y:
+        raise ValueError(
+            "The output of the last node of a pipelined graph must be the output of the graph"
+        )
+    for i, step in enumerate(steps):
+        if step.target is not None:
+            raise ValueError(
+                "The nodes of a pipelined graph must use the default target"
+            )
+        if i > 0 and step.x is not steps[i - 1].y:
+            raise ValueError(
+                "The input to each node of a pipelined graph must be the output of the previous node"
+            )
+    return [step.machine for step in steps]
+
+
+class _PipelineError(object):
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+class PipelineScheduler(object):
+    """Train a sequential stack of learning machines with each stage on its own
+    worker thread. Each batch is split into micro-batches which stream forward
+    through the stages. Once the last stage receives a micro-batch it accumulates,
+    computes the target for the previous stage with step_x and steps, so stages
+    work on different micro-batches at the same time. Backward messages take priority
+    over forward messages (1F1B). Once a stage raises an error no stage steps again
+    and the error is raised by learn().
+
+    With schedule '1f1b' the stages step after every micro-batch and each stage keeps
+    a State per micro-batch. If a stage has stepped since the forward of a micro-batch,
+    forward is executed again with the current parameters before accumulating so
+    the graph stored in the state is not stale.
+
+    With schedule 'gpipe' the stages only step after the last micro-batch so every
+    micro-batch sees the same parameters. Each stage uses one State for all micro-batches
+    so the machines must key the values they store by the input. A GradUpdater sums the
+    grads of the micro-batches. Create the stages with average_grads=True so the
+    step matches one on the mean loss of the batch
+
+    usage:
+        with PipelineScheduler(graph_stages(graph, x), n_microbatches=4) as pipeline:
+            for x, t in batches:
+                assessment = pipeline.learn(x, t)
+    """
+
+    _FORWARD = 2
+    _BACKWARD = 1
+    # stop before the queued micro-batches are processed
+    _STOP = 0
+
+    def __init__(
+        self,
+        stages: typing.Sequence[LearningMachine],
+        n_microbatches: int = 4,
+        schedule: str = "1f1b",
+    ):
+        """initializer
+
+        Args:
+            stages (typing.Sequence[LearningMachine]): The machines in the order they are executed.
+              Each stage's output is the input of the next and the last stage's target is t
+            n_microbatches (int, optional): The number of micro-batches to split each batch into. Defaults to 4.
+            schedule (str, optional): '1f1b' or 'gpipe'. Defaults to "1f1b".
+
+        Raises:
+            ValueError: If there are no stages or the schedule is not valid
+        """
+        if len(stages) == 0:
+            raise ValueError("There must be at least one stage in the pipeline")
+        if schedule not in ("1f1b", "gpipe"):
+            raise ValueError(f"Argument schedule must be 1f1b or gpipe not {schedule}")
+        self.stages = list(stages)
+        self.n_microbatches = n_microbatches
+        self.schedule = schedule
+        self._inboxes: typing.List[queue.PriorityQueue] = []
+        self._workers: typing.List[threading.Thread] = []
+        self._done: queue.Queue = queue.Queue()
+        self._seq = itertools.count()
+        # set once a stage raises so no stage steps after the error
+        self._cancelled = threading.Event()
+        # the input, state and number of steps of the stage at the forward
+        # of each micro-batch at each stage
+        self._contexts: typing.List[
+            typing.Dict[int, typing.Tuple[IO, State, int]]
+        ] = [{} for _ in self.stages]
+        # the state of each stage shared by the micro-batches with 'gpipe'
+        self._states: typing.List[State] = []
+        self._counts = [0] * len(self.stages)
+        self._steps = [0] * len(self.stages)
+        self._ts: typing.List[IO] = []
+        self._assessments: typing.List[Assessment] = []
+        self._n = 0
+
+    def _send(self, i: int, kind: int, mb: int, payload):
+        self._inboxes[i].put((kind, next(self._seq), kind, mb, payload))
+
+    def _forward(self, i: int, mb: int, x: IO):
+
+        machine = self.stages[i]
+        state = self._states[i] if self.schedule == "gpipe" else State()
+        self._contexts[i][mb] = (x, state, self._steps[i])
+        if i < len(self.stages) - 1:
+            self._send(i + 1, self._FORWARD, mb, machine(x, state))
+            return
+        # the last stage computes the loss once so accumulate can reuse it
+        t = self._ts[mb]
+        y = machine(x, state, release=False)
+        with machine.autocast_context():
+            assessment = machine.assess_y(y, t)
+        state[machine, x, machine.FORWARD_Y] = y
+        state[machine, x, machine.LEARN_LOSS] = (
+            assessment,
+            machine.loss_reduction(None),
+            y,
+        )
+        self._assessments[mb] = assessment.detach()
+        self._backward(i, mb, t)
+
+    def _backward(self, i: int, mb: int, t: IO):
+
+        machine = self.stages[i]
+        x, state, steps = self._contexts[i].pop(mb)
+        if steps != self._steps[i]:
+            # the graph stored in the state was computed with the parameters
+            # before the last step so execute forward again
+            state = State()
+            machine(x, state)
+        machine.accumulate(x, t, state)
+        if i == len(self.stages) - 1:
+            # do not keep the graph alive after accumulating
+            state[machine, x, machine.FORWARD_Y] = None
+            state[machine, x, machine.LEARN_LOSS] = None
+        x_prime = machine.step_x(x, t, state) if i > 0 else None
+        self._counts[i] += 1
+        if self._cancelled.is_set():
+            return
+        if self.schedule == "1f1b" or self._counts[i] == self._n:
+            machine.step(x, t, state)
+            self._steps[i] += 1
+        if i > 0:
+            self._send(i - 1, self._BACKWARD, mb, x_prime)
+        else:
+            self._done.put(mb)
+
+    def _run(self, i: int):
+
+        inbox = self._inboxes[i]
+        while True:
+            _, _, kind, mb, payload = inbox.get()
+            if kind == self._STOP:
+                return
+            if self._cancelled.is_set():
+                continue
+            try:
+                if kind == self._FORWARD:
+                    self._forward(i, mb, payload)
+                else:
+                    self._backward(i, mb, payload)
+            except Exception as e:
+                self._cancelled.set()
+                self._done.put(_PipelineError(e))
+
+    def start(self) -> "PipelineScheduler":
+        """Start the worker threads. Called by learn() if not started
+
+        Returns:
+            PipelineScheduler: self
+        """
+        if len(self._workers) > 0:
+            return self
+        self._inboxes = [queue.PriorityQueue() for _ in self.stages]
+        self._done = queue.Queue()
+        self._cancelled.clear()
+        self._workers = [
+            threading.Thread(target=self._run, args=(i,), daemon=True)
+            for i in range(len(self.stages))
+        ]
+        for worker in self._workers:
+            worker.start()
+        return self
+
+    def learn(self, x: IO, t: IO) -> Assessment:
+        """Pass a batch through the pipeline and update the stages
+
+        Args:
+            x (IO): The input to the first stage
+            t (IO): The target for the last stage
+
+        Returns:
+            Assessment: The mean assessment of the last stage over the micro-batches
+        """
+        self.start()
+        for stage in self.stages:
+            stage.train()
+        n = min(self.n_microbatches, len(x.f))
+        self._n = n
+        self._counts = [0] * len(self.stages)
+        self._contexts = [{} for _ in self.stages]
+        self._states = [State() for _ in self.stages]
+        self._ts = [shard_io(t, mb, n) for mb in range(n)]
+        self._assessments = [None] * n
+        for mb in range(n):
+            self._send(0, self._FORWARD, mb, shard_io(x, mb, n))
+
+        error = None
+        for _ in range(n):
+            result = self._done.get()
+            if isinstance(result, _PipelineError):
+                error = result.error
+                break
+        if error is not None:
+            # the workers cannot continue with the micro-batches that remain
+            self.close()
+            raise error
+        return Assessment(torch.stack([a.value for a in self._assessments]).mean())
+
+    def close(self):
+        """Stop the worker threads"""
+        for i, worker in enumerate(self._workers):
+            self._inboxes[i].put((self._STOP, next(self._seq), self._STOP, None, None))
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def __enter__(self) -> "PipelineScheduler":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,13 +1,14 @@
 # local
 from ..kaku import (
     IO,
+    IOBuffer,
     StepTheta,
     State,
 )
 
 
 class StackPostStepTheta(StepTheta):
-    def __init__(self, base_step_theta: StepTheta):
+    def __init__(self, base_step_theta: StepTheta, capacity: int = 0):
         """Save the inputs and outputs to a network
         Useful if you want to optimize after propagating backwards like when
         you want to reuse a layer.
@@ -16,16 +17,19 @@ class StackPostStepTheta(StepTheta):
 
         Args:
             base_step_theta (StepTheta): The base step method to call after postponing
+            capacity (int, optional): The number of rows to preallocate for the stack. Defaults to 0.
         """
         super().__init__()
         self._base_step_theta = base_step_theta
+        self.capacity = capacity
 
     def accumulate(self, x: IO, t: IO, state: State):
 
-        if (self, "stack") not in state:
-            state[self, "stack_x"] = []
-            state[self, "stack_t"] = []
-        state[self, "stack_x"].append(x)
+        stack_x = state.get((self, "stack_x"))
+        if stack_x is None:
+            stack_x = state[self, "stack_x"] = IOBuffer(self.capacity)
+            state[self, "stack_t"] = IOBuffer(self.capacity)
+        stack_x.append(x)
         state[self, "stack_t"].append(t)
 
     def step(self, x: IO, t: IO, state: State):
@@ -46,6 +50,6 @@ class StackPostStepTheta(StepTheta):
         if stack_x is None or stack_t is None:
             raise RuntimeError("Cannot adv if step has not been executed")
 
-        x = IO.cat(stack_x)
-        t = IO.cat(stack_t)
+        x = stack_x.io()
+        t = stack_t.io()
         self._base_step_theta.step(x, t, state)
@@ -0,0 +1,168 @@
+# 1st party
+import asyncio
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+# 3rd party
+import torch
+import torch.nn as nn
+
+# local
+from ..kaku import IO, LearningMachine
+
+
+class BatchServer(object):
+    """Serve single-sample requests from many coroutines by coalescing them into
+    batches. A batch is run once it reaches max_batch_size or max_delay has
+    passed since its first request. The forward is executed in a worker thread
+    so requests continue to be collected while a batch is running
+
+    usage:
+        async with BatchServer(learner, max_batch_size=32) as server:
+            y = await server.predict(x)
+    """
+
+    def __init__(
+        self,
+        predictor: typing.Union[LearningMachine, nn.Module, typing.Callable],
+        max_batch_size: int = 64,
+        max_delay: float = 0.005,
+    ):
+        """initializer
+
+        Args:
+            predictor (typing.Union[LearningMachine, nn.Module, typing.Callable]): The machine to
+              run forward on or a module or function that takes the batched tensors, such as
+              the module from export()
+            max_batch_size (int, optional): The maximum number of requests in a batch. Defaults to 64.
+            max_delay (float, optional): The maximum number of seconds to wait for a batch
+              to fill after its first request. Defaults to 0.005.
+
+        Raises:
+            ValueError: If max_batch_size is not positive
+        """
+        if max_batch_size <= 0:
+            raise ValueError(
+                f"Argument max_batch_size must be greater than 0 not {max_batch_size}"
+            )
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        # the number of batches and samples that have been run
+        self.n_batches = 0
+        self.n_samples = 0
+        self._queue: asyncio.Queue = None
+        self._task: asyncio.Task = None
+        self._executor: ThreadPoolExecutor = None
+
+    def _forward(self, *x: torch.Tensor) -> typing.Tuple[torch.Tensor]:
+
+        with torch.no_grad():
+            if isinstance(self.predictor, LearningMachine):
+                return tuple(self.predictor(IO(*x)))
+            y = self.predictor(*x)
+        if isinstance(y, torch.Tensor):
+            return (y,)
+        return tuple(y)
+
+    async def _collect(self) -> typing.List[typing.Tuple[typing.Tuple, asyncio.Future]]:
+
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+
+        loop = asyncio.get_running_loop()
+        requests = []
+        try:
+            while True:
+                batch = await self._collect()
+                requests = [request for request in batch if not request[1].done()]
+                if len(requests) == 0:
+                    continue
+                try:
+                    x = [
+                        torch.stack([request[0][i] for request in requests])
+                        for i in range(len(requests[0][0]))
+                    ]
+                    y = await loop.run_in_executor(self._executor, self._forward, *x)
+                except Exception as e:
+                    for _, future in requests:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self.n_batches += 1
+                self.n_samples += len(requests)
+                for i, (_, future) in enumerate(requests):
+                    if not future.done():
+                        future.set_result(
+                            y[0][i] if len(y) == 1 else tuple(y_j[i] for y_j in y)
+                        )
+        finally:
+            # cancel the requests of the batch running when stopped
+            for _, future in requests:
+                if not future.done():
+                    future.cancel()
+
+    async def start(self) -> "BatchServer":
+        """Start the batching task. Must be called from the event loop
+        the requests will be made in
+
+        Returns:
+            BatchServer: self
+        """
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    async def stop(self):
+        """Stop the batching task. Requests that have not been run are cancelled"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        self._task = None
+
+    async def predict(
+        self, *x: torch.Tensor
+    ) -> typing.Union[torch.Tensor, typing.Tuple[torch.Tensor]]:
+        """Request the output for one sample
+
+        Args:
+            x (torch.Tensor): The inputs for the sample without the batch dimension. All
+              samples must have the same shapes
+
+        Returns:
+            typing.Union[torch.Tensor, typing.Tuple[torch.Tensor]]: The output for the
+              sample or a tuple if there are multiple outputs
+        """
+        if self._task is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((x, future))
+        return await future
+
+    async def __aenter__(self) -> "BatchServer":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
@@ -7,3 +7,13 @@ from ._assess import (
     StepXLayerAssessor,
 )
 from ._limit import FeatureLimitGen, RandomFeatureIdxGen
+from ._profile import (
+    MachineRecorder,
+    MethodStats,
+    Profiler,
+    TraceRecorder,
+    io_shapes,
+    io_nbytes,
+    PROFILED_METHODS,
+    TRACED_METHODS,
+)
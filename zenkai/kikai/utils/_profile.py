@@ -0,0 +1,395 @@
+# 1st party
+import json
+import math
+import random
+import threading
+import time
+import typing
+from abc import ABC, abstractmethod
+from functools import wraps
+
+# 3rd party
+import torch
+
+# local
+from ...kaku import IO, Assessment, LearningMachine
+
+
+PROFILED_METHODS = ("forward", "accumulate", "step", "step_x", "assess_y")
+
+
+def io_shapes(value) -> typing.List[typing.Tuple[int]]:
+    """Get the shapes of the tensors in a value passed into or out of a machine
+
+    Args:
+        value: The IO, Assessment or tensor
+
+    Returns:
+        typing.List[typing.Tuple[int]]: The shapes of the tensors
+    """
+    if isinstance(value, torch.Tensor):
+        return [tuple(value.shape)]
+    if isinstance(value, Assessment):
+        return io_shapes(value.value)
+    if isinstance(value, (IO, tuple, list)):
+        return [
+            shape
+            for value_i in value
+            if isinstance(value_i, (torch.Tensor, Assessment))
+            for shape in io_shapes(value_i)
+        ]
+    return []
+
+
+class MachineRecorder(ABC):
+    """Base class for recording the calls to the methods of learning machines.
+    The methods are wrapped when attached and restored when detached so
+    there is no overhead on machines that are not attached
+    """
+
+    def __init__(self, methods: typing.Iterable[str] = PROFILED_METHODS):
+        """initializer
+
+        Args:
+            methods (typing.Iterable[str], optional): The methods to record. Defaults to PROFILED_METHODS.
+        """
+        self.methods = tuple(methods)
+        self.enabled = True
+        # the machine and the original values of the instance attributes
+        self._attached: typing.Dict[
+            int, typing.Tuple[LearningMachine, typing.Dict[str, typing.Any]]
+        ] = {}
+
+    @abstractmethod
+    def begin(self, name: str, method: str, args: typing.Tuple) -> typing.Any:
+        """Called before the method is executed
+
+        Args:
+            name (str): The name of the machine
+            method (str): The name of the method
+            args (typing.Tuple): The args passed to the method
+
+        Returns:
+            typing.Any: A token to pass to end
+        """
+        pass
+
+    @abstractmethod
+    def end(self, token: typing.Any, result: typing.Any):
+        """Called after the method is executed
+
+        Args:
+            token (typing.Any): The token returned by begin
+            result (typing.Any): The result of the method. None if an error was raised
+        """
+        pass
+
+    def _wrap(self, name: str, method: str, f: typing.Callable) -> typing.Callable:
+
+        recorder = self
+
+        @wraps(f)
+        def _(*args, **kwargs):
+            if not recorder.enabled:
+                return f(*args, **kwargs)
+            token = recorder.begin(name, method, args)
+            result = None
+            try:
+                result = f(*args, **kwargs)
+            finally:
+                recorder.end(token, result)
+            return result
+
+        return _
+
+    def attach(
+        self, machine: LearningMachine, recursive: bool = True, name: str = None
+    ) -> "MachineRecorder":
+        """Attach to a machine
+
+        Args:
+            machine (LearningMachine): The machine to record
+            recursive (bool, optional): Whether to attach to the learning machines
+              contained in the machine. Defaults to True.
+            name (str, optional): The name of the machine. Defaults to the class name.
+
+        Returns:
+            MachineRecorder: self
+        """
+        name = name or type(machine).__name__
+        if recursive:
+            machines = [
+                (f"{name}.{sub_name}" if sub_name else name, sub)
+                for sub_name, sub in machine.named_modules()
+                if isinstance(sub, LearningMachine)
+            ]
+        else:
+            machines = [(name, machine)]
+
+        for machine_name, machine_i in machines:
+            if id(machine_i) in self._attached:
+                continue
+            originals = {}
+            for method in self.methods:
+                if not hasattr(machine_i, method):
+                    continue
+                originals[method] = machine_i.__dict__.get(method)
+                object.__setattr__(
+                    machine_i,
+                    method,
+                    self._wrap(machine_name, method, getattr(machine_i, method)),
+                )
+            self._attached[id(machine_i)] = (machine_i, originals)
+        return self
+
+    def detach(self):
+        """Restore the methods of all machines attached to"""
+        for machine, originals in self._attached.values():
+            for method, original in originals.items():
+                if original is None:
+                    del machine.__dict__[method]
+                else:
+                    object.__setattr__(machine, method, original)
+        self._attached.clear()
+
+    def __enter__(self) -> "MachineRecorder":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.detach()
+
+
+class MethodStats(object):
+    """The timings and shapes recorded for one method of a machine. The count, total,
+    min and max are kept for every call and the p95 is computed from a uniform sample
+    of at most max_samples durations so the memory does not grow with the calls
+    """
+
+    def __init__(self, max_shapes: int = 8, max_samples: int = 1024):
+        self.count: int = 0
+        self.total: float = 0.0
+        self.min: float = 0.0
+        self.max: float = 0.0
+        # reservoir sample of the durations
+        self.durations: typing.List[float] = []
+        self.in_shapes: typing.List[typing.List[typing.Tuple[int]]] = []
+        self.out_shapes: typing.List[typing.List[typing.Tuple[int]]] = []
+        self.max_shapes = max_shapes
+        self.max_samples = max_samples
+
+    def add(self, duration: float, in_shapes, out_shapes):
+
+        if self.count == 0:
+            self.min = self.max = duration
+        else:
+            self.min = min(self.min, duration)
+            self.max = max(self.max, duration)
+        self.count += 1
+        self.total += duration
+        if len(self.durations) < self.max_samples:
+            self.durations.append(duration)
+        else:
+            i = random.randrange(self.count)
+            if i < self.max_samples:
+                self.durations[i] = duration
+        if in_shapes not in self.in_shapes and len(self.in_shapes) < self.max_shapes:
+            self.in_shapes.append(in_shapes)
+        if (
+            out_shapes not in self.out_shapes
+            and len(self.out_shapes) < self.max_shapes
+        ):
+            self.out_shapes.append(out_shapes)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+
+    @property
+    def p95(self) -> float:
+        if len(self.durations) == 0:
+            return 0.0
+        durations = sorted(self.durations)
+        return durations[max(math.ceil(0.95 * len(durations)) - 1, 0)]
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "min": self.min,
+            "max": self.max,
+            "p95": self.p95,
+            "in_shapes": self.in_shapes,
+            "out_shapes": self.out_shapes,
+        }
+
+
+class Profiler(MachineRecorder):
+    """Time the forward, accumulate, step, step_x and assess_y methods of each
+    learning machine attached to. The time of a method includes the time of
+    the methods it calls
+
+    usage:
+        with Profiler().attach(learner) as profiler:
+            learner.learn(x, t)
+        print(profiler.summary())
+    """
+
+    def __init__(
+        self,
+        methods: typing.Iterable[str] = PROFILED_METHODS,
+        synchronize: bool = False,
+    ):
+        """initializer
+
+        Args:
+            methods (typing.Iterable[str], optional): The methods to time. Defaults to PROFILED_METHODS.
+            synchronize (bool, optional): Whether to synchronize cuda before reading the time
+              so that the kernels launched are included. Defaults to False.
+        """
+        super().__init__(methods)
+        self.synchronize = synchronize and torch.cuda.is_available()
+        self._stats: typing.Dict[typing.Tuple[str, str], MethodStats] = {}
+
+    def begin(self, name: str, method: str, args: typing.Tuple) -> typing.Any:
+        if self.synchronize:
+            torch.cuda.synchronize()
+        return name, method, args[0] if len(args) > 0 else None, time.perf_counter()
+
+    def end(self, token: typing.Any, result: typing.Any):
+        if self.synchronize:
+            torch.cuda.synchronize()
+        name, method, x, start = token
+        duration = time.perf_counter() - start
+        stats = self._stats.get((name, method))
+        if stats is None:
+            stats = self._stats[(name, method)] = MethodStats()
+        stats.add(duration, io_shapes(x), io_shapes(result))
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, typing.Dict[str, typing.Any]]]:
+        """
+        Returns:
+            typing.Dict[str, typing.Dict[str, typing.Dict[str, typing.Any]]]: The count, total,
+              mean, min, max, p95 and shapes for each method of each machine
+        """
+        result = {}
+        for (name, method), stats in self._stats.items():
+            result.setdefault(name, {})[method] = stats.to_dict()
+        return result
+
+    def summary(self) -> str:
+        """
+        Returns:
+            str: A table of the timings sorted by the total time
+        """
+        rows = sorted(self._stats.items(), key=lambda item: -item[1].total)
+        lines = [
+            f"{'machine':<40}{'method':<12}{'count':>8}{'total(s)':>12}{'mean(s)':>12}{'p95(s)':>12}"
+        ]
+        for (name, method), stats in rows:
+            lines.append(
+                f"{name:<40}{method:<12}{stats.count:>8}{stats.total:>12.6f}"
+                f"{stats.mean:>12.6f}{stats.p95:>12.6f}"
+            )
+        return "\n".join(lines)
+
+    def reset(self):
+        """Clear the timings"""
+        self._stats.clear()
+
+
+TRACED_METHODS = ("learn",) + PROFILED_METHODS
+
+
+def io_nbytes(value) -> int:
+    """Get the number of bytes of the tensors in a value passed out of a machine
+
+    Args:
+        value: The IO, Assessment or tensor
+
+    Returns:
+        int: The number of bytes
+    """
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, Assessment):
+        return io_nbytes(value.value)
+    if isinstance(value, (IO, tuple, list)):
+        return sum(io_nbytes(value_i) for value_i in value)
+    return 0
+
+
+class TraceRecorder(MachineRecorder):
+    """Record a timeline of the calls to the methods of the machines attached to
+    in the trace event format. The file saved can be opened in Perfetto or
+    chrome://tracing. Spans are nested by time so the calls made within learn()
+    or GraphLearner.step() show up beneath it
+
+    usage:
+        with TraceRecorder().attach(learner) as recorder:
+            learner.learn(x, t)
+        recorder.save('trace.json')
+    """
+
+    def __init__(self, methods: typing.Iterable[str] = TRACED_METHODS):
+        """initializer
+
+        Args:
+            methods (typing.Iterable[str], optional): The methods to record. Defaults to TRACED_METHODS.
+        """
+        super().__init__(methods)
+        self._events: typing.List[typing.Dict[str, typing.Any]] = []
+        self._origin = time.perf_counter()
+        self._cuda = torch.cuda.is_available()
+
+    def begin(self, name: str, method: str, args: typing.Tuple) -> typing.Any:
+        allocated = torch.cuda.memory_allocated() if self._cuda else None
+        x = args[0] if len(args) > 0 else None
+        return name, method, x, allocated, time.perf_counter()
+
+    def end(self, token: typing.Any, result: typing.Any):
+        end = time.perf_counter()
+        name, method, x, allocated, start = token
+        if allocated is not None:
+            nbytes = torch.cuda.memory_allocated() - allocated
+        else:
+            # the bytes of the output if the allocator cannot be queried
+            nbytes = io_nbytes(result)
+        self._events.append(
+            {
+                "name": f"{name}.{method}",
+                "cat": method,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": 0,
+                "tid": threading.get_ident(),
+                "args": {
+                    "in_shapes": [list(shape) for shape in io_shapes(x)],
+                    "out_shapes": [list(shape) for shape in io_shapes(result)],
+                    "bytes": nbytes,
+                },
+            }
+        )
+
+    @property
+    def events(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """
+        Returns:
+            typing.List[typing.Dict[str, typing.Any]]: The trace events recorded
+        """
+        return self._events
+
+    def save(self, path: str):
+        """Save the trace to a json file
+
+        Args:
+            path (str): The path to save to
+        """
+        with open(path, "w") as file:
+            json.dump({"traceEvents": self._events, "displayTimeUnit": "ms"}, file)
+
+    def reset(self):
+        """Clear the events"""
+        self._events.clear()
+        self._origin = time.perf_counter()
@@ -252,12 +252,16 @@ class ModuleNoise(nn.Module):
             * torch.sqrt(self._direction_var[None])
             + self._direction_mean[None]
         ) + get_model_parameters(self._module_clone)[None]
-        ys = []
-        for x_i, p_i in zip(x, ps):
+        y = None
+        for i, (x_i, p_i) in enumerate(zip(x, ps)):
             update_model_parameters(self._module_clone, p_i)
-            ys.append(self._module_clone(x_i))
+            y_i = self._module_clone(x_i)
+            if y is None:
+                # preallocate the output rather than concatenating
+                y = y_i.new_empty(len(x) * len(y_i), *y_i.shape[1:])
+            y[i * len(y_i) : (i + 1) * len(y_i)] = y_i
 
-        return torch.cat(ys)
+        return y
 
 
 class AssessmentDist(ABC):